@@ -0,0 +1,78 @@
+"""Память и время до первой отправки: список получателей против потока страниц.
+
+Заполняет временную базу --users незаполненными анкетами и прогоняет через
+BroadcastEngine два варианта: get_all_users_without_survey (весь список
+заранее) и db.stream('iter_users_without_survey') (страницы по ходу).
+Отправка - пустая корутина, лимиты сняты, меряется только конвейер.
+
+Запуск из корня репозитория:
+    python -m benchmarks.broadcast_streaming [--users 200000]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from broadcast import BroadcastEngine
+from database import AsyncDatabase, Database
+
+
+def fill(db, users):
+    now = datetime.now()
+    with db.transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO leads (user_id, start_time, created_at, survey_completed) VALUES (?, ?, ?, 0)",
+            ((user_id, now, now) for user_id in range(1, users + 1))
+        )
+
+
+async def measure(make_recipients):
+    engine = BroadcastEngine(rate=1e9, chat_interval=0, concurrency=20)
+    first_sent = None
+
+    async def send(chat_id):
+        nonlocal first_sent
+        if first_sent is None:
+            first_sent = time.perf_counter()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    stats = await engine.run(await make_recipients(), send)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (first_sent - started) * 1000, peak / 1024 / 1024, elapsed, stats['sent']
+
+
+async def run(args, db):
+    async def as_list():
+        return await db.get_all_users_without_survey()
+
+    async def as_stream():
+        return db.stream('iter_users_without_survey', page_size=args.page_size)
+
+    print(f"{'вариант':<10}{'до 1-й отправки, мс':>22}{'пик памяти, МБ':>17}{'всего, с':>10}{'отправлено':>12}")
+    for name, make in (("список", as_list), ("поток", as_stream)):
+        first, peak, elapsed, sent = await measure(make)
+        print(f"{name:<10}{first:>22.1f}{peak:>17.1f}{elapsed:>10.1f}{sent:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_db = Database(os.path.join(tmp, "leads.db"))
+        fill(sync_db, args.users)
+        db = AsyncDatabase(sync_db)
+        asyncio.run(run(args, db))
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Пропускная способность рассылки на локальной заглушке Bot API.
+
+Сравнивает старый последовательный цикл (send + sleep(0.1)) с BroadcastEngine
+и печатает сообщений в секунду и итоги доставки.
+
+Запуск из корня репозитория:
+    python -m benchmarks.broadcast_throughput [--users 2000] [--rate 25] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import time
+
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from benchmarks.fake_bot_api import TOKEN, FakeBotApi
+from broadcast import BroadcastEngine
+
+
+async def serial_loop(bot, users):
+    """Старый вариант из send_broadcast_first/second"""
+    for user_id in users:
+        try:
+            await bot.send_message(chat_id=user_id, text="test")
+            await asyncio.sleep(0.1)
+        except Exception:
+            pass
+
+
+async def run(args):
+    server = FakeBotApi(latency=args.latency, flood_rate=args.flood_rate)
+    await server.start()
+
+    bot = Bot(TOKEN, base_url=server.base_url, request=HTTPXRequest(connection_pool_size=args.concurrency))
+    await bot.initialize()
+
+    async def send(user_id):
+        await bot.send_message(chat_id=user_id, text="test")
+
+    try:
+        serial_users = range(1, args.serial_users + 1)
+        started = time.perf_counter()
+        await serial_loop(bot, serial_users)
+        serial_rate = len(serial_users) / (time.perf_counter() - started)
+
+        engine = BroadcastEngine(rate=args.rate, concurrency=args.concurrency)
+        users = range(1, args.users + 1)
+        started = time.perf_counter()
+        stats = await engine.run(users, send)
+        engine_rate = len(users) / (time.perf_counter() - started)
+    finally:
+        await bot.shutdown()
+        await server.stop()
+
+    print(f"Последовательный цикл: {serial_rate:8.1f} сообщ/с ({len(serial_users)} получателей)")
+    print(f"BroadcastEngine:       {engine_rate:8.1f} сообщ/с ({len(users)} получателей, лимит {args.rate}/с)")
+    print(f"Итоги:                 {dict(stats)}")
+    print(f"Ответов 429:           {server.calls['429']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--serial-users", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=25, help="глобальный лимит, сообщ/с")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка заглушки Bot API, с")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля ответов 429")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Задержка одного вызова Database: соединение на вызов против общего соединения.
+
+Запуск из корня репозитория:
+    python -m benchmarks.db_latency [--calls 2000]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from database import Database
+
+
+def legacy_update_start_time(db_path, user_id):
+    """Старый вариант: новое соединение на каждый вызов"""
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        now = datetime.now()
+        cursor.execute("""
+            INSERT OR REPLACE INTO leads (user_id, start_time, created_at, survey_completed)
+            VALUES (?, ?, ?, ?)
+        """, (user_id, now, now, 0))
+        conn.commit()
+        return now
+
+
+def legacy_get_user_start_time(db_path, user_id):
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT start_time FROM leads WHERE user_id = ?", (user_id,))
+        result = cursor.fetchone()
+        return result[0] if result else None
+
+
+def legacy_is_survey_completed(db_path, user_id):
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT survey_completed FROM leads WHERE user_id = ?", (user_id,))
+        result = cursor.fetchone()
+        return result[0] == 1 if result else False
+
+
+def measure(func, calls):
+    started = time.perf_counter()
+    for user_id in range(calls):
+        func(user_id)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        pooled_path = os.path.join(tmp, "pooled.db")
+
+        # Схему для старого варианта создаём тем же init_db, но в режиме rollback-журнала
+        Database(legacy_path).close()
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        db = Database(pooled_path)
+
+        cases = [
+            ("update_start_time",
+             lambda uid: legacy_update_start_time(legacy_path, uid), db.update_start_time),
+            ("get_user_start_time",
+             lambda uid: legacy_get_user_start_time(legacy_path, uid), db.get_user_start_time),
+            ("is_survey_completed",
+             lambda uid: legacy_is_survey_completed(legacy_path, uid), db.is_survey_completed),
+        ]
+
+        print(f"{'метод':<22}{'до, мкс':>12}{'после, мкс':>14}{'ускорение':>12}")
+        for name, legacy, pooled in cases:
+            before = measure(legacy, args.calls)
+            after = measure(pooled, args.calls)
+            print(f"{name:<22}{before:>12.1f}{after:>14.1f}{before / after:>11.1f}x")
+
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
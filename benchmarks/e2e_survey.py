@@ -0,0 +1,148 @@
+"""Сквозной прогон анкеты: настоящий bot.py на заглушке Bot API.
+
+Приложение собирается bot.build_application() во временном каталоге со своей
+leads.db и получает обновления long polling'ом из getUpdates заглушки. Сценарий -
+полная анкета --users пользователей (start -> geography_handler -> ... ->
+contact_handler) либо JSONL из --script (см. benchmarks.survey_script).
+Заглушка может отвечать с задержкой и возвращать 429 на долю отправок.
+
+Печатает обновлений в секунду, задержку обработки обновления (p50/p99, от
+начала до конца обработчика), вызовы Bot API и SQL-запросы/транзакции к базе
+в расчёте на одну сохранённую заявку.
+
+Запуск из корня репозитория:
+    python -m benchmarks.e2e_survey [--users 200] [--latency 0.02] [--flood-rate 0.0] [--script survey.jsonl]
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from benchmarks.fake_bot_api import TOKEN, FakeBotApi
+from benchmarks.survey_script import SURVEY_ANSWERS, script
+from update_processor import PerUserUpdateProcessor
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TimedUpdateProcessor(PerUserUpdateProcessor):
+    """PerUserUpdateProcessor, замеряющий время обработки каждого обновления"""
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self.latencies = []
+        self.handled = asyncio.Event()
+        self.expected = 0
+
+    async def _timed(self, coroutine):
+        started = time.perf_counter()
+        try:
+            await coroutine
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+            if len(self.latencies) >= self.expected:
+                self.handled.set()
+
+    async def do_process_update(self, update, coroutine):
+        await super().do_process_update(update, self._timed(coroutine))
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+async def run(args, updates):
+    server = FakeBotApi(latency=args.latency, flood_rate=args.flood_rate, record=True)
+    await server.start()
+
+    # bot.py читает настройки и открывает leads.db при импорте
+    os.environ.update(BOT_TOKEN=TOKEN, BOT_API_BASE_URL=server.base_url, BOT_MODE="polling")
+    os.environ.setdefault("ADMIN_ID_1", "1")
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ.pop("SHARD_INDEX", None)
+    sys.path.insert(0, str(ROOT))
+    bot = importlib.import_module("bot")
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    statements = Counter()
+
+    def trace(sql):
+        word = sql.lstrip().split(None, 1)[0].upper()
+        statements["commit" if word in ("COMMIT", "RELEASE") else "sql"] += 1
+
+    bot.PerUserUpdateProcessor = TimedUpdateProcessor
+    application = bot.build_application()
+    processor = application.update_processor
+    processor.expected = len(updates)
+
+    await application.initialize()
+    await bot.post_init(application)
+    await application.updater.start_polling(poll_interval=0, timeout=1)
+    await application.start()
+    try:
+        server.calls.clear()
+        await bot.db.run(bot.db.db.conn.set_trace_callback, trace)
+        started = time.perf_counter()
+        server.push_updates(updates)
+        await processor.handled.wait()
+        elapsed = time.perf_counter() - started
+        # Хвост: отложенные записи в базу и уведомления менеджерам
+        await asyncio.sleep(args.settle)
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await bot.post_stop(application)
+        await application.shutdown()
+        await bot.post_shutdown(application)
+        await bot.db.run(bot.db.db.conn.set_trace_callback, None)
+        await server.stop()
+
+    conn = sqlite3.connect("leads.db")
+    leads = conn.execute("SELECT COUNT(*) FROM leads WHERE survey_completed = 1").fetchone()[0]
+    conn.close()
+    sent = Counter(method for _, method, _ in server.sent)
+    per_lead = max(leads, 1)
+
+    print(f"Обновлений: {len(updates)}, задержка Bot API {args.latency * 1000:.0f} мс, "
+          f"доля 429: {args.flood_rate:.0%}")
+    print(f"Обработано за {elapsed:.2f} с: {len(updates) / elapsed:.0f} обновл/с")
+    print(f"Обработка обновления: p50 {statistics.median(processor.latencies) * 1000:.1f} мс, "
+          f"p99 {percentile(processor.latencies, 0.99) * 1000:.1f} мс")
+    print(f"Заявок сохранено: {leads}")
+    print(f"Вызовы Bot API: {dict(sent)}, ответов 429: {server.calls['429']}")
+    print(f"На заявку: SQL-запросов {statements['sql'] / per_lead:.1f}, "
+          f"транзакций {statements['commit'] / per_lead:.1f}, отправок {len(server.sent) / per_lead:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--script", help="JSONL со сценарием обновлений вместо --users")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка заглушки Bot API, с")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля отправок, получающих 429")
+    parser.add_argument("--settle", type=float, default=1.0, help="ожидание хвоста после обработки, с")
+    parser.add_argument("--verbose", action="store_true", help="логи бота")
+    args = parser.parse_args()
+
+    if args.script:
+        updates = FakeBotApi.load_script(os.path.abspath(args.script))
+    else:
+        updates = list(script(args.users))
+        print(f"{args.users} пользователей x {len(SURVEY_ANSWERS)} шагов анкеты")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        asyncio.run(run(args, updates))
+
+
+if __name__ == "__main__":
+    main()
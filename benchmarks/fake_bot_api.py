@@ -0,0 +1,143 @@
+"""Локальная заглушка Telegram Bot API для бенчмарков.
+
+Отвечает на вызовы /bot<token>/<method> правдоподобными объектами, учитывает
+число вызовов по методам, умеет добавлять задержку ответа и отвечать 429
+(RetryAfter) на заданную долю отправок. С record=True запоминает каждую
+отправку (время, метод, параметры). Сценарий обновлений, положенный через
+push_updates (или прочитанный load_script из JSONL), отдаётся боту через
+getUpdates, как это делает Telegram при long polling.
+
+    server = FakeBotApi(latency=0.02)
+    await server.start()
+    bot = Bot(TOKEN, base_url=server.base_url, request=HTTPXRequest(connection_pool_size=64))
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+TOKEN = "123456:FAKE-TOKEN"
+
+
+class FakeBotApi:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, flood_rate=0.0, retry_after=1, record=False):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.record = record
+        self.calls = Counter()
+        self.sent = []        # (time.perf_counter(), метод, параметры) отправок при record=True
+        self._updates = []    # сценарий для getUpdates, по возрастанию update_id
+        self._updates_added = asyncio.Event()
+        self._message_ids = itertools.count(1)
+        self._runner = None
+
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self._handle)
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Если порт был 0 - узнаём выданный системой
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def push_updates(self, updates):
+        """Добавление обновлений (словари в формате Bot API) в очередь getUpdates"""
+        self._updates.extend(updates)
+        self._updates_added.set()
+
+    @staticmethod
+    def load_script(path):
+        """Сценарий обновлений из JSONL-файла: одно обновление на строку"""
+        with open(path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    @property
+    def pending_updates(self):
+        """Сколько обновлений сценария бот ещё не забрал"""
+        return len(self._updates)
+
+    async def _get_updates(self, params):
+        # offset подтверждает всё, что меньше него, - как в Telegram
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._updates_added.clear()
+            try:
+                await asyncio.wait_for(self._updates_added.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    async def _read_params(self, request):
+        if request.content_type == "application/json":
+            return await request.json()
+        form = await request.post()
+        return {key: value for key, value in form.items() if isinstance(value, str)}
+
+    def _message(self, params, method):
+        chat_id = int(params.get("chat_id", 0))
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+        }
+        if method == "sendPhoto":
+            message["photo"] = [{"file_id": "fake-photo", "file_unique_id": "p", "width": 1, "height": 1}]
+        elif method == "sendDocument":
+            message["document"] = {"file_id": "fake-document", "file_unique_id": "d"}
+        else:
+            message["text"] = params.get("text", "")
+        return message
+
+    async def _handle(self, request):
+        method = request.match_info["method"]
+        params = await self._read_params(request)
+        self.calls[method] += 1
+
+        if method == "getUpdates":
+            result = await self._get_updates(params)
+            return web.Response(text=json.dumps({"ok": True, "result": result}), content_type="application/json")
+
+        if self.record and method.startswith("send"):
+            self.sent.append((time.perf_counter(), method, params))
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method.startswith("send") and self.flood_rate and random.random() < self.flood_rate:
+            self.calls["429"] += 1
+            payload = {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+            return web.Response(text=json.dumps(payload), status=429, content_type="application/json")
+
+        if method == "getMe":
+            result = {"id": 123456, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        elif method.startswith("send"):
+            result = self._message(params, method)
+        else:
+            result = True
+
+        return web.Response(text=json.dumps({"ok": True, "result": result}), content_type="application/json")
@@ -0,0 +1,60 @@
+"""Стоимость выбора ответа FAQ на одно сообщение: цепочка if/elif против индекса.
+
+Старый вариант моделируется последовательным сравнением текста со всеми
+литералами в порядке веток прежнего final_choice_handler.
+
+Запуск из корня репозитория:
+    python -m benchmarks.faq_dispatch [--messages 1000000]
+"""
+import argparse
+import random
+import time
+
+from faq import FAQ_CATEGORIES, FAQ_INDEX, FAQ_NOT_FIT_BUTTON
+
+# Порядок веток в прежнем final_choice_handler
+OLD_CHAIN = (
+    ["🔄 Начать заново", "✅ Записаться на бесплатный замер", "❓У вас есть вопрос", "👀 Посмотреть примеры работ"]
+    + [category.button for category in FAQ_CATEGORIES]
+    + [question for category in FAQ_CATEGORIES for question, _ in category.questions]
+    + [FAQ_NOT_FIT_BUTTON, "❓ Задать свой вопрос", "🔙 Назад в категории", "🔙 Назад в меню"]
+)
+
+
+def old_dispatch(text):
+    for position, literal in enumerate(OLD_CHAIN):
+        if text == literal:
+            return position
+    return None
+
+
+def new_dispatch(text):
+    return FAQ_INDEX.get(text)
+
+
+def measure(dispatch, messages):
+    started = time.perf_counter()
+    for text in messages:
+        dispatch(text)
+    return (time.perf_counter() - started) / len(messages) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    # Входящие сообщения состояния RESULT: кнопки FAQ и произвольный текст
+    population = list(FAQ_INDEX) + ["Подскажите по срокам"]
+    rnd = random.Random(1)
+    messages = [rnd.choice(population) for _ in range(args.messages)]
+
+    before = measure(old_dispatch, messages)
+    after = measure(new_dispatch, messages)
+    print(f"Веток в цепочке:   {len(OLD_CHAIN)}")
+    print(f"if/elif цепочка:   {before:8.1f} нс/сообщение")
+    print(f"FAQ_INDEX:         {after:8.1f} нс/сообщение ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
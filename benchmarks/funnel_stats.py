@@ -0,0 +1,118 @@
+"""Воронка анкеты на миллионах событий survey_events.
+
+Генерирует прохождения анкеты --users пользователями (на каждом шаге часть
+пользователей уходит), пишет переходы пачками, как FunnelRecorder, затем
+пересчитывает агрегаты Database.aggregate_funnel и замеряет ответ /funnel
+(get_funnel_stats + format_funnel) против прямого GROUP BY по событиям.
+Отдельно замеряется стоимость FunnelRecorder.record в обработчике.
+
+Запуск из корня репозитория:
+    python -m benchmarks.funnel_stats [--users 300000] [--drop 0.08]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from telegram.ext import ConversationHandler
+
+from database import AsyncDatabase, Database
+from funnel import LEAD, FunnelRecorder, aggregate_funnel, format_funnel
+from states import *
+
+PATH = [GEOGRAPHY, OBJECT_TYPE, CONDITION, METRAGE, REPAIR_FORMAT, KEYS_READY,
+        DEADLINE, MAIN_FEAR, BUDGET, RESULT, CONTACT, LEAD, RESULT]
+
+
+def generate(users, drop):
+    """События прохождения: (user_id, состояние); пользователи идут вперемешку"""
+    rnd = random.Random(42)
+    active = {user_id: 0 for user_id in range(1, users + 1)}
+    while active:
+        for user_id in rnd.sample(list(active), min(len(active), 5000)):
+            step = active[user_id]
+            yield user_id, PATH[step]
+            if step + 1 == len(PATH) or rnd.random() < drop:
+                if rnd.random() < 0.3:
+                    yield user_id, ConversationHandler.END
+                del active[user_id]
+            else:
+                active[user_id] = step + 1
+
+
+def timed(func, repeat=20):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(os.path.join(tmp, "leads.db"))
+        database.init_db()
+        db = AsyncDatabase(database)
+        # Пачка не наберётся - record мерится без фоновой записи
+        recorder = FunnelRecorder(db, batch_size=10 ** 9)
+
+        # Время событий растёт, как у живых пользователей; пачки - как у FunnelRecorder.flush
+        base = time.time() - 86400
+        started = time.perf_counter()
+        batch = []
+        events = 0
+        for user_id, state in generate(args.users, args.drop):
+            batch.append((user_id, state, base + events * 0.05))
+            events += 1
+            if len(batch) >= args.batch_size:
+                await db.add_survey_events(batch)
+                batch = []
+        await db.add_survey_events(batch)
+        elapsed = time.perf_counter() - started
+        print(f"Событий: {events}, запись пачками по {args.batch_size}: {events / elapsed:.0f} событ/с")
+
+        started = time.perf_counter()
+        for _ in range(100000):
+            recorder.record(1, GEOGRAPHY)
+        per_record = (time.perf_counter() - started) / 100000
+        print(f"FunnelRecorder.record в обработчике: {per_record * 1e6:.2f} мкс")
+
+        started = time.perf_counter()
+        processed = await aggregate_funnel(db)
+        elapsed = time.perf_counter() - started
+        print(f"Полный пересчёт агрегатов: {processed} событий за {elapsed:.1f} с ({processed / elapsed:.0f} событ/с)")
+
+        # Инкрементальный пересчёт: новые события после уже посчитанных
+        fresh = [(user_id, GEOGRAPHY, time.time()) for user_id in range(args.users + 1, args.users + 1001)]
+        await db.add_survey_events(fresh)
+        started = time.perf_counter()
+        await aggregate_funnel(db)
+        print(f"Инкрементальный пересчёт 1000 новых событий: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+        def answer():
+            format_funnel(*database.get_funnel_stats())
+
+        def group_by():
+            database._fetchall("SELECT state, COUNT(DISTINCT user_id) FROM survey_events GROUP BY state")
+
+        print(f"Ответ /funnel из агрегатов: {timed(answer) * 1000:.2f} мс")
+        print(f"Прямой GROUP BY по survey_events: {timed(group_by, 3) * 1000:.0f} мс")
+        print()
+        print(format_funnel(*database.get_funnel_stats()))
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=300000)
+    parser.add_argument("--drop", type=float, default=0.08, help="доля ушедших на каждом шаге")
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
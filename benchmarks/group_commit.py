@@ -0,0 +1,76 @@
+"""Всплеск /start: транзакция на каждый вызов против групповой записи.
+
+--users пользователей жмут /start равномерно с частотой --rate в секунду
+(вызов update_start_time через AsyncDatabase, не дожидаясь предыдущих).
+Варианты: транзакция на вызов с synchronous=NORMAL (как было) и FULL,
+групповая запись с FULL (как в боте). Печатаются достигнутая частота
+/start, число COMMIT в секунду и задержка вызова до записи на диск.
+
+Запуск из корня репозитория:
+    python -m benchmarks.group_commit [--users 10000] [--rate 5000] [--window 0.005]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from database import AsyncDatabase, Database
+from metrics import DB_SECONDS
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def burst(db, users, rate):
+    latencies = []
+
+    async def one(user_id):
+        started = time.perf_counter()
+        await db.update_start_time(user_id)
+        latencies.append(time.perf_counter() - started)
+
+    tasks = []
+    started = time.perf_counter()
+    for number, user_id in enumerate(users):
+        # Открытая нагрузка: вызовы приходят по расписанию, а не по готовности предыдущих
+        delay = started + number / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(user_id)))
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - started, latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=5000, help="/start в секунду")
+    parser.add_argument("--window", type=float, default=0.005, help="окно групповой записи, с")
+    args = parser.parse_args()
+
+    variants = [
+        ("на вызов, NORMAL", "NORMAL", ()),
+        ("на вызов, FULL", "FULL", ()),
+        ("группами, FULL", "FULL", ("update_start_time",)),
+    ]
+    users = range(1, args.users + 1)
+    print(f"{args.users} вызовов /start с частотой {args.rate:.0f}/с, окно {args.window * 1000:.0f} мс")
+    print(f"{'':<18}{'/start в с':>12}{'COMMIT в с':>12}{'p50, мс':>10}{'p99, мс':>10}{'макс, мс':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for title, synchronous, grouped in variants:
+            db = AsyncDatabase(Database(os.path.join(tmp, f"{len(grouped)}{synchronous}.db"), synchronous),
+                               group_commit=grouped, commit_window=args.window)
+            batches = DB_SECONDS.count("group_commit")
+            elapsed, latencies = await burst(db, users, args.rate)
+            commits = DB_SECONDS.count("group_commit") - batches if grouped else len(latencies)
+            db.close()
+            print(f"{title:<18}{len(latencies) / elapsed:>12.0f}{commits / elapsed:>12.0f}"
+                  f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 99) * 1000:>10.1f}"
+                  f"{max(latencies) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
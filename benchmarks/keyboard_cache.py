@@ -0,0 +1,83 @@
+"""Стоимость клавиатуры на один ответ: сборка на каждый вызов против готовой.
+
+Старый вариант строит вложенные списки и новый ReplyKeyboardMarkup, новый -
+берёт объект из keyboards.py. В обоих случаях reply_markup проходит через
+RequestParameter, как при реальной отправке в Bot API (to_dict + json.dumps).
+
+Запуск из корня репозитория:
+    python -m benchmarks.keyboard_cache [--replies 200000]
+"""
+import argparse
+import time
+import tracemalloc
+
+from telegram import KeyboardButton, ReplyKeyboardMarkup
+from telegram.request._requestparameter import RequestParameter
+
+import keyboards
+
+# Клавиатуры шагов анкеты в порядке прохождения
+SURVEY_KEYBOARDS = [
+    keyboards.START_KEYBOARD, keyboards.GEOGRAPHY_KEYBOARD, keyboards.OBJECT_TYPE_KEYBOARD,
+    keyboards.CONDITION_KEYBOARD, keyboards.REPAIR_FORMAT_KEYBOARD, keyboards.KEYS_READY_KEYBOARD,
+    keyboards.DEADLINE_KEYBOARD, keyboards.MAIN_FEAR_KEYBOARD, keyboards.BUDGET_KEYBOARD,
+    keyboards.FINAL_CHOICE_KEYBOARD, keyboards.CONTACT_KEYBOARD, keyboards.FINAL_KEYBOARD,
+]
+
+
+def old_builder(markup):
+    """Прежний get_*_keyboard: списки и разметка заново на каждый вызов"""
+    layout = [[(button.text, button.request_contact) for button in row] for row in markup.keyboard]
+
+    def build():
+        keyboard = [
+            [KeyboardButton(text, request_contact=True) if contact else text for text, contact in row]
+            for row in layout
+        ]
+        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return build
+
+
+def new_builder(markup):
+    return lambda: markup
+
+
+def reply(build):
+    return RequestParameter.from_input("reply_markup", build()).json_value
+
+
+def per_reply_us(builders, replies):
+    started = time.perf_counter()
+    for i in range(replies):
+        reply(builders[i % len(builders)])
+    return (time.perf_counter() - started) / replies * 1e6
+
+
+def per_reply_bytes(builders, replies=1000):
+    """Сколько памяти удерживают объекты, полученные от get_*_keyboard"""
+    tracemalloc.start()
+    kept = [builders[i % len(builders)]() for i in range(replies)]
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return allocated / len(kept)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--replies", type=int, default=200_000)
+    args = parser.parse_args()
+
+    old = [old_builder(markup) for markup in SURVEY_KEYBOARDS]
+    new = [new_builder(markup) for markup in SURVEY_KEYBOARDS]
+    assert [reply(build) for build in old] == [reply(build) for build in new]
+
+    before = per_reply_us(old, args.replies)
+    after = per_reply_us(new, args.replies)
+    print(f"{'вариант':<12}{'мкс/ответ':>12}{'байт/ответ':>14}")
+    print(f"{'сборка':<12}{before:>12.2f}{per_reply_bytes(old):>14.0f}")
+    print(f"{'синглтоны':<12}{after:>12.2f}{per_reply_bytes(new):>14.0f}")
+    print(f"Ускорение: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Точечные проверки заявки: AsyncDatabase против LeadCache.
+
+--users пользователей проходят путь анкеты: /start (update_start_time),
+контакт (get_user_start_time + save_lead) и проверка перед автосообщением
+(is_survey_completed). Замеряется время проверок и число запросов к SQLite,
+затем - --lookups повторных проверок по случайным пользователям.
+
+Запуск из корня репозитория:
+    python -m benchmarks.lead_cache [--users 5000] [--lookups 50000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from database import AsyncDatabase, Database
+from lead_cache import LeadCache
+from metrics import DB_SECONDS, LEAD_CACHE_LOOKUPS
+
+READS = ("get_user_start_time", "is_survey_completed", "get_lead_state")
+
+
+def db_reads():
+    return sum(DB_SECONDS.count(method) for method in READS)
+
+
+async def run(store, users, lookups):
+    reads_before = db_reads()
+    read_seconds = 0.0
+    for user_id in users:
+        await store.update_start_time(user_id)
+        started = time.perf_counter()
+        start_time = await store.get_user_start_time(user_id)
+        read_seconds += time.perf_counter() - started
+        await store.save_lead({"user_id": user_id, "phone": "+79000000000", "survey_completed": 1,
+                               "start_time": start_time})
+        started = time.perf_counter()
+        await store.is_survey_completed(user_id)
+        read_seconds += time.perf_counter() - started
+    survey_reads = db_reads() - reads_before
+
+    started = time.perf_counter()
+    for user_id in lookups:
+        await store.is_survey_completed(user_id)
+    lookup_seconds = time.perf_counter() - started
+    return {
+        "мкс/проверка в анкете": read_seconds / (2 * len(users)) * 1e6,
+        "запросов к SQLite в анкете": survey_reads,
+        "мкс/повторная проверка": lookup_seconds / len(lookups) * 1e6,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=50000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    users = list(range(1, args.users + 1))
+    lookups = [rng.choice(users) for _ in range(args.lookups)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for title in ("AsyncDatabase", "LeadCache"):
+            db = AsyncDatabase(Database(os.path.join(tmp, f"{title}.db")))
+            store = LeadCache(db, max_size=args.users) if title == "LeadCache" else db
+            results[title] = await run(store, users, lookups)
+            db.close()
+
+    print(f"{args.users} анкет, {args.lookups} повторных проверок")
+    print(f"{'':<28}" + "".join(f"{title:>16}" for title in results))
+    for metric in results["LeadCache"]:
+        print(f"{metric:<28}" + "".join(f"{values[metric]:>16.1f}" for values in results.values()))
+    print(f"кэш: попаданий {LEAD_CACHE_LOOKUPS.get('hit')}, промахов {LEAD_CACHE_LOOKUPS.get('miss')}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""Выгрузка leads в CSV (gzip): скорость и пиковая память от размера таблицы.
+
+Для каждого размера из --rows строит таблицу leads, выгружает её
+export.export_leads (страницами в файл) и export_leads_async (как в /export)
+и для сравнения - наивно: fetchall всей таблицы и сжатие в памяти (только до
+--naive-max строк: дальше не хватает памяти). Пиковая память меряется
+tracemalloc отдельным прогоном.
+
+Запуск из корня репозитория:
+    python -m benchmarks.lead_export [--rows 100000 1000000]
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from database import AsyncDatabase, Database
+from export import LEAD_COLUMNS, export_leads, export_leads_async
+
+
+def fill(database, rows):
+    now = datetime.now()
+
+    def generate():
+        for user_id in range(1, rows + 1):
+            start = now - timedelta(minutes=user_id % (60 * 24 * 365))
+            yield (user_id, f"Имя {user_id}", f"+7900{user_id:07d}", "Ростов‑на‑Дону", "🌃 Новостройка",
+                   "🧱 Бетон", 60, "💪 Ремонт под ключ (вся квартира)", "✔️ Да, ключи есть",
+                   "3–4 месяца", "😱 Всё сразу", "400–600 тыс", ("direct", "ads")[user_id % 2],
+                   "ожидает подтверждения", "pending", user_id % 3 != 0, start, start)
+
+    with database.transaction() as cursor:
+        cursor.executemany("""
+            INSERT INTO leads (user_id, name, phone, geography, object_type, condition, metrage,
+                               repair_format, keys_ready, deadline, main_fear, budget, source,
+                               appointment_time, appointment_status, survey_completed, start_time, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, generate())
+
+
+def naive(database, path):
+    rows = database._fetchall(f"SELECT {', '.join(LEAD_COLUMNS)} FROM leads")
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(LEAD_COLUMNS)
+    writer.writerows(rows)
+    data = gzip.compress(text.getvalue().encode())
+    with open(path, "wb") as file:
+        file.write(data)
+    return len(rows)
+
+
+def measure(func):
+    started = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def run(args):
+    print(f"{'строк':>9}  {'способ':<18}{'строк/с':>10}{'пик памяти':>12}{'файл':>10}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            database = Database(os.path.join(tmp, "leads.db"))
+            fill(database, rows)
+            db = AsyncDatabase(database)
+            path = os.path.join(tmp, "leads.csv.gz")
+            variants = [
+                ("export_leads", lambda: export_leads(database, path)),
+                ("export_leads_async", lambda: asyncio.run(export_leads_async(db, path))),
+            ]
+            if rows <= args.naive_max:
+                variants.append(("fetchall в памяти", lambda: naive(database, path)))
+            for name, func in variants:
+                count, elapsed, peak = measure(func)
+                assert count == rows
+                size = os.path.getsize(path)
+                print(f"{rows:>9}  {name:<18}{count / elapsed:>10.0f}{peak / 2 ** 20:>10.1f} МБ"
+                      f"{size / 2 ** 20:>7.1f} МБ")
+            db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--naive-max", type=int, default=200000)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
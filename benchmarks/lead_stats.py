@@ -0,0 +1,128 @@
+"""Сводка /stats: lead_stats против GROUP BY по leads.
+
+Заполняет leads --rows строками (разные дни, источники, города и бюджеты),
+пересобирает lead_stats так же, как миграция, и сравнивает запросы /stats к
+сводке с GROUP BY по всей таблице (результаты обязаны совпасть). Затем
+замеряет цену поддержки сводки в save_lead: новые заявки и повторные
+сохранения против той же записи без обновления сводки.
+
+Запуск из корня репозитория:
+    python -m benchmarks.lead_stats [--rows 1000000] [--saves 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database import LEAD_STATS_DIMENSIONS, Database, _create_lead_stats
+
+SOURCES = ["direct", "vk_ads", "yandex", "avito", "site", "friend"]
+CITIES = ["Ростов‑на‑Дону", "Аксай", "Батайск", "Другой город"]
+BUDGETS = ["до 400 тыс", "400–600 тыс", "600–900 тыс", "900 тыс+", "Не указан"]
+SECTIONS = {"day": 14, "source": 10, "geography": 10, "budget": 10}
+
+
+def fill(database, rows):
+    rnd = random.Random(42)
+    now = datetime.now()
+
+    def generate():
+        for user_id in range(1, rows + 1):
+            created = now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+            yield (user_id, f"+7900{user_id:07d}", rnd.choice(CITIES), rnd.choice(BUDGETS),
+                   rnd.choice(SOURCES), int(rnd.random() < 0.6), created, created)
+
+    with database.transaction() as cursor:
+        cursor.executemany("""
+            INSERT INTO leads (user_id, phone, geography, budget, source, survey_completed, start_time, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, generate())
+
+
+def naive(database, dimension, limit):
+    order = "key DESC" if dimension == "day" else "leads DESC, key"
+    return database._fetchall(f"""
+        SELECT {LEAD_STATS_DIMENSIONS[dimension]} AS key, COUNT(*) AS leads FROM leads
+        WHERE survey_completed = 1 GROUP BY key ORDER BY {order} LIMIT ?
+    """, (limit,))
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def lead(user_id):
+    return {"user_id": user_id, "phone": f"+7901{user_id:07d}", "geography": "Аксай", "budget": "400–600 тыс",
+            "source": "vk_ads", "survey_completed": 1, "start_time": datetime.now()}
+
+
+def save_without_stats(database, data):
+    with database.transaction() as cursor:
+        cursor.execute("""
+            INSERT OR REPLACE INTO leads (user_id, phone, geography, budget, source, survey_completed,
+                                          start_time, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (data["user_id"], data["phone"], data["geography"], data["budget"], data["source"],
+              data["survey_completed"], data["start_time"], datetime.now()))
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(os.path.join(tmp, "leads.db"))
+        fill(database, args.rows)
+        started = time.perf_counter()
+        with database.transaction() as cursor:
+            cursor.execute("DELETE FROM lead_stats")
+            _create_lead_stats(cursor)
+        print(f"{args.rows} строк leads, пересборка lead_stats: {time.perf_counter() - started:.2f} с")
+
+        for dimension, limit in SECTIONS.items():
+            assert database.get_lead_stats(dimension, limit) == naive(database, dimension, limit), dimension
+
+        def stats():
+            for dimension, limit in SECTIONS.items():
+                database.get_lead_stats(dimension, limit)
+
+        def group_by():
+            for dimension, limit in SECTIONS.items():
+                naive(database, dimension, limit)
+
+        print(f"/stats из lead_stats:    {timed(stats, 50) * 1000:8.2f} мс")
+        print(f"/stats через GROUP BY:   {timed(group_by, 3) * 1000:8.2f} мс")
+
+        base = args.rows + 1
+        for title, save, offset in (("без сводки", lambda data: save_without_stats(database, data), 0),
+                                    ("со сводкой", database.save_lead, args.saves)):
+            users = range(base + offset, base + offset + args.saves)
+            started = time.perf_counter()
+            for user_id in users:
+                save(lead(user_id))
+            new = (time.perf_counter() - started) / args.saves
+            started = time.perf_counter()
+            for user_id in users:
+                save(lead(user_id))
+            again = (time.perf_counter() - started) / args.saves
+            print(f"save_lead {title}: новая заявка {new * 1e6:6.0f} мкс, повторная {again * 1e6:6.0f} мкс")
+
+        total = database.get_lead_stats("total", 1)[0][1]
+        assert total == naive(database, "total", 1)[0][1] - args.saves, "сводка разошлась с leads"
+        database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--saves", type=int, default=2000)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
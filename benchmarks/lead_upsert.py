@@ -0,0 +1,139 @@
+"""Запись в leads: INSERT OR REPLACE против UPSERT на большой таблице.
+
+Строит таблицу leads на --rows заполненных заявок (со всеми индексами),
+копирует базу и на каждой копии прогоняет одну и ту же нагрузку: --ops
+вернувшихся пользователей жмут /start (update_start_time), половина из них
+затем заново сохраняет заявку (save_lead). Прежние запросы INSERT OR REPLACE
+сравниваются с текущими методами Database. Считаются время операции,
+объём WAL (сколько страниц переписано), рост файла и свободных страниц,
+расход AUTOINCREMENT id и заявки, потерявшие телефон.
+
+Запуск из корня репозитория:
+    python -m benchmarks.lead_upsert [--rows 500000] [--ops 20000]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from database import Database
+
+OLD_UPDATE_START_TIME = """
+    INSERT OR REPLACE INTO leads (user_id, start_time, created_at, survey_completed)
+    VALUES (?, ?, ?, ?)
+"""
+OLD_SAVE_LEAD = """
+    INSERT OR REPLACE INTO leads
+    (user_id, name, phone, geography, object_type, condition, metrage,
+     repair_format, keys_ready, deadline, main_fear, budget, source,
+     appointment_time, appointment_status, survey_completed, start_time, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def lead(user_id, start_time):
+    return {
+        "user_id": user_id, "name": f"Имя {user_id}", "phone": f"+7900{user_id:07d}",
+        "geography": "Ростов‑на‑Дону", "object_type": "🌃 Новостройка", "condition": "🧱 Бетон",
+        "metrage": 60, "repair_format": "💪 Ремонт под ключ (вся квартира)", "keys_ready": "✔️ Да, ключи есть",
+        "deadline": "3–4 месяца", "main_fear": "😱 Всё сразу", "budget": "400–600 тыс", "source": "direct",
+        "appointment_time": "ожидает подтверждения", "appointment_status": "pending",
+        "survey_completed": 1, "start_time": start_time,
+    }
+
+
+def build(path, rows):
+    database = Database(path)
+    now = datetime.now()
+    with database.transaction() as cursor:
+        cursor.executemany(OLD_SAVE_LEAD, (
+            (*lead(user_id, now).values(), now) for user_id in range(1, rows + 1)
+        ))
+        cursor.execute("DELETE FROM lead_stats")
+    database.close()
+
+
+def old_methods(database):
+    def update_start_time(user_id):
+        now = datetime.now()
+        with database.transaction() as cursor:
+            cursor.execute(OLD_UPDATE_START_TIME, (user_id, now, now, 0))
+        return now
+
+    def save_lead(data):
+        with database.transaction() as cursor:
+            cursor.execute(OLD_SAVE_LEAD, (*data.values(), datetime.now()))
+
+    return update_start_time, save_lead
+
+
+def run_workload(path, variant, users):
+    database = Database(path)
+    conn = database.conn
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA wal_autocheckpoint = 0")
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+    seq_before = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'leads'").fetchone()[0]
+
+    if variant == "UPSERT":
+        update_start_time, save_lead = database.update_start_time, database.save_lead
+    else:
+        update_start_time, save_lead = old_methods(database)
+
+    started = time.perf_counter()
+    for number, user_id in enumerate(users):
+        start_time = update_start_time(user_id)
+        if number % 2:
+            data = lead(user_id, start_time)
+            if variant == "UPSERT":
+                # Текущий save_lead пишет только переданные поля
+                data = {key: data[key] for key in ("user_id", "phone", "survey_completed", "start_time")}
+            save_lead(data)
+    elapsed = time.perf_counter() - started
+
+    wal = os.path.getsize(path + "-wal")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    seq_after = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'leads'").fetchone()[0]
+    lost = conn.execute("SELECT COUNT(*) FROM leads WHERE phone IS NULL OR geography IS NULL").fetchone()[0]
+    database.close()
+    return {
+        "мкс/оп": elapsed / len(users) * 1e6,
+        "WAL, МБ": wal / 2 ** 20,
+        "стр. WAL/оп": wal / page_size / len(users),
+        "рост файла, стр.": pages_after - pages_before,
+        "свободных стр.": freelist,
+        "новых id": seq_after - seq_before,
+        "потеряли ответы": lost,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--ops", type=int, default=20000)
+    args = parser.parse_args()
+
+    users = random.Random(42).sample(range(1, args.rows + 1), args.ops)
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "base.db")
+        build(base, args.rows)
+        results = {}
+        for variant in ("INSERT OR REPLACE", "UPSERT"):
+            path = os.path.join(tmp, f"{variant}.db")
+            shutil.copy(base, path)
+            results[variant] = run_workload(path, variant, users)
+
+    print(f"{args.rows} заявок, {args.ops} повторных /start, из них {args.ops // 2} повторных заявок")
+    print(f"{'':<20}" + "".join(f"{variant:>20}" for variant in results))
+    for metric in results["UPSERT"]:
+        print(f"{metric:<20}" + "".join(f"{values[metric]:>20.1f}" for values in results.values()))
+
+
+if __name__ == "__main__":
+    main()
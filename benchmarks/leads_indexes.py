@@ -0,0 +1,109 @@
+"""Выборки по незаполненным анкетам на синтетической таблице leads.
+
+Строит таблицу на --rows строк схемой до миграций (без индексов, с NULL в
+survey_completed), замеряет горячие запросы, затем прогоняет миграции
+Database.init_db и замеряет те же выборки повторно.
+
+Запуск из корня репозитория:
+    python -m benchmarks.leads_indexes [--rows 1000000] [--pending-share 0.3]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database import MIGRATIONS, Database
+
+OLD_QUERIES = {
+    "users_without_survey": (
+        "SELECT user_id FROM leads WHERE survey_completed = 0 OR survey_completed IS NULL", ()),
+    "users_with_start_time": ("""
+        SELECT user_id, start_time, name, phone FROM leads
+        WHERE start_time IS NOT NULL AND survey_completed = 0
+        ORDER BY start_time DESC
+    """, ()),
+}
+
+
+def build_legacy_db(path, rows, pending_share):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN")
+    MIGRATIONS[0](conn.cursor())
+    conn.execute("PRAGMA user_version = 1")
+
+    now = datetime.now()
+    rnd = random.Random(42)
+
+    def generate():
+        for user_id in range(1, rows + 1):
+            start = now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+            pending = rnd.random() < pending_share
+            completed = (None if rnd.random() < 0.1 else 0) if pending else 1
+            yield (user_id, f"Имя {user_id}", f"+7900{user_id:07d}", "Ростов‑на‑Дону", "🌃 Новостройка",
+                   "🧱 Бетон", 60, "💪 Ремонт под ключ (вся квартира)", "✔️ Да, ключи есть",
+                   "3–4 месяца", "😱 Всё сразу", "400–600 тыс", "ads", completed, start, start)
+
+    conn.executemany("""
+        INSERT INTO leads (user_id, name, phone, geography, object_type, condition, metrage,
+                           repair_format, keys_ready, deadline, main_fear, budget, source,
+                           survey_completed, start_time, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, generate())
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--pending-share", type=float, default=0.3, help="доля незаполненных анкет")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "leads.db")
+        print(f"Генерация {args.rows} строк...")
+        build_legacy_db(path, args.rows, args.pending_share)
+
+        conn = sqlite3.connect(path)
+        started_before = datetime.now() - timedelta(hours=1)
+        before = {name: timed(lambda: conn.execute(sql, params).fetchall(), args.repeat)
+                  for name, (sql, params) in OLD_QUERIES.items()}
+        before["overdue_followups"] = timed(lambda: conn.execute("""
+            SELECT user_id FROM leads
+            WHERE (survey_completed = 0 OR survey_completed IS NULL) AND start_time <= ?
+        """, (started_before,)).fetchall(), args.repeat)
+        conn.close()
+
+        started = time.perf_counter()
+        db = Database(path)
+        migration_time = time.perf_counter() - started
+
+        after = {
+            "users_without_survey": timed(db.get_all_users_without_survey, args.repeat),
+            "users_with_start_time": timed(db.get_all_users_with_start_time, args.repeat),
+            "overdue_followups": timed(
+                lambda: db.get_all_users_without_survey(started_before=started_before), args.repeat),
+        }
+        db.close()
+
+    print(f"Миграции: {migration_time:.1f} с")
+    print(f"{'запрос':<24}{'до, мс':>10}{'после, мс':>12}{'ускорение':>12}")
+    for name in after:
+        print(f"{name:<24}{before[name]:>10.1f}{after[name]:>12.1f}{before[name] / after[name]:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
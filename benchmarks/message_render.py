@@ -0,0 +1,89 @@
+"""Сборка ответов: литералы и цепочка проверок в обработчике против каталога сообщений.
+
+Приветствие: f-строка из литералов (без экранирования имени и с ним) против
+Template.render (с экранированием имени для Markdown) и готового статического
+текста. Ответ на главную тревогу: прежняя цепочка проверок подстрок против
+поиска ключа в FEAR_REPLIES.
+
+Запуск из корня репозитория:
+    python -m benchmarks.message_render [--messages 1000000]
+"""
+import argparse
+import random
+import time
+
+from messages import MESSAGES, escape_markdown
+from survey import SURVEY_STEPS, keyboard_rows
+from states import MAIN_FEAR
+
+# Копия FEAR_REPLIES из bot.py (импорт bot открывает базу)
+FEAR_REPLIES = {
+    "💸 Боюсь, что смета вырастет": 'fear_estimate',
+    "⏳ Боюсь, что сроки затянутся": 'fear_timing',
+    "🧱 Боюсь, что сделают плохо/скрытые косяки": 'fear_quality',
+    "😱 Всё сразу": 'fear_all',
+}
+
+
+def old_greeting(first_name):
+    return (
+        f"👋 Здравствуйте, {first_name}!\n\n"
+        "Вас приветствует команда **Дом Ремонта**\n\n"
+        "Поможем за 2 минуты:\n"
+        "1️⃣ рассчитать стоимость работ\n"
+        "2️⃣ понять, *уложитесь* ли вы в бюджет\n\n"
+        "Начнём❓"
+    )
+
+
+def old_fear(fear):
+    """Прежний выбор в budget_handler (тексты - из каталога, важен только выбор)"""
+    if "смета вырастет" in fear:
+        return 'fear_estimate'
+    elif "сроки" in fear:
+        return 'fear_timing'
+    elif "качество" in fear or "скрытые" in fear:
+        return 'fear_quality'
+    elif "Всё сразу" in fear or "всё сразу" in fear:
+        return 'fear_all'
+    return 'fear_other'
+
+
+def new_fear(fear):
+    return FEAR_REPLIES.get(fear, 'fear_other')
+
+
+def measure(func, values):
+    started = time.perf_counter()
+    for value in values:
+        func(value)
+    return (time.perf_counter() - started) / len(values) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    names = [rnd.choice(["Анна", "Иван", "Мария", "Сергей"]) for _ in range(args.messages)]
+    step = next(step for step in SURVEY_STEPS if step.state == MAIN_FEAR)
+    fears = [button for row in keyboard_rows(step)[:-1] for button in row]
+    assert [old_fear(fear) for fear in fears] == [new_fear(fear) for fear in fears]
+    fears = [rnd.choice(fears) for _ in range(args.messages)]
+
+    greeting = MESSAGES.get('greeting')
+    menu = MESSAGES.get('menu_offer')
+    print(f"{'':<32}{'нс/сообщение':>14}")
+    print(f"{'приветствие, f-строка':<32}{measure(old_greeting, names):>14.0f}")
+    print(f"{'приветствие, f-строка + escape':<32}"
+          f"{measure(lambda name: old_greeting(escape_markdown(name)), names):>14.0f}")
+    print(f"{'приветствие, Template.render':<32}"
+          f"{measure(lambda name: greeting.render(first_name=name), names):>14.0f}")
+    print(f"{'статический текст, render':<32}{measure(lambda _: menu.render(), names):>14.0f}")
+    print(f"{'тревога, цепочка in':<32}{measure(old_fear, fears):>14.0f}")
+    print(f"{'тревога, FEAR_REPLIES':<32}{measure(new_fear, fears):>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Накладные расходы метрик на один вызов обработчика.
+
+Сравнивает пустой асинхронный обработчик без обёртки и обёрнутый
+metrics.timed (как делает instrument_handlers), а также стоимость
+Histogram.observe. Завершается с кодом 1, если обёртка добавляет больше
+--budget микросекунд на вызов.
+
+Запуск из корня репозитория:
+    python -m benchmarks.metrics_overhead [--calls 200000] [--budget 3]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from metrics import Histogram, Registry, timed
+
+
+async def handler(update, context):
+    return 1
+
+
+async def per_call(func, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        await func(None, None)
+    return (time.perf_counter() - started) / calls
+
+
+async def run(args):
+    histogram = Histogram("bench_seconds", "Бенчмарк", "handler", registry=Registry())
+    wrapped = timed(histogram, "handler")(handler)
+
+    # Лучшее из нескольких повторов, чтобы не мерить шум планировщика
+    bare = min([await per_call(handler, args.calls) for _ in range(args.repeat)])
+    instrumented = min([await per_call(wrapped, args.calls) for _ in range(args.repeat)])
+
+    started = time.perf_counter()
+    for _ in range(args.calls):
+        histogram.observe("handler", 0.003)
+    observe = (time.perf_counter() - started) / args.calls
+
+    overhead = (instrumented - bare) * 1e6
+    print(f"Без метрик:        {bare * 1e6:.2f} мкс/вызов")
+    print(f"С metrics.timed:   {instrumented * 1e6:.2f} мкс/вызов")
+    print(f"Histogram.observe: {observe * 1e6:.2f} мкс")
+    print(f"Накладные расходы: {overhead:.2f} мкс/вызов (бюджет {args.budget} мкс)")
+    return overhead <= args.budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=3.0, help="допустимые накладные расходы, мкс")
+    if not asyncio.run(run(parser.parse_args())):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
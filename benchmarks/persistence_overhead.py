@@ -0,0 +1,129 @@
+"""Накладные расходы SQLitePersistence на одно обновление.
+
+Прогоняет через Application с ConversationHandler (шаги анкеты пишут ответ
+в user_data и переводят диалог дальше) --users пользователей по --steps
+сообщений в трёх режимах:
+    без persistence;
+    запись после каждого обновления (update_persistence на каждое сообщение);
+    пачками - update_persistence раз в --batch обновлений, как делает
+    Application раз в update_interval.
+Затем поднимает новый Application на той же базе и проверяет, что все
+диалоги и user_data восстановились.
+
+Запуск из корня репозитория:
+    python -m benchmarks.persistence_overhead [--users 500] [--steps 10] [--batch 500]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from telegram import Chat, Message, Update, User
+from telegram.ext import Application, ConversationHandler, MessageHandler, PersistenceInput, filters
+
+from benchmarks.fake_bot_api import TOKEN, FakeBotApi
+from database import AsyncDatabase, Database
+from persistence import SQLitePersistence
+
+
+def build_application(server, steps, persistence=None):
+    async def step(update, context):
+        state = len(context.user_data)
+        context.user_data[f"step_{state}"] = update.message.text
+        return state + 1 if state + 1 < steps else ConversationHandler.END
+
+    builder = Application.builder().token(TOKEN).base_url(server.base_url).updater(None).job_queue(None)
+    if persistence:
+        builder = builder.persistence(persistence)
+    application = builder.build()
+    application.add_handler(ConversationHandler(
+        entry_points=[MessageHandler(filters.TEXT, step)],
+        states={state: [MessageHandler(filters.TEXT, step)] for state in range(1, steps)},
+        fallbacks=[],
+        name="survey",
+        persistent=persistence is not None,
+    ))
+    return application
+
+
+def make_updates(users, steps):
+    """Сообщения пользователей вперемешку, как при живом трафике"""
+    update_ids = itertools.count(1)
+    now = datetime.now()
+    for number in range(steps - 1):
+        for user_id in range(1, users + 1):
+            user = User(user_id, f"user{user_id}", False)
+            chat = Chat(user_id, Chat.PRIVATE)
+            message = Message(next(update_ids), now, chat, from_user=user, text=f"ответ {number}")
+            yield Update(next(update_ids), message=message)
+
+
+def make_persistence(db):
+    return SQLitePersistence(db, store_data=PersistenceInput(chat_data=False, bot_data=False, callback_data=False))
+
+
+async def measure(application, updates, every=None):
+    """Среднее время на обновление, мкс; every - вызывать update_persistence раз в every обновлений"""
+    await application.initialize()
+    started = time.perf_counter()
+    for number, update in enumerate(updates, start=1):
+        await application.process_update(update)
+        if every and number % every == 0:
+            await application.update_persistence()
+    if every:
+        await application.update_persistence()
+        await application.persistence.flush()
+    elapsed = time.perf_counter() - started
+    await application.shutdown()
+    return elapsed / len(updates) * 1e6
+
+
+async def run(args, tmp):
+    server = FakeBotApi()
+    await server.start()
+    updates = list(make_updates(args.users, args.steps))
+
+    results = {}
+    try:
+        results["без persistence"] = await measure(build_application(server, args.steps), updates)
+        for name, every in (("каждое обновление", 1), (f"пачками по {args.batch}", args.batch)):
+            db = AsyncDatabase(Database(os.path.join(tmp, f"leads_{every}.db")))
+            application = build_application(server, args.steps, make_persistence(db))
+            results[name] = await measure(application, updates, every)
+
+            # Перезапуск: диалоги и ответы должны подняться из базы
+            restored = build_application(server, args.steps, make_persistence(db))
+            await restored.initialize()
+            conversations = await restored.persistence.get_conversations("survey")
+            answers = sum(len(data) for data in restored.user_data.values())
+            await restored.shutdown()
+            db.close()
+            assert len(conversations) == args.users, len(conversations)
+            assert answers == args.users * (args.steps - 1), answers
+    finally:
+        await server.stop()
+
+    base = results["без persistence"]
+    print(f"{len(updates)} обновлений, {args.users} пользователей")
+    print(f"{'режим':<24}{'мкс/обновление':>16}{'накладные, мкс':>16}")
+    for name, per_update in results.items():
+        print(f"{name:<24}{per_update:>16.1f}{per_update - base:>16.1f}")
+    print(f"После перезапуска восстановлено {args.users} диалогов")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=500, help="обновлений между update_persistence")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(args, tmp))
+
+
+if __name__ == "__main__":
+    main()
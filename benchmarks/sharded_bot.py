@@ -0,0 +1,147 @@
+"""Многопроцессный стенд: bot.py в режиме BOT_MODE=sharded на заглушке Bot API.
+
+Для каждого числа шардов из --shards запускает настоящий bot.py (маршрутизатор
+и процессы-шарды) во временном каталоге со своей leads.db, прогоняет через
+маршрутизатор полную анкету --users пользователей (шаги одного пользователя -
+по очереди, пользователи - параллельно) и ждёт, пока бот перестанет слать
+ответы. Печатает обновлений в секунду, число сохранённых заявок и число
+ведущих процессов (действующая аренда в таблице leases должна быть одна).
+
+На машине с одним ядром прирост от шардов ограничен процессором; стенд
+показывает прежде всего корректность разделения и общей базы.
+
+Запуск из корня репозитория:
+    python -m benchmarks.sharded_bot [--shards 1 2 4] [--users 200] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+from benchmarks.fake_bot_api import TOKEN, FakeBotApi
+from benchmarks.survey_script import SURVEY_ANSWERS, survey_update
+from webhook import SECRET_HEADER
+
+BOT_PATH = Path(__file__).resolve().parent.parent / "bot.py"
+SECRET = "bench-secret"
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_healthy(session, urls, timeout=60):
+    deadline = time.monotonic() + timeout
+    pending = list(urls)
+    while pending:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"не поднялись: {pending}")
+        try:
+            async with session.get(pending[0]) as response:
+                if response.status == 200 and (await response.json())["status"] == "ok":
+                    pending.pop(0)
+                    continue
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+
+
+async def wait_idle(server, idle=1.0):
+    """Ожидание, пока бот не перестанет обращаться к Bot API. Возвращает время последнего вызова"""
+    last_total, last_change = -1, time.perf_counter()
+    while time.perf_counter() - last_change < idle:
+        total = sum(server.calls.values())
+        if total != last_total:
+            last_total, last_change = total, time.perf_counter()
+        await asyncio.sleep(0.02)
+    return last_change
+
+
+async def run_survey(session, url, user_id, update_ids):
+    for answer in SURVEY_ANSWERS:
+        body = json.dumps(survey_update(next(update_ids), user_id, answer))
+        async with session.post(url, data=body, headers={SECRET_HEADER: SECRET,
+                                                         "Content-Type": "application/json"}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"маршрутизатор ответил {response.status}")
+
+
+async def measure(server, shards, users):
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        base_port = free_port()
+        env = dict(
+            os.environ,
+            BOT_TOKEN=TOKEN,
+            BOT_API_BASE_URL=server.base_url,
+            BOT_MODE="sharded",
+            SHARD_COUNT=str(shards),
+            WEBHOOK_LISTEN="127.0.0.1",
+            WEBHOOK_PORT=str(port),
+            SHARD_BASE_PORT=str(base_port),
+            WEBHOOK_SECRET=SECRET,
+            WEBHOOK_URL="",
+        )
+        env.pop("SHARD_INDEX", None)
+        log = open(os.path.join(tmp, "bot.log"), "w")
+        router = subprocess.Popen([sys.executable, str(BOT_PATH)], cwd=tmp, env=env, stdout=log, stderr=log)
+        try:
+            async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+                await wait_healthy(session, [f"http://127.0.0.1:{port}/health"] + [
+                    f"http://127.0.0.1:{base_port + index}/health" for index in range(shards)])
+                server.calls.clear()
+
+                update_ids = iter(range(1, 10 ** 9))
+                url = f"http://127.0.0.1:{port}/telegram"
+                started = time.perf_counter()
+                await asyncio.gather(*(run_survey(session, url, user_id, update_ids)
+                                       for user_id in range(1, users + 1)))
+                finished = await wait_idle(server)
+
+                conn = sqlite3.connect(os.path.join(tmp, "leads.db"))
+                leaders = conn.execute("SELECT COUNT(*) FROM leases WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+                leads = conn.execute("SELECT COUNT(*) FROM leads WHERE survey_completed = 1").fetchone()[0]
+                conn.close()
+        finally:
+            router.send_signal(signal.SIGTERM)
+            await asyncio.to_thread(router.wait, 60)
+            log.close()
+
+    updates = users * len(SURVEY_ANSWERS)
+    return updates / (finished - started), sum(server.calls.values()), leads, leaders
+
+
+async def run(args):
+    server = FakeBotApi(latency=args.latency)
+    await server.start()
+    print(f"{args.users} пользователей x {len(SURVEY_ANSWERS)} обновлений, задержка Bot API {args.latency * 1000:.0f} мс")
+    print(f"{'шардов':<8}{'обновл/с':>10}{'вызовов API':>13}{'заявок':>8}{'ведущих':>9}")
+    try:
+        for shards in args.shards:
+            rate, calls, leads, leaders = await measure(server, shards, args.users)
+            print(f"{shards:<8}{rate:>10.0f}{calls:>13}{leads:>8}{leaders:>9}")
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка заглушки Bot API, с")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
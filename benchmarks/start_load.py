@@ -0,0 +1,118 @@
+"""Нагрузочный тест /start: тысячи одновременных апдейтов через обработчики bot.py.
+
+Bot API подменяется заглушкой с искусственной сетевой задержкой, база -
+временный файл. Скрипт печатает p50/p99 задержки обработчика и максимальную
+паузу цикла событий (насколько обработчики его блокируют).
+
+Запуск из корня репозитория:
+    python -m benchmarks.start_load [--users 5000] [--net-delay 0.05]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+
+class FakeMessage:
+    def __init__(self, net_delay):
+        self.net_delay = net_delay
+        self.text = "/start"
+        self.contact = None
+
+    async def reply_text(self, *args, **kwargs):
+        await asyncio.sleep(self.net_delay)
+
+
+class FakeBot:
+    def __init__(self, net_delay):
+        self.net_delay = net_delay
+
+    async def _call(self, *args, **kwargs):
+        await asyncio.sleep(self.net_delay)
+        # MediaCache берёт file_id из ответа на первую загрузку
+        return SimpleNamespace(photo=[SimpleNamespace(file_id="fake-photo")],
+                               document=SimpleNamespace(file_id="fake-document"))
+
+    send_photo = send_message = send_document = _call
+
+
+class FakeJobQueue:
+    """Автосообщения в замере не участвуют"""
+
+    def run_once(self, *args, **kwargs):
+        pass
+
+
+def make_update(user_id, net_delay):
+    user = SimpleNamespace(id=user_id, first_name=f"user{user_id}", last_name=None, username=None,
+                           language_code="ru")
+    message = FakeMessage(net_delay)
+    return SimpleNamespace(effective_user=user, message=message, effective_message=message)
+
+
+def make_context(bot):
+    return SimpleNamespace(args=["ads"], user_data={}, bot=bot, job_queue=FakeJobQueue())
+
+
+async def loop_lag_probe(stop, lags):
+    """Замер максимальной задержки пробуждения цикла событий"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - started - 0.001)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(args, bot_module):
+    fake_bot = FakeBot(args.net_delay)
+    latencies = []
+
+    async def one(user_id):
+        started = time.perf_counter()
+        await bot_module.start(make_update(user_id, args.net_delay), make_context(fake_bot))
+        latencies.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    lags = []
+    probe = asyncio.create_task(loop_lag_probe(stop, lags))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(user_id) for user_id in range(1, args.users + 1)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+
+    print(f"Апдейтов /start:      {args.users}")
+    print(f"Общее время:          {elapsed:.2f} с ({args.users / elapsed:.0f} апд/с)")
+    print(f"p50 обработчика:      {statistics.median(latencies) * 1000:.1f} мс")
+    print(f"p99 обработчика:      {percentile(latencies, 99) * 1000:.1f} мс")
+    print(f"Макс. пауза цикла:    {max(lags) * 1000:.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--net-delay", type=float, default=0.05, help="задержка Bot API, с")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # bot.py открывает leads.db в текущем каталоге при импорте
+        os.chdir(tmp)
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import bot
+
+        asyncio.run(run(args, bot))
+        bot.db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Стоимость разбора одного ответа анкеты в SurveyEngine по шагам.
+
+Каждый шаг получает --answers ответов (кнопки шага и произвольный текст),
+Bot API не вызывается: reply_text - пустая корутина. Для сравнения - поиск
+кнопки последовательным сравнением со всеми кнопками шага, как в цепочках
+if/elif, и поиск по словарю движка.
+
+Запуск из корня репозитория:
+    python -m benchmarks.survey_dispatch [--answers 100000]
+"""
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from keyboards import SURVEY_KEYBOARDS
+from states import *
+from survey import RESTART_BUTTON, SURVEY_STEPS, SurveyEngine, keyboard_rows
+
+
+class FakeMessage:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+    async def reply_text(self, *args, **kwargs):
+        pass
+
+
+async def noop(update, context):
+    return RESULT
+
+
+def answers_for(step):
+    """Ответы шага: его кнопки (кроме перезапуска) и свой текст"""
+    if step.rows is None:
+        return ["72", "25", "много"]
+    buttons = [button for row in keyboard_rows(step) for button in row if button != RESTART_BUTTON]
+    return buttons + ["свой ответ"]
+
+
+def linear_lookup(buttons, text):
+    for button in buttons:
+        if text == button:
+            return button
+    return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=100000)
+    args = parser.parse_args()
+
+    engine = SurveyEngine(SURVEY_STEPS, SURVEY_KEYBOARDS, on_restart=noop, exits={RESULT: noop})
+    rnd = random.Random(1)
+    print(f"{'шаг':<20}{'кнопок':>8}{'мкс/ответ':>12}{'if/elif, нс':>14}{'словарь, нс':>14}")
+    for step in SURVEY_STEPS:
+        updates = [SimpleNamespace(message=FakeMessage(rnd.choice(answers_for(step))))
+                   for _ in range(args.answers)]
+        context = SimpleNamespace(user_data={})
+
+        started = time.perf_counter()
+        for update in updates:
+            await engine.dispatch(step.state, update, context)
+        dispatch = (time.perf_counter() - started) / args.answers * 1e6
+
+        texts = [update.message.text for update in updates]
+        buttons = [button for row in keyboard_rows(step) or () for button in row]
+        started = time.perf_counter()
+        for text in texts:
+            linear_lookup(buttons, text)
+        linear = (time.perf_counter() - started) / args.answers * 1e9
+
+        options = engine._options[step.state]
+        started = time.perf_counter()
+        for text in texts:
+            options.get(text)
+        indexed = (time.perf_counter() - started) / args.answers * 1e9
+
+        print(f"{step.field:<20}{len(buttons):>8}{dispatch:>12.2f}{linear:>14.0f}{indexed:>14.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""Сценарий полного прохождения анкеты для бенчмарков.
+
+survey_update собирает обновление в формате Bot API (словарь, как в ответе
+getUpdates и в теле webhook), script - поток обновлений для нескольких
+пользователей. Из командной строки сценарий пишется в JSONL, который читает
+FakeBotApi.load_script:
+
+    python -m benchmarks.survey_script --users 100 > survey.jsonl
+"""
+import argparse
+import json
+import sys
+import time
+
+# Полное прохождение анкеты: start -> geography_handler -> ... -> contact_handler
+SURVEY_ANSWERS = [
+    "/start",
+    "✅ Начать тест",
+    "🏙 Ростов‑на‑Дону",
+    "🌃 Новостройка",
+    "🧱 Бетон",
+    "60",
+    "💪 Ремонт под ключ (вся квартира)",
+    "✔️ Да, ключи есть",
+    "3–4 месяца",
+    "😱 Всё сразу",
+    "400–600 тыс",
+    "✅ Записаться на бесплатный замер",
+    None,   # контакт
+]
+
+
+def survey_update(update_id, user_id, answer):
+    """Обновление: текст ответа или (answer=None) отправка контакта"""
+    user = {"id": user_id, "is_bot": False, "first_name": f"Тест{user_id}"}
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": user,
+    }
+    if answer is None:
+        message["contact"] = {"phone_number": f"+7900{user_id:07d}", "first_name": user["first_name"],
+                              "user_id": user_id}
+    else:
+        message["text"] = answer
+        if answer.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(answer)}]
+    return {"update_id": update_id, "message": message}
+
+
+def script(users, first_user_id=1):
+    """Анкета users пользователей: шаг за шагом, на каждом шаге - все пользователи"""
+    update_id = 1
+    for answer in SURVEY_ANSWERS:
+        for user_id in range(first_user_id, first_user_id + users):
+            yield survey_update(update_id, user_id, answer)
+            update_id += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+    for update in script(args.users):
+        sys.stdout.write(json.dumps(update, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
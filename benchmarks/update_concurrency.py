@@ -0,0 +1,102 @@
+"""Пропускная способность обработки обновлений в зависимости от параллельности.
+
+Application получает --updates сообщений от --users пользователей через
+update_queue; обработчик ждёт --latency, имитируя медленный вызов Bot API
+(как send_photo в start). Сетевой клиент не участвует, чтобы мерить только
+планирование обновлений; заглушка Bot API нужна лишь для getMe. Для каждого лимита
+параллельности сравниваются PerUserUpdateProcessor и стандартный
+concurrent_updates(N) из PTB; считаются обновления, обработанные у
+пользователя не по порядку.
+
+Запуск из корня репозитория:
+    python -m benchmarks.update_concurrency [--updates 1000] [--users 200] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from telegram import Chat, Message, Update, User
+from telegram.ext import Application, MessageHandler, filters
+
+from benchmarks.fake_bot_api import TOKEN, FakeBotApi
+from update_processor import PerUserUpdateProcessor
+
+
+def make_updates(count, users):
+    now = datetime.now()
+    for update_id in range(1, count + 1):
+        user_id = update_id % users + 1
+        message = Message(update_id, now, Chat(user_id, Chat.PRIVATE),
+                          from_user=User(user_id, f"user{user_id}", False), text=str(update_id))
+        yield Update(update_id, message=message)
+
+
+async def measure(server, updates, concurrent_updates, latency):
+    done = asyncio.Event()
+    last_seen = {}
+    handled = 0
+    out_of_order = 0
+
+    async def reply(update, context):
+        nonlocal handled, out_of_order
+        user_id, number = update.effective_user.id, int(update.message.text)
+        # Порядок проверяется до и после вызова: переход состояния занимает весь обработчик
+        if last_seen.get(user_id, 0) > number:
+            out_of_order += 1
+        last_seen[user_id] = number
+        await asyncio.sleep(latency)
+        if last_seen[user_id] != number:
+            out_of_order += 1
+        handled += 1
+        if handled == len(updates):
+            done.set()
+
+    application = (
+        Application.builder().token(TOKEN).base_url(server.base_url)
+        .updater(None).job_queue(None).concurrent_updates(concurrent_updates).build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT, reply))
+    await application.initialize()
+    await application.start()
+    # Обновления приходят пачкой, как после простоя или при всплеске трафика
+    started = time.perf_counter()
+    for update in updates:
+        application.update_queue.put_nowait(update)
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    await application.stop()
+    await application.shutdown()
+    return len(updates) / elapsed, out_of_order
+
+
+async def run(args):
+    server = FakeBotApi()
+    await server.start()
+    updates = list(make_updates(args.updates, args.users))
+
+    print(f"{args.updates} обновлений от {args.users} пользователей, задержка Bot API {args.latency * 1000:.0f} мс")
+    print(f"{'параллельность':<16}{'процессор':<16}{'обновл/с':>10}{'не по порядку':>15}")
+    try:
+        for limit in args.limits:
+            variants = [("PerUser", PerUserUpdateProcessor(limit))]
+            if limit > 1:
+                variants.append(("PTB simple", limit))
+            for name, processor in variants:
+                rate, out_of_order = await measure(server, updates, processor, args.latency)
+                print(f"{limit:<16}{name:<16}{rate:>10.0f}{out_of_order:>15}")
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка вызова Bot API, с")
+    parser.add_argument("--limits", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
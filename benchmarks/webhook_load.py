@@ -0,0 +1,126 @@
+"""Нагрузочный генератор для webhook: POST синтетических Update в JSON.
+
+Без --url поднимает локальный WebhookServer с Application (обработчик только
+считает обновления, Bot API - заглушка) и меряет приём и обработку. С --url
+шлёт обновления на уже запущенный бот (например, BOT_MODE=webhook локально);
+тогда учитывается только приём.
+
+Запуск из корня репозитория:
+    python -m benchmarks.webhook_load [--updates 20000] [--concurrency 100]
+    python -m benchmarks.webhook_load --url http://127.0.0.1:8080/telegram --secret <WEBHOOK_SECRET>
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import aiohttp
+from telegram.ext import Application, MessageHandler, filters
+
+from benchmarks.fake_bot_api import TOKEN, FakeBotApi
+from webhook import SECRET_HEADER, WebhookServer
+
+
+def make_update(update_id, users):
+    user_id = update_id % users + 1
+    return json.dumps({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": "🏙 Аксай",
+        },
+    })
+
+
+async def post_updates(url, secret, bodies, concurrency):
+    """Отправка всех тел запросов; возвращает задержки ответов в мс и число ошибок"""
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers[SECRET_HEADER] = secret
+    latencies = []
+    errors = 0
+    queue = iter(bodies)
+
+    async def worker(session):
+        nonlocal errors
+        for body in queue:
+            started = time.perf_counter()
+            async with session.post(url, data=body, headers=headers) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    return latencies, errors
+
+
+def percentile(values, share):
+    return statistics.quantiles(values, n=100)[int(share * 100) - 1]
+
+
+async def run(args):
+    bodies = [make_update(update_id, args.users) for update_id in range(1, args.updates + 1)]
+    local = args.url is None
+    processed = asyncio.Event()
+    handled = 0
+
+    if local:
+        api = FakeBotApi()
+        await api.start()
+
+        async def count(update, context):
+            nonlocal handled
+            handled += 1
+            if handled == args.updates:
+                processed.set()
+
+        application = Application.builder().token(TOKEN).base_url(api.base_url).updater(None).build()
+        application.add_handler(MessageHandler(filters.TEXT, count))
+        await application.initialize()
+        await application.start()
+        server = WebhookServer(application, secret_token=args.secret, host="127.0.0.1", port=0)
+        await server.start()
+        url = f"http://127.0.0.1:{server.port}{server.path}"
+    else:
+        url = args.url
+
+    try:
+        started = time.perf_counter()
+        latencies, errors = await post_updates(url, args.secret, bodies, args.concurrency)
+        accepted = time.perf_counter() - started
+        if local:
+            await asyncio.wait_for(processed.wait(), timeout=60)
+            done = time.perf_counter() - started
+    finally:
+        if local:
+            await server.stop()
+            await application.stop()
+            await application.shutdown()
+            await api.stop()
+
+    print(f"Обновлений: {args.updates}, параллельных запросов: {args.concurrency}, ошибок: {errors}")
+    print(f"Приём:      {args.updates / accepted:10.0f} обновл/с")
+    if local:
+        print(f"Обработка:  {args.updates / done:10.0f} обновл/с")
+    print(f"Ответ, мс:  p50 {percentile(latencies, 0.5):.2f}  p99 {percentile(latencies, 0.99):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--url", help="адрес webhook запущенного бота")
+    parser.add_argument("--secret", default="bench-secret", help="значение WEBHOOK_SECRET")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
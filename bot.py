@@ -1,7 +1,6 @@
 import logging
 import asyncio
-import threading
-import time
+import functools
 from datetime import datetime, timedelta
 from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import (
@@ -10,16 +9,34 @@ from telegram.ext import (
     MessageHandler,
     CallbackQueryHandler,
     ConversationHandler,
+    PersistenceInput,
     filters,
     ContextTypes
 )
 import os
+import shlex
+import sys
+import tempfile
 from pathlib import Path
 
 import config
 from states import *
 from keyboards import *
-from database import Database
+from faq import FAQ_INDEX
+from survey import SURVEY_STEPS, SurveyEngine
+from messages import MESSAGES
+from database import Database, AsyncDatabase
+from media_cache import MediaCache
+from lead_cache import LeadCache
+from broadcast import BroadcastEngine, DeliveryLog, SENDING
+from persistence import SQLitePersistence
+from webhook import run_webhook
+from update_processor import PerUserUpdateProcessor
+from outbox import ManagerOutbox
+from sharding import LeaderElection, run_router, shard_for
+from metrics import ERRORS, LEADS_SAVED, InstrumentedRequest, MetricsServer, instrument_handlers
+from funnel import LEAD, FunnelRecorder, aggregate_funnel, format_funnel, track_transitions
+from export import MAX_DOCUMENT_SIZE, export_leads_async, parse_filters
 
 # Настройка логирования
 logging.basicConfig(
@@ -28,19 +45,82 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Инициализация базы данных
-db = Database("leads.db")
+# Инициализация базы данных (асинхронная обёртка, чтобы не блокировать цикл событий;
+# /start и заявки записываются пачками - одна транзакция на всплеск)
+db = AsyncDatabase(
+    Database("leads.db", synchronous=config.DB_SYNCHRONOUS),
+    group_commit=config.GROUP_COMMIT_METHODS,
+    commit_window=config.GROUP_COMMIT_WINDOW,
+    max_batch=config.GROUP_COMMIT_MAX_BATCH
+)
+
+# Кэш file_id для фото и файлов (каждый файл загружается в Telegram один раз)
+media_cache = MediaCache(db)
+
+# Время старта и признак заполненной анкеты в памяти (запись - сквозь кэш в базу)
+lead_cache = LeadCache(db, max_size=config.LEAD_CACHE_SIZE, ttl=config.LEAD_CACHE_TTL)
+
+# Рассылки с учётом лимитов Telegram
+broadcast_engine = BroadcastEngine(
+    rate=config.BROADCAST_RATE,
+    chat_interval=config.BROADCAST_CHAT_INTERVAL,
+    concurrency=config.BROADCAST_CONCURRENCY,
+    batch_size=config.BROADCAST_BATCH_SIZE
+)
+
+# Журналы доставки автосообщений (кампания = вид автосообщения)
+delivery_logs = {
+    kind: DeliveryLog(db, kind, batch_size=config.BROADCAST_BATCH_SIZE)
+    for kind in config.AUTO_MESSAGE_DELAYS
+}
 
 # ID менеджеров (список)
 MANAGER_IDS = config.ADMIN_IDS
 
+# Уведомления менеджерам идут через очередь в базе и фоновый обработчик
+manager_outbox = ManagerOutbox(
+    db,
+    digest_interval=config.MANAGER_DIGEST_INTERVAL,
+    poll_interval=config.MANAGER_OUTBOX_POLL_INTERVAL
+)
+
+# Рассылки и уведомления менеджерам выполняет один ведущий процесс
+leader_election = LeaderElection(db, ttl=config.LEADER_LEASE_TTL, renew_interval=config.LEADER_LEASE_TTL / 3)
+
+# Гистограммы обработчиков, запросов к БД и Bot API, счётчики заявок и ошибок
+metrics_server = MetricsServer(config.METRICS_LISTEN, config.METRICS_PORT + (config.SHARD_INDEX or 0))
+
+# Переходы анкеты для воронки (запись в базу пачками, не в обработчике)
+funnel_recorder = FunnelRecorder(db, batch_size=config.FUNNEL_BATCH_SIZE)
+
+
+def owns_user(user_id):
+    """Обслуживает ли пользователя этот процесс (шард - только свою долю пользователей)"""
+    return config.SHARD_INDEX is None or shard_for(user_id, config.SHARD_COUNT) == config.SHARD_INDEX
+
 # Путь к фото для приветствия
 MEDIA_DIR = Path(__file__).parent / "media"
 WELCOME_PHOTO_PATH = MEDIA_DIR / "welcome.jpg"
 
-# Глобальные флаги для рассылок
-broadcast_first_sent = False
-broadcast_second_sent = False
+
+# ================== ОТВЕТЫ ==================
+
+async def reply(update: Update, key, reply_markup=None, **values):
+    """Ответ сообщением из каталога на языке пользователя"""
+    template = MESSAGES.get(key, update.effective_user.language_code)
+    await update.effective_message.reply_text(
+        template.render(**values),
+        reply_markup=reply_markup,
+        parse_mode=template.parse_mode
+    )
+
+
+async def show_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Меню после анкеты: с оставленной заявкой - финальное, без неё - предложение замера"""
+    if context.user_data.get('survey_completed'):
+        await reply(update, 'menu_completed', get_final_keyboard())
+    else:
+        await reply(update, 'menu_offer', get_final_choice_keyboard())
 
 
 # ================== СТАРТ ==================
@@ -61,51 +141,29 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['waiting_for_question'] = False
     context.user_data['survey_completed'] = survey_completed
 
-    # Сохраняем время старта
-    db.update_start_time(user.id)
+    # Сохраняем время старта и планируем автосообщения от него
+    start_time = await lead_cache.update_start_time(user.id)
+    schedule_followups(context.job_queue, user.id, start_time)
 
     # Проверяем, существует ли файл с фото
     if WELCOME_PHOTO_PATH.exists():
         try:
-            # Отправляем фото из локального файла
-            with open(WELCOME_PHOTO_PATH, 'rb') as photo_file:
-                await context.bot.send_photo(
-                    chat_id=user.id,
-                    photo=photo_file,
-                    caption=(
-                        f"👋 Здравствуйте, {user.first_name}!\n\n"
-                        "Вас приветствует команда **Дом Ремонта**\n\n"
-                        "Поможем за 2 минуты:\n"
-                        "1️⃣ рассчитать стоимость работ\n"
-                        "2️⃣ понять, *уложитесь* ли вы в бюджет\n\n"
-                        "Начнём❓"
-                    ),
-                    parse_mode='Markdown',
-                    reply_markup=get_start_keyboard()
-                )
+            # Отправляем фото (загружается один раз, дальше - по file_id)
+            greeting = MESSAGES.get('greeting', user.language_code)
+            await media_cache.send_photo(
+                context.bot,
+                'welcome',
+                WELCOME_PHOTO_PATH,
+                chat_id=user.id,
+                caption=greeting.render(first_name=user.first_name),
+                parse_mode=greeting.parse_mode,
+                reply_markup=get_start_keyboard()
+            )
         except Exception as e:
             print(f"Ошибка отправки фото: {e}")
-            await update.message.reply_text(
-                f"👋 Здравствуйте, {user.first_name}!\n\n"
-                "Вас приветствует команда **Дом Ремонта**\n\n"
-                "Поможем за 2 минуты:\n"
-                "1️⃣ рассчитать стоимость работ\n"
-                "2️⃣ понять, *уложитесь* ли вы в бюджет\n\n"
-                "Начнём❓",
-                reply_markup=get_start_keyboard(),
-                parse_mode='Markdown'
-            )
+            await reply(update, 'greeting', get_start_keyboard(), first_name=user.first_name)
     else:
-        await update.message.reply_text(
-            f"👋 Здравствуйте, {user.first_name}!\n\n"
-            "Вас приветствует команда **Дом Ремонта**\n\n"
-            "Поможем за 2 минуты:\n"
-            "1️⃣ рассчитать стоимость работ\n"
-            "2️⃣ понять, *уложитесь* ли вы в бюджет\n\n"
-            "Начнём❓",
-            reply_markup=get_start_keyboard(),
-            parse_mode='Markdown'
-        )
+        await reply(update, 'greeting', get_start_keyboard(), first_name=user.first_name)
 
     return GEOGRAPHY
 
@@ -118,23 +176,14 @@ async def handle_start_choice(update: Update, context: ContextTypes.DEFAULT_TYPE
     user = update.effective_user
 
     if text == "✅ Начать тест":
-        await update.message.reply_text(
-            "🗺 **Где находится объект?**",
-            reply_markup=get_geography_keyboard(),
-            parse_mode='Markdown'
-        )
-        return GEOGRAPHY
+        return await survey.ask(update, context, GEOGRAPHY)
 
     elif text == "📞 Сразу записаться на бесплатный замер":
-        db.update_start_time(user.id)
+        start_time = await lead_cache.update_start_time(user.id)
+        schedule_followups(context.job_queue, user.id, start_time)
         context.user_data['survey_completed'] = 1
 
-        await update.message.reply_text(
-            "📱 **Отлично! Давайте сразу запишем вас на замер**\n\n"
-            "Нажмите кнопку ниже, чтобы поделиться контактом:",
-            reply_markup=get_contact_keyboard(),
-            parse_mode='Markdown'
-        )
+        await reply(update, 'direct_appointment', get_contact_keyboard())
         return CONTACT
 
     elif text == "🔄 Начать заново":
@@ -143,320 +192,36 @@ async def handle_start_choice(update: Update, context: ContextTypes.DEFAULT_TYPE
     return GEOGRAPHY
 
 
-# ================== ГЕОГРАФИЯ ==================
-
-async def geography_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка географии"""
-    text = update.message.text
-
-    if text == "🔄 Начать заново":
-        return await start(update, context)
-
-    city = text.replace("🏙 ", "").replace("🏙", "").strip()
-    context.user_data['geography'] = city
-
-    if city not in config.ALLOWED_CITIES and text != "Другой город":
-        await update.message.reply_text(
-            f"❌ Мы работаем только в городах:\n"
-            f"{' • '.join(config.ALLOWED_CITIES)}\n\n"
-            "Выберите из списка:",
-            reply_markup=get_geography_keyboard()
-        )
-        return GEOGRAPHY
-
-    if text == "Другой город":
-        await update.message.reply_text(
-            "😔 Понял, извините, мы работаем по Ростову‑на‑Дону, Аксаю и Батайску.\n\n"
-            "Выберите город из списка:",
-            reply_markup=get_geography_keyboard()
-        )
-        return GEOGRAPHY
-
-    await update.message.reply_text(
-        "**Объект в каком варианте?**",
-        reply_markup=get_object_type_keyboard(),
-        parse_mode='Markdown'
-    )
-    return OBJECT_TYPE
-
-
-# ================== ТИП ОБЪЕКТА ==================
-
-async def object_type_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка типа объекта"""
-    text = update.message.text
-
-    if text == "🔄 Начать заново":
-        return await start(update, context)
-
-    # Сохраняем тип объекта
-    context.user_data['object_type'] = text
-
-    # Если выбрана вторичка, показываем дополнительные опции
-    if text == "🏚 Вторичка":
-        await update.message.reply_text(
-            "🔨 **Уточните по вторичке:**\n\n"
-            "Что требуется сделать?",
-            reply_markup=get_secondary_options_keyboard(),
-            parse_mode='Markdown'
-        )
-        return SECONDARY_OPTIONS
-
-    # Для новостройки и дома - спрашиваем состояние
-    await update.message.reply_text(
-        "🛁 **В каком состоянии квартира сейчас?**",
-        reply_markup=get_condition_keyboard(),
-        parse_mode='Markdown'
-    )
-    return CONDITION
-
-
-# Добавьте новый обработчик для опций вторички
-async def secondary_options_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка дополнительных опций для вторички"""
-    text = update.message.text
-    user = update.effective_user
-
-    if text == "🔄 Начать заново":
-        return await start(update, context)
-
-    if text == "🔙 Назад к типам объектов":
-        await update.message.reply_text(
-            "**Объект в каком варианте?**",
-            reply_markup=get_object_type_keyboard(),
-            parse_mode='Markdown'
-        )
-        return OBJECT_TYPE
-
-    # Сохраняем выбранную опцию
-    context.user_data['secondary_options'] = text
-
-    # Для вторички устанавливаем состояние по умолчанию
-    context.user_data['condition'] = "Вторичка (специфика)"
-
-    # Сразу переходим к метражу (пропускаем вопрос о состоянии)
-    await update.message.reply_text(
-        "✏️ **Напишите метраж квартиры** (например: 72)",
-        reply_markup=ReplyKeyboardRemove(),
-        parse_mode='Markdown'
-    )
-    return METRAGE
-
-# ================== СОСТОЯНИЕ ==================
-
-async def condition_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка состояния квартиры"""
-    text = update.message.text
-
-    if text == "🔄 Начать заново":
-        return await start(update, context)
-
-    # Проверяем, не вторичка ли это (на всякий случай)
-    if context.user_data.get('object_type') == "🏚 Вторичка":
-        # Если это вторичка, но мы почему-то попали сюда - пропускаем
-        await update.message.reply_text(
-            "✏️ **Напишите метраж квартиры** (например: 72)",
-            reply_markup=ReplyKeyboardRemove(),
-            parse_mode='Markdown'
-        )
-        return METRAGE
-
-    context.user_data['condition'] = text
-
-    await update.message.reply_text(
-        "✏️ **Напишите метраж квартиры** (например: 72)",
-        reply_markup=ReplyKeyboardRemove(),
-        parse_mode='Markdown'
-    )
-    return METRAGE
-
-
-# ================== МЕТРАЖ ==================
-
-async def metrage_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка метража"""
-    text = update.message.text
-
-    if text == "🔄 Начать заново":
-        return await start(update, context)
-
-    try:
-        metrage = int(text)
-        context.user_data['metrage'] = metrage
-
-        if metrage < config.MIN_METRAGE:
-            await update.message.reply_text(
-                f"🙏 Спасибо! Мы берём объекты от {config.MIN_METRAGE} м², "
-                "чтобы отвечать за сроки и результат *под ключ*.\n\n"
-                "Но вы можете оставить заявку - обсудим индивидуально.",
-                parse_mode='Markdown'
-            )
-
-        await update.message.reply_text(
-            "**Какой ремонт Вам нужен?**",
-            reply_markup=get_repair_format_keyboard(),
-            parse_mode='Markdown'
-        )
-        return REPAIR_FORMAT
-
-    except ValueError:
-        await update.message.reply_text(
-            "❌ Пожалуйста, введите число (например: 72)"
-        )
-        return METRAGE
-
-
-# ================== ФОРМАТ РЕМОНТА ==================
-
-async def repair_format_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка формата ремонта"""
-    text = update.message.text
-
-    if text == "🔄 Начать заново":
-        return await start(update, context)
-
-    context.user_data['repair_format'] = text
-
-    # Убираем сообщение для "Переделка после мастеров"
-    # Оставляем только для "Частичный"
-    if "Частичный" in text:
-        await update.message.reply_text(
-            "🤝 Понял Вас. Мы делаем только полный ремонт под ключ, "
-            "чтобы не зависеть от чужих работ и отвечать за итог.\n\n"
-            "Но вы можете оставить заявку - обсудим варианты.",
-            parse_mode='Markdown'
-        )
-    # Для "Переделка после мастеров" ничего не отправляем
-
-    # Сразу переходим к вопросу о ключах для всех вариантов
-    await update.message.reply_text(
-        "🔑 **Ключи уже на руках?**",
-        reply_markup=get_keys_ready_keyboard(),
-        parse_mode='Markdown'
-    )
-    return KEYS_READY
-
-
-# ================== НАЛИЧИЕ КЛЮЧЕЙ ==================
-
-async def keys_ready_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка наличия ключей"""
-    text = update.message.text
-
-    if text == "🔄 Начать заново":
-        return await start(update, context)
-
-    context.user_data['keys_ready'] = text
-
-    await update.message.reply_text(
-        "📌 **Когда планируете завершить ремонт?**",
-        reply_markup=get_deadline_keyboard(),
-        parse_mode='Markdown'
-    )
-    return DEADLINE
-
-
-# ================== ДЕДЛАЙН ==================
-
-async def deadline_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка дедлайна"""
-    text = update.message.text
-
-    if text == "🔄 Начать заново":
-        return await start(update, context)
+# ================== ШАГИ АНКЕТЫ ==================
 
-    context.user_data['deadline'] = text
+# Кнопка главной тревоги -> ответ из каталога (остальное - fear_other)
+FEAR_REPLIES = {
+    "💸 Боюсь, что смета вырастет": 'fear_estimate',
+    "⏳ Боюсь, что сроки затянутся": 'fear_timing',
+    "🧱 Боюсь, что сделают плохо/скрытые косяки": 'fear_quality',
+    "😱 Всё сразу": 'fear_all',
+}
 
-    await update.message.reply_text(
-        "😟 **Честно: что тревожит больше всего?**",
-        reply_markup=get_main_fear_keyboard(),
-        parse_mode='Markdown'
-    )
-    return MAIN_FEAR
 
+async def offer_appointment(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """После бюджета: ответ на главную тревогу и предложение замера"""
+    fear = context.user_data.get('main_fear')
+    await reply(update, FEAR_REPLIES.get(fear, 'fear_other'), get_final_choice_keyboard())
 
-# ================== ГЛАВНАЯ ТРЕВОГА ==================
 
-async def main_fear_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка главной тревоги"""
-    text = update.message.text
+# Шаги от географии до бюджета собираются из survey.SURVEY_STEPS
+survey = SurveyEngine(SURVEY_STEPS, SURVEY_KEYBOARDS, on_restart=start, exits={RESULT: offer_appointment})
 
-    if text == "🔄 Начать заново":
-        return await start(update, context)
 
-    context.user_data['main_fear'] = text
+# ================== FAQ ==================
 
+async def reply_faq(update: Update, entry):
+    """Ответ на кнопку FAQ из готового индекса"""
     await update.message.reply_text(
-        "💸 **Чтобы не гадать *на кофейной гуще*: какой ориентир по бюджету на работы Вы рассматриваете?**",
-        reply_markup=get_budget_keyboard(),
+        entry.text,
+        reply_markup=get_faq_keyboard(entry.keyboard),
         parse_mode='Markdown'
     )
-    return BUDGET
-
-
-# ================== БЮДЖЕТ ==================
-
-async def budget_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка бюджета"""
-    text = update.message.text
-
-    if text == "🔄 Начать заново":
-        return await start(update, context)
-
-    context.user_data['budget'] = text
-
-    # Определяем, какое сообщение отправить в зависимости от страха
-    fear = context.user_data.get('main_fear', '')
-
-    if "смета вырастет" in fear:
-        message = (
-            "Понял. Ваш главный риск — *сюрпризы по ходу*.\n\n"
-            "Обычно смета улетает не из‑за *плохих людей*, а из‑за двух вещей:\n"
-            "— начали без чёткого состава работ\n"
-            "— изменения по ходу (а давайте по‑другому…) не фиксировали заранее\n\n"
-            "Если хотите, мы сделаем так, чтобы у Вас было понятно по шагам: что делаем, "
-            "что может поменять сумму и как это согласуется заранее.\n\n"
-            "Готовы записаться на бесплатный замер?"
-        )
-    elif "сроки" in fear:
-        message = (
-            "Понял. Ваш главный риск — *ремонт растянется*.\n\n"
-            "Чаще всего сроки *плывут*, когда нет нормальной этапности и контроля: "
-            "сегодня одно, завтра другое, послезавтра *мы не успели*.\n\n"
-            "На замере мы фиксируем объём, и даём реальный план по этапам, "
-            "чтобы Вы понимали, когда сможете заехать.\n\n"
-            "Записать Вас на бесплатный замер?"
-        )
-    elif "качество" in fear or "скрытые" in fear:
-        message = (
-            "Понимаю Вас. Самое обидное в ремонте — когда *с виду красиво*, "
-            "а потом вылезает то, что было скрыто.\n\n"
-            "Поэтому мы делаем акцент на этапах, которые обычно не видно, "
-            "но они решают всё: сантехника, электрика, подготовка, узлы.\n\n"
-            "На замере расскажем, где у Вашего объекта *зона риска*, "
-            "и что нужно проконтролировать, чтобы не платить дважды.\n\n"
-            "Записать Вас на бесплатный замер?"
-        )
-    elif "Всё сразу" in fear or "всё сразу" in fear:
-        message = (
-            "Честно — это нормальное состояние после *ключей*.\n"
-            "Голова шумит, все советуют разное, и Вы просто не хотите встрять.\n\n"
-            "Хорошая новость: это решается системой — понятный объём, "
-            "план этапов и прозрачные согласования.\n\n"
-            "Давайте сделаем первый спокойный шаг: бесплатный замер."
-        )
-    else:
-        message = (
-            "Спасибо за ответы! Теперь давайте определимся со следующим шагом.\n\n"
-            "Готовы записаться на бесплатный замер?"
-        )
-
-    await update.message.reply_text(
-        message,
-        reply_markup=get_final_choice_keyboard(),
-        parse_mode='Markdown'
-    )
-    return RESULT
 
 
 # ================== ФИНАЛЬНЫЙ ВЫБОР ==================
@@ -469,354 +234,30 @@ async def final_choice_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         return await start(update, context)
 
     if text == "✅ Записаться на бесплатный замер":
-        await update.message.reply_text(
-            "📱 **Отлично! Оставьте ваш номер телефона**\n\n"
-            "Нажмите кнопку ниже, чтобы поделиться контактом:",
-            reply_markup=get_contact_keyboard(),
-            parse_mode='Markdown'
-        )
+        await reply(update, 'ask_contact', get_contact_keyboard())
         return CONTACT
 
-    elif text == "❓У вас есть вопрос":
-        await update.message.reply_text(
-            "❓ Часто задаваемые вопросы \n\n"
-            "Выберите категорию вопросов:",
-            reply_markup=get_faq_categories_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
     elif text == "👀 Посмотреть примеры работ":
-        await update.message.reply_text(
-            "👀 Примеры наших работ: \n\n"
-            "Наш Telegram-канал: https://t.me/remontkvartirRND61\n\n"
-            "Там вы найдете:\n"
-            "• Фото готовых объектов\n"
-            "• Видео процессов\n"
-            "• Отзывы клиентов\n"
-            "• Идеи для ремонта",
-            disable_web_page_preview=False
-        )
+        await reply(update, 'examples')
         # Сразу возвращаемся к выбору
-        await update.message.reply_text(
-            "Готовы записаться на замер?",
-            reply_markup=get_final_choice_keyboard()
-        )
+        await reply(update, 'menu_offer', get_final_choice_keyboard())
         return RESULT
 
     # ===== ОБРАБОТКА FAQ ВНУТРИ RESULT =====
-
-    # Категории FAQ
-    elif text == "💰 Бюджет и смета":
-        await update.message.reply_text(
-            "💰 **Вопросы по бюджету и смете**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_budget_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "⏳ Сроки ремонта":
-        await update.message.reply_text(
-            "⏳ **Вопросы по срокам ремонта**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_timing_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "🧱 Объем работ":
-        await update.message.reply_text(
-            "🧱 **Вопросы по объему работ**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_scope_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "🎨 Дизайн-проект":
-        await update.message.reply_text(
-            "🎨 **Вопросы по дизайн-проекту**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_design_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "🧰 Материалы":
-        await update.message.reply_text(
-            "🧰 **Вопросы по материалам**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_materials_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "📸 Контроль и отчетность":
-        await update.message.reply_text(
-            "📸 **Вопросы по контролю и отчетности**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_control_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "📄 Договор и гарантии":
-        await update.message.reply_text(
-            "📄 **Вопросы по договору и гарантиям**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_contract_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "🚪 Начало ремонта":
-        await update.message.reply_text(
-            "🚪 **Вопросы по началу ремонта**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_start_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    # Конкретные вопросы по бюджету
-    elif text == "💸 Смета может вырасти в процессе?":
-        await update.message.reply_text(
-            "💸 **Смета может вырасти в процессе?**\n\n"
-            "Может измениться только если меняется объём работ или Ваши решения.\n\n"
-            "Мы делаем так: любые изменения согласуем заранее, до выполнения, чтобы не было сюрпризов “в конце”.",
-            reply_markup=get_budget_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "💸 Почему нельзя назвать цену без замера?":
-        await update.message.reply_text(
-            "💸 **Почему нельзя назвать цену без замера?**\n\n"
-            "Потому что “на глаз” в ремонте чаще всего = ошибка и потом переделки/доплаты.\n\n"
-            "Замер нужен, чтобы зафиксировать объём работ, пожелания и нюансы квартиры.",
-            reply_markup=get_budget_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "💸 У вас есть цена за м²?":
-        await update.message.reply_text(
-            "💸 **У вас есть цена за м²?**\n\n"
-            "У нас расчёт индивидуальный, потому что на стоимость влияет состояние квартиры, инженерия и Ваши пожелания.",
-            reply_markup=get_budget_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    # Вопросы по срокам
-    elif text == "⏳ Сколько длится ремонт под ключ?":
-        await update.message.reply_text(
-            "⏳ **Сколько длится ремонт под ключ?**\n\n"
-            "В среднем 3–4 месяца, но точный срок зависит от метража, состояния квартиры и сложности проекта.",
-            reply_markup=get_timing_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "⏳ Как вы контролируете сроки?":
-        await update.message.reply_text(
-            "⏳ **Как вы контролируете сроки?**\n\n"
-            "Мы ведём ремонт по этапам и ежедневно фиксируем прогресс.\n\n"
-            "Плюс даём понятную последовательность работ, чтобы не было хаоса.",
-            reply_markup=get_timing_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    # Вопросы по объему работ
-    elif text == "🧱 Что входит в ремонт под ключ?":
-        await update.message.reply_text(
-            "🧱 **Что входит в ремонт под ключ?**\n\n"
-            "Это полный цикл работ: черновые + чистовые работы, инженерка (электрика/сантехника), отделка.",
-            reply_markup=get_scope_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "🧱 Вы делаете частичный ремонт?":
-        await update.message.reply_text(
-            "🧱 **Вы делаете частичный ремонт?**\n\n"
-            "Нет. Мы берём только полный ремонт квартиры под ключ.\n\n"
-            "Так мы отвечаем за результат и сроки, без зависимости от чужих работ.",
-            reply_markup=get_scope_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    # Вопросы по дизайну
-    elif text == "🎨 Дизайн-проект входит?":
-        await update.message.reply_text(
-            "🎨 **Дизайн-проект входит?**\n\n"
-            "Да, дизайн-проект входит (обсуждаем на старте).\n\n"
-            "Это снижает переделки и помогает заранее продумать свет, розетки, функциональность.",
-            reply_markup=get_design_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "🎨 Если у нас есть дизайн-проект?":
-        await update.message.reply_text(
-            "🎨 **Если у нас есть дизайн-проект?**\n\n"
-            "Да, конечно. Мы посмотрим проект, уточним нюансы на замере и дальше работаем по нему.",
-            reply_markup=get_design_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    # Вопросы по материалам
-    elif text == "🧰 Кто закупает материалы?":
-        await update.message.reply_text(
-            "🧰 **Кто закупает материалы?**\n\n"
-            "Обычно материалы закупаем мы — так проще по логистике и срокам.\n\n"
-            "Но если Вам спокойнее — Вы можете закупать сами или частично.",
-            reply_markup=get_materials_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "🧰 Можно выбрать материалы с вами?":
-        await update.message.reply_text(
-            "🧰 **Можно выбрать материалы с вами?**\n\n"
-            "Да. Мы помогаем подобрать материалы под Ваш бюджет и задачи, чтобы не переплачивать и не ошибаться.",
-            reply_markup=get_materials_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    # Вопросы по контролю
-    elif text == "📸 Как увидеть что работы идут?":
-        await update.message.reply_text(
-            "📸 **Как увидеть что работы идут?**\n\n"
-            "Вы будете видеть прогресс: фото/видео с объектов + отчётность по этапам.\n\n"
-            "Никакой “мы работали, но показать нечего”.",
-            reply_markup=get_control_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "📸 Можно посмотреть ваши объекты?":
-        await update.message.reply_text(
-            "📸 **Можно посмотреть ваши объекты?**\n\n"
-            "Да, по согласованию можем показать реальные объекты (в процессе или готовые).",
-            reply_markup=get_control_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    # Вопросы по договору
-    elif text == "📄 Вы работаете по договору?":
-        await update.message.reply_text(
-            "📄 **Вы работаете по договору?**\n\n"
-            "Да, работаем по договору на юрлицо.\n\n"
-            "Это фиксирует обязательства, условия и порядок работ.",
-            reply_markup=get_contract_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "📄 Какая гарантия?":
-        await update.message.reply_text(
-            "📄 **Какая гарантия?**\n\n"
-            "Гарантия прописывается в договоре.\n\n"
-            "На замере/созвоне менеджер пояснит сроки и что именно покрывает гарантия.",
-            reply_markup=get_contract_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "👷 Кто делает ремонт?":
-        await update.message.reply_text(
-            "👷 **Кто делает ремонт?**\n\n"
-            "Работает наша бригада под руководством прораба.\n\n"
-            "Ответственность не “размывается” между разными исполнителями.",
-            reply_markup=get_contract_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    # Вопросы по началу
-    elif text == "🚪 Замер платный?":
-        await update.message.reply_text(
-            "🚪 **Замер платный?**\n\n"
-            "Нет, замер бесплатный.",
-            reply_markup=get_start_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "🚪 Что подготовить к замеру?":
-        await update.message.reply_text(
-            "🚪 **Что подготовить к замеру?**\n\n"
-            "• планировку/план БТИ (фото или файл)\n"
-            "• 2–3 примера “как нравится” (скриншоты)\n"
-            "• ориентир по сроку заезда и бюджету",
-            reply_markup=get_start_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    elif text == "🚪 Как быстро начать ремонт?":
-        await update.message.reply_text(
-            "🚪 **Как быстро начать ремонт?**\n\n"
-            "Зависит от загрузки и готовности проекта/ТЗ.\n\n"
-            "На созвоне/замере скажем ближайшие окна старта.",
-            reply_markup=get_start_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
-    # Кому не подойдём
-    elif text == "🚫 Кому вы не подойдёте?":
-        await update.message.reply_text(
-            "🚫 **Кому мы не подойдём**\n\n"
-            "Мы не подойдём, если:\n\n"
-            "• метраж меньше 40 м²\n"
-            "• нужен частичный ремонт\n"
-            "• объект не в Ростове/Аксае/Батайске",
-            reply_markup=get_faq_categories_keyboard(),
-            parse_mode='Markdown'
-        )
+    elif text in FAQ_INDEX:
+        await reply_faq(update, FAQ_INDEX[text])
         return RESULT
 
     # Свой вопрос
     elif text == "❓ Задать свой вопрос":
-        await update.message.reply_text(
-            "❓ **Задайте свой вопрос** \n\n"
-            "Напишите ваш вопрос в ответном сообщении, и мы обязательно ответим вам 👇",
-            reply_markup=ReplyKeyboardRemove()
-        )
+        await reply(update, 'ask_question', ReplyKeyboardRemove())
         context.user_data['waiting_for_question'] = True
         # ВАЖНО: переходим в состояние 999
         return 999
 
-    # Назад в категории
-    elif text == "🔙 Назад в категории":
-        await update.message.reply_text(
-            "❓ Часто задаваемые вопросы \n\n"
-            "Выберите категорию вопросов:",
-            reply_markup=get_faq_categories_keyboard(),
-            parse_mode='Markdown'
-        )
-        return RESULT
-
     # Назад в меню
     elif text == "🔙 Назад в меню":
-        if context.user_data.get('survey_completed'):
-            await update.message.reply_text(
-                "Чем еще могу помочь?",
-                reply_markup=get_final_keyboard()
-            )
-        else:
-            await update.message.reply_text(
-                "Готовы записаться на замер?",
-                reply_markup=get_final_choice_keyboard()
-            )
+        await show_menu(update, context)
         return RESULT
 
     return RESULT
@@ -831,10 +272,7 @@ async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
 
     if not contact:
-        await update.message.reply_text(
-            "❌ Пожалуйста, нажмите кнопку **'Отправить номер телефона'**",
-            reply_markup=get_contact_keyboard()
-        )
+        await reply(update, 'contact_required', get_contact_keyboard())
         return CONTACT
 
     # Сохраняем данные пользователя
@@ -871,28 +309,18 @@ async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         'appointment_time': 'ожидает подтверждения',
         'appointment_status': 'pending',
         'survey_completed': 1,
-        'start_time': db.get_user_start_time(user.id)
+        'start_time': await lead_cache.get_user_start_time(user.id)
     })
 
-    db.save_lead(lead_data)
+    await lead_cache.save_lead(lead_data)
+    LEADS_SAVED.inc()
 
-    await update.message.reply_text(
-        "✅ **Принято!**\n\n"
-        "Мы получили заявку на бесплатный замер:\n\n"
-        "📞 Менеджер свяжется с Вами и подтвердит точное время.\n\n"
-        "Спасибо за обращение!\n\n"
-        "📌 Если у вас есть вопросы - загляните в **FAQ**",
-        reply_markup=get_final_keyboard(),
-        parse_mode='Markdown'
-    )
+    await reply(update, 'lead_accepted', get_final_keyboard())
 
     await notify_manager(context, lead_data)
 
     # НЕ выходим из диалога, а возвращаемся в RESULT
-    await update.message.reply_text(
-        "Чем еще могу помочь?",
-        reply_markup=get_final_keyboard()
-    )
+    await reply(update, 'menu_completed', get_final_keyboard())
     return RESULT
 
 
@@ -916,335 +344,26 @@ async def waiting_question_handler(update: Update, context: ContextTypes.DEFAULT
         await notify_manager_question(context, user, text)
 
         # Отправляем подтверждение пользователю
-        await update.message.reply_text(
-            "✅ **Ваш вопрос получен и передан менеджеру!**\n\n"
-            "Ответ придет в ближайшее время.",
-            parse_mode='Markdown'
-        )
+        await reply(update, 'question_received')
 
         # Возвращаем в меню
-        if context.user_data.get('survey_completed'):
-            await update.message.reply_text(
-                "Чем еще могу помочь?",
-                reply_markup=get_final_keyboard()
-            )
-        else:
-            await update.message.reply_text(
-                "Готовы записаться на замер?",
-                reply_markup=get_final_choice_keyboard()
-            )
+        await show_menu(update, context)
 
         return RESULT
 
     # ===== 2. ЕСЛИ НЕ ЖДЕМ ВОПРОС - ЭТО НАВИГАЦИЯ ПО FAQ =====
-
-    # Категории FAQ
-    if text == "💰 Бюджет и смета":
-        await update.message.reply_text(
-            "💰 **Вопросы по бюджету и смете**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_budget_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "⏳ Сроки ремонта":
-        await update.message.reply_text(
-            "⏳ **Вопросы по срокам ремонта**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_timing_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "🧱 Объем работ":
-        await update.message.reply_text(
-            "🧱 **Вопросы по объему работ**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_scope_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "🎨 Дизайн-проект":
-        await update.message.reply_text(
-            "🎨 **Вопросы по дизайн-проекту**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_design_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "🧰 Материалы":
-        await update.message.reply_text(
-            "🧰 **Вопросы по материалам**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_materials_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "📸 Контроль и отчетность":
-        await update.message.reply_text(
-            "📸 **Вопросы по контролю и отчетности**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_control_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "📄 Договор и гарантии":
-        await update.message.reply_text(
-            "📄 **Вопросы по договору и гарантиям**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_contract_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "🚪 Начало ремонта":
-        await update.message.reply_text(
-            "🚪 **Вопросы по началу ремонта**\n\n"
-            "Выберите интересующий вопрос:",
-            reply_markup=get_start_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    # Конкретные вопросы по бюджету
-    elif text == "💸 Смета может вырасти в процессе?":
-        await update.message.reply_text(
-            "💸 **Смета может вырасти в процессе?**\n\n"
-            "Может измениться только если меняется объём работ или Ваши решения.\n\n"
-            "Мы делаем так: любые изменения согласуем заранее, до выполнения, чтобы не было сюрпризов “в конце”.",
-            reply_markup=get_budget_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "💸 Почему нельзя назвать цену без замера?":
-        await update.message.reply_text(
-            "💸 **Почему нельзя назвать цену без замера?**\n\n"
-            "Потому что “на глаз” в ремонте чаще всего = ошибка и потом переделки/доплаты.\n\n"
-            "Замер нужен, чтобы зафиксировать объём работ, пожелания и нюансы квартиры.",
-            reply_markup=get_budget_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "💸 У вас есть цена за м²?":
-        await update.message.reply_text(
-            "💸 **У вас есть цена за м²?**\n\n"
-            "У нас расчёт индивидуальный, потому что на стоимость влияет состояние квартиры, инженерия и Ваши пожелания.",
-            reply_markup=get_budget_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    # Вопросы по срокам
-    elif text == "⏳ Сколько длится ремонт под ключ?":
-        await update.message.reply_text(
-            "⏳ **Сколько длится ремонт под ключ?**\n\n"
-            "В среднем 3–4 месяца, но точный срок зависит от метража, состояния квартиры и сложности проекта.",
-            reply_markup=get_timing_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "⏳ Как вы контролируете сроки?":
-        await update.message.reply_text(
-            "⏳ **Как вы контролируете сроки?**\n\n"
-            "Мы ведём ремонт по этапам и ежедневно фиксируем прогресс.\n\n"
-            "Плюс даём понятную последовательность работ, чтобы не было хаоса.",
-            reply_markup=get_timing_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    # Вопросы по объему работ
-    elif text == "🧱 Что входит в ремонт под ключ?":
-        await update.message.reply_text(
-            "🧱 **Что входит в ремонт под ключ?**\n\n"
-            "Это полный цикл работ: черновые + чистовые работы, инженерка (электрика/сантехника), отделка.",
-            reply_markup=get_scope_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "🧱 Вы делаете частичный ремонт?":
-        await update.message.reply_text(
-            "🧱 **Вы делаете частичный ремонт?**\n\n"
-            "Нет. Мы берём только полный ремонт квартиры под ключ.\n\n"
-            "Так мы отвечаем за результат и сроки, без зависимости от чужих работ.",
-            reply_markup=get_scope_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    # Вопросы по дизайну
-    elif text == "🎨 Дизайн-проект входит?":
-        await update.message.reply_text(
-            "🎨 **Дизайн-проект входит?**\n\n"
-            "Да, дизайн-проект входит (обсуждаем на старте).\n\n"
-            "Это снижает переделки и помогает заранее продумать свет, розетки, функциональность.",
-            reply_markup=get_design_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "🎨 Если у нас есть дизайн-проект?":
-        await update.message.reply_text(
-            "🎨 **Если у нас есть дизайн-проект?**\n\n"
-            "Да, конечно. Мы посмотрим проект, уточним нюансы на замере и дальше работаем по нему.",
-            reply_markup=get_design_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    # Вопросы по материалам
-    elif text == "🧰 Кто закупает материалы?":
-        await update.message.reply_text(
-            "🧰 **Кто закупает материалы?**\n\n"
-            "Обычно материалы закупаем мы — так проще по логистике и срокам.\n\n"
-            "Но если Вам спокойнее — Вы можете закупать сами или частично.",
-            reply_markup=get_materials_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "🧰 Можно выбрать материалы с вами?":
-        await update.message.reply_text(
-            "🧰 **Можно выбрать материалы с вами?**\n\n"
-            "Да. Мы помогаем подобрать материалы под Ваш бюджет и задачи, чтобы не переплачивать и не ошибаться.",
-            reply_markup=get_materials_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    # Вопросы по контролю
-    elif text == "📸 Как увидеть что работы идут?":
-        await update.message.reply_text(
-            "📸 **Как увидеть что работы идут?**\n\n"
-            "Вы будете видеть прогресс: фото/видео с объектов + отчётность по этапам.\n\n"
-            "Никакой “мы работали, но показать нечего”.",
-            reply_markup=get_control_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "📸 Можно посмотреть ваши объекты?":
-        await update.message.reply_text(
-            "📸 **Можно посмотреть ваши объекты?**\n\n"
-            "Да, по согласованию можем показать реальные объекты (в процессе или готовые).",
-            reply_markup=get_control_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    # Вопросы по договору
-    elif text == "📄 Вы работаете по договору?":
-        await update.message.reply_text(
-            "📄 **Вы работаете по договору?**\n\n"
-            "Да, работаем по договору на юрлицо.\n\n"
-            "Это фиксирует обязательства, условия и порядок работ.",
-            reply_markup=get_contract_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "📄 Какая гарантия?":
-        await update.message.reply_text(
-            "📄 **Какая гарантия?**\n\n"
-            "Гарантия прописывается в договоре.\n\n"
-            "На замере/созвоне менеджер пояснит сроки и что именно покрывает гарантия.",
-            reply_markup=get_contract_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "👷 Кто делает ремонт?":
-        await update.message.reply_text(
-            "👷 **Кто делает ремонт?**\n\n"
-            "Работает наша бригада под руководством прораба.\n\n"
-            "Ответственность не “размывается” между разными исполнителями.",
-            reply_markup=get_contract_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    # Вопросы по началу
-    elif text == "🚪 Замер платный?":
-        await update.message.reply_text(
-            "🚪 **Замер платный?**\n\n"
-            "Нет, замер бесплатный.",
-            reply_markup=get_start_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "🚪 Что подготовить к замеру?":
-        await update.message.reply_text(
-            "🚪 **Что подготовить к замеру?**\n\n"
-            "• планировку/план БТИ (фото или файл)\n"
-            "• 2–3 примера “как нравится” (скриншоты)\n"
-            "• ориентир по сроку заезда и бюджету",
-            reply_markup=get_start_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "🚪 Как быстро начать ремонт?":
-        await update.message.reply_text(
-            "🚪 **Как быстро начать ремонт?**\n\n"
-            "Зависит от загрузки и готовности проекта/ТЗ.\n\n"
-            "На созвоне/замере скажем ближайшие окна старта.",
-            reply_markup=get_start_faq_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    elif text == "🚫 Кому вы не подойдёте?":
-        await update.message.reply_text(
-            "🚫 **Кому мы не подойдём**\n\n"
-            "Мы не подойдём, если:\n\n"
-            "• метраж меньше 40 м²\n"
-            "• нужен частичный ремонт\n"
-            "• объект не в Ростове/Аксае/Батайске",
-            reply_markup=get_faq_categories_keyboard(),
-            parse_mode='Markdown'
-        )
+    if text in FAQ_INDEX:
+        await reply_faq(update, FAQ_INDEX[text])
         return 999
 
     # ===== 3. НАВИГАЦИОННЫЕ КНОПКИ =====
     elif text == "❓ Задать свой вопрос":
-        await update.message.reply_text(
-            "❓ **Задайте свой вопрос** \n\n"
-            "Напишите ваш вопрос в ответном сообщении, и мы обязательно ответим вам 👇",
-            reply_markup=ReplyKeyboardRemove()
-        )
+        await reply(update, 'ask_question', ReplyKeyboardRemove())
         context.user_data['waiting_for_question'] = True
         return 999
 
-    elif text == "🔙 Назад в категории":
-        await update.message.reply_text(
-            "❓ Часто задаваемые вопросы \n\n"
-            "Выберите категорию вопросов:",
-            reply_markup=get_faq_categories_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
     elif text == "🔙 Назад в меню":
-        if context.user_data.get('survey_completed'):
-            await update.message.reply_text(
-                "Чем еще могу помочь?",
-                reply_markup=get_final_keyboard()
-            )
-        else:
-            await update.message.reply_text(
-                "Готовы записаться на замер?",
-                reply_markup=get_final_choice_keyboard()
-            )
+        await show_menu(update, context)
         return RESULT
 
     # ===== 4. ОБРАБОТКА "НАЧАТЬ ЗАНОВО" =====
@@ -1255,53 +374,16 @@ async def waiting_question_handler(update: Update, context: ContextTypes.DEFAULT
     elif text == "✅ Записаться на бесплатный замер":
         return await final_choice_handler(update, context)
 
-    # ===== 6. ОБРАБОТКА "❓У вас есть вопрос" =====
-    elif text == "❓У вас есть вопрос":
-        await update.message.reply_text(
-            "❓ Часто задаваемые вопросы \n\n"
-            "Выберите категорию вопросов:",
-            reply_markup=get_faq_categories_keyboard(),
-            parse_mode='Markdown'
-        )
-        return 999
-
-    # ===== 7. ОБРАБОТКА "👀 Посмотреть примеры работ" =====
+    # ===== 6. ОБРАБОТКА "👀 Посмотреть примеры работ" =====
     elif text == "👀 Посмотреть примеры работ":
-        await update.message.reply_text(
-            "👀 Примеры наших работ:\n\n"
-            "Наш Telegram-канал: https://t.me/remontkvartirRND61\n\n"
-            "Там вы найдете:\n"
-            "• Фото готовых объектов\n"
-            "• Видео процессов\n"
-            "• Отзывы клиентов\n"
-            "• Идеи для ремонта",
-            disable_web_page_preview=False
-        )
+        await reply(update, 'examples')
         # Сразу возвращаемся к выбору
-        if context.user_data.get('survey_completed'):
-            await update.message.reply_text(
-                "Чем еще могу помочь?",
-                reply_markup=get_final_keyboard()
-            )
-        else:
-            await update.message.reply_text(
-                "Готовы записаться на замер?",
-                reply_markup=get_final_choice_keyboard()
-            )
+        await show_menu(update, context)
         return RESULT
 
-    # ===== 8. ЕСЛИ НИЧЕГО НЕ ПОДОШЛО - ВОЗВРАЩАЕМСЯ В МЕНЮ =====
+    # ===== 7. ЕСЛИ НИЧЕГО НЕ ПОДОШЛО - ВОЗВРАЩАЕМСЯ В МЕНЮ =====
     else:
-        if context.user_data.get('survey_completed'):
-            await update.message.reply_text(
-                "Чем еще могу помочь?",
-                reply_markup=get_final_keyboard()
-            )
-        else:
-            await update.message.reply_text(
-                "Готовы записаться на замер?",
-                reply_markup=get_final_choice_keyboard()
-            )
+        await show_menu(update, context)
         return RESULT
 
 
@@ -1331,16 +413,9 @@ async def notify_manager(context, lead_data):
         f"⏰ **Время:** {datetime.now().strftime('%d.%m.%Y %H:%M')}"
     )
 
-    for admin_id in MANAGER_IDS:
-        try:
-            await context.bot.send_message(
-                chat_id=admin_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            logger.info(f"✅ Уведомление отправлено менеджеру {admin_id}")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось отправить менеджеру {admin_id}: {e}")
+    # Отправку менеджерам выполняет фоновый обработчик очереди
+    await manager_outbox.enqueue('lead', message, MANAGER_IDS)
+    logger.info(f"📨 Заявка поставлена в очередь уведомлений для {len(MANAGER_IDS)} менеджеров")
 
 
 # ================== УВЕДОМЛЕНИЕ МЕНЕДЖЕРА О ВОПРОСЕ ==================
@@ -1355,170 +430,275 @@ async def notify_manager_question(context, user, question):
         f"📝 **Вопрос:** \n\n{question}"
     )
 
-    for admin_id in MANAGER_IDS:
-        try:
-            await context.bot.send_message(
-                chat_id=admin_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            logger.info(f"✅ Вопрос отправлен менеджеру {admin_id}")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось отправить вопрос менеджеру {admin_id}: {e}")
+    await manager_outbox.enqueue('question', message, MANAGER_IDS)
+    logger.info(f"📨 Вопрос поставлен в очередь уведомлений для {len(MANAGER_IDS)} менеджеров")
 
 
 # ================== РАССЫЛКИ ==================
 
-async def send_broadcast_first(app):
-    """Отправка первой рассылки (фото с подписью)"""
-    global broadcast_first_sent
+FIRST_PHOTO_PATH = MEDIA_DIR / "broadcast_first.jpg"
+SECOND_FILE_PATH = MEDIA_DIR / "broadcast_second.pdf"
 
-    if broadcast_first_sent:
-        return
 
-    users = db.get_all_users_without_survey()
+async def send_followup(bot, kind, user_id):
+    """Отправка автосообщения одному пользователю"""
+    if kind == 'first':
+        await media_cache.send_photo(
+            bot,
+            'first',
+            FIRST_PHOTO_PATH,
+            chat_id=user_id,
+            caption=config.BROADCAST_FIRST_CAPTION,
+            parse_mode='Markdown'
+        )
+    else:
+        await media_cache.send_document(
+            bot,
+            'second',
+            SECOND_FILE_PATH,
+            chat_id=user_id,
+            caption=config.BROADCAST_SECOND_CAPTION,
+            parse_mode='Markdown'
+        )
 
-    if not users:
-        broadcast_first_sent = True
-        return
 
-    FIRST_PHOTO_PATH = MEDIA_DIR / "broadcast_first.jpg"
+async def followup_job(context: ContextTypes.DEFAULT_TYPE):
+    """Автосообщение пользователю через заданное время после /start"""
+    user_id = context.job.chat_id
+    kind = context.job.data
 
-    if not FIRST_PHOTO_PATH.exists():
-        logger.error(f"❌ Фото для первой рассылки не найдено")
-        broadcast_first_sent = True
+    # Анкета уже заполнена - догонять не нужно
+    if await lead_cache.is_survey_completed(user_id):
         return
 
-    first_caption = (
-        "🎁 **Дарим бесплатный дизайн проект от нашего дизайнера** "
-        "([смотреть](https://t.me/remontkvartirRND61/497)), "
-        "за расчет стоимости ремонта до конца дня 👇"
+    # Через общий ограничитель: при всплеске /start автосообщения не упрутся в лимиты.
+    # Журнал доставки не даст отправить одно автосообщение дважды
+    status = await broadcast_engine.deliver(
+        user_id,
+        functools.partial(send_followup, context.bot, kind),
+        delivery_logs[kind]
     )
+    if status:
+        logger.info(f"Автосообщение '{kind}' пользователю {user_id}: {status}")
+
+
+def schedule_followups(job_queue, user_id, start_time):
+    """Планирование автосообщений на start_time + задержка из config"""
+    now = datetime.now()
+    for kind, delay in config.AUTO_MESSAGE_DELAYS.items():
+        due = start_time + timedelta(minutes=delay)
+        if due <= now:
+            continue
+        # id задачи стабилен: повторный /start переносит её, а не дублирует
+        job_id = f"followup_{kind}_{user_id}"
+        job_queue.run_once(
+            followup_job,
+            when=due - now,
+            chat_id=user_id,
+            name=job_id,
+            data=kind,
+            job_kwargs={'id': job_id, 'replace_existing': True}
+        )
+
+
+async def send_broadcast(app, kind):
+    """Догоняющая рассылка автосообщения kind всем, у кого оно просрочено"""
+    started_before = datetime.now() - timedelta(minutes=config.AUTO_MESSAGE_DELAYS[kind])
+
+    uncertain = (await db.get_delivery_stats(kind)).get(SENDING, 0)
+    if uncertain:
+        logger.warning(f"⚠️ Рассылка '{kind}': {uncertain} получателей без подтверждённого итога, повторно не отправляем")
+
+    path = FIRST_PHOTO_PATH if kind == 'first' else SECOND_FILE_PATH
+    if not path.exists():
+        logger.error(f"❌ Файл для рассылки '{kind}' не найден: {path}")
+        return
 
-    success_count = 0
-    for user_id in users:
-        try:
-            with open(FIRST_PHOTO_PATH, 'rb') as photo:
-                await app.bot.send_photo(
-                    chat_id=user_id,
-                    photo=photo,
-                    caption=first_caption,
-                    parse_mode='Markdown'
-                )
-            success_count += 1
-            await asyncio.sleep(0.1)
-        except Exception as e:
-            logger.error(f"Ошибка рассылки пользователю {user_id}: {e}")
+    # Получатели читаются из базы страницами по ходу рассылки
+    users = db.stream('iter_users_without_survey', started_before=started_before, exclude_campaign=kind)
+    stats = await broadcast_engine.run(
+        users,
+        functools.partial(send_followup, app.bot, kind),
+        log=delivery_logs[kind]
+    )
+    if stats:
+        logger.info(f"✅ Рассылка '{kind}' завершена: {dict(stats)}")
 
-    logger.info(f"✅ Первая рассылка. Отправлено: {success_count}")
-    broadcast_first_sent = True
+
+async def send_broadcast_first(app):
+    """Отправка первой рассылки (фото с подписью)"""
+    await send_broadcast(app, 'first')
 
 
 async def send_broadcast_second(app):
     """Отправка второй рассылки (файл с подписью)"""
-    global broadcast_second_sent
+    await send_broadcast(app, 'second')
+
 
-    if broadcast_second_sent:
+async def send_overdue_followups(context: ContextTypes.DEFAULT_TYPE):
+    """Догоняющая рассылка автосообщений, срок которых прошёл, пока бот был остановлен"""
+    if not leader_election.is_leader:
         return
+    logger.info("📸 Запуск первой рассылки")
+    await send_broadcast_first(context.application)
+    logger.info("📎 Запуск второй рассылки")
+    await send_broadcast_second(context.application)
 
-    users = db.get_all_users_without_survey()
 
-    if not users:
-        broadcast_second_sent = True
-        return
+async def flush_delivery_logs(_=None):
+    """Запись накопленных итогов доставки в базу"""
+    for log in delivery_logs.values():
+        await log.flush()
 
-    SECOND_FILE_PATH = MEDIA_DIR / "broadcast_second.pdf"
 
-    if not SECOND_FILE_PATH.exists():
-        logger.error(f"❌ Файл для второй рассылки не найден")
-        broadcast_second_sent = True
-        return
+async def update_funnel(context: ContextTypes.DEFAULT_TYPE):
+    """Запись накопленных переходов анкеты; ведущий процесс пересчитывает воронку"""
+    await funnel_recorder.flush()
+    if leader_election.is_leader:
+        processed = await aggregate_funnel(db)
+        if processed:
+            logger.info(f"📊 Воронка пересчитана, новых событий: {processed}")
 
-    second_caption = (
-        "☝️ **Абсолютно бесплатно забирайте гид по выбору материалов** "
-        "от нашей команды."
-    )
 
-    success_count = 0
-    for user_id in users:
-        try:
-            with open(SECOND_FILE_PATH, 'rb') as file:
-                await app.bot.send_document(
-                    chat_id=user_id,
-                    document=file,
-                    caption=second_caption,
-                    parse_mode='Markdown'
-                )
-            success_count += 1
-            await asyncio.sleep(0.1)
-        except Exception as e:
-            logger.error(f"Ошибка рассылки пользователю {user_id}: {e}")
+async def restore_followups(application: Application):
+    """Восстановление расписания автосообщений из таблицы leads при запуске"""
+    # Автосообщения лидов, стартовавших раньше самой длинной задержки, уже просрочены
+    started_after = datetime.now() - timedelta(minutes=max(config.AUTO_MESSAGE_DELAYS.values()))
+    leads = [
+        lead for lead in await db.get_all_users_with_start_time(started_after=started_after)
+        if owns_user(lead[0])
+    ]
+    for user_id, start_time, _, _ in leads:
+        schedule_followups(application.job_queue, user_id, datetime.fromisoformat(start_time))
+
+    logger.info(f"🚀 Расписание автосообщений восстановлено для {len(leads)} лидов")
 
-    logger.info(f"✅ Вторая рассылка. Отправлено: {success_count}")
-    broadcast_second_sent = True
+    application.job_queue.run_repeating(flush_delivery_logs, interval=10)
 
 
-def broadcast_scheduler(app):
-    """Планировщик рассылок"""
-    logger.info("🚀 Планировщик рассылок запущен")
+async def on_leadership_change(application: Application, is_leader):
+    """Ведущий процесс догоняет просроченные автосообщения и шлёт уведомления менеджерам"""
+    if is_leader:
+        manager_outbox.start(application.bot)
+        # Просроченные автосообщения отправляем после старта приложения
+        application.job_queue.run_once(send_overdue_followups, when=5)
+    else:
+        await manager_outbox.stop()
 
-    start_time = datetime.now()
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
 
-    while True:
+async def post_init(application: Application):
+    """Запуск: восстановление расписания и выбор ведущего процесса"""
+    await restore_followups(application)
+    if config.METRICS_PORT:
         try:
-            now = datetime.now()
-            minutes_passed = (now - start_time).total_seconds() / 60
+            await metrics_server.start()
+        except OSError as e:
+            # Метрики необязательны: занятый порт не должен мешать запуску бота
+            logger.warning(f"⚠️ Endpoint метрик не запущен ({config.METRICS_LISTEN}:{metrics_server.port}): {e}")
+    application.job_queue.run_repeating(update_funnel, interval=config.FUNNEL_UPDATE_INTERVAL)
+    leader_election.on_change = functools.partial(on_leadership_change, application)
+    leader_election.start()
 
-            if not broadcast_first_sent and minutes_passed >= config.AUTO_MESSAGE_DELAYS['first']:
-                logger.info("📸 Запуск первой рассылки")
-                loop.run_until_complete(send_broadcast_first(app))
 
-            if not broadcast_second_sent and minutes_passed >= config.AUTO_MESSAGE_DELAYS['second']:
-                logger.info("📎 Запуск второй рассылки")
-                loop.run_until_complete(send_broadcast_second(app))
+async def post_stop(application: Application):
+    """Остановка фоновых задач; аренда ведущего освобождается (неотправленное останется в базе)"""
+    await leader_election.stop()
 
-            if broadcast_first_sent and broadcast_second_sent:
-                logger.info("✅ Все рассылки выполнены")
 
-            time.sleep(60)
+async def post_shutdown(application: Application):
+    """Завершение: запись накопленных пачек, итогов доставки и событий воронки, остановка endpoint метрик"""
+    await db.flush()
+    await flush_delivery_logs()
+    await funnel_recorder.flush()
+    await metrics_server.stop()
 
-        except Exception as e:
-            logger.error(f"Ошибка в планировщике: {e}")
-            time.sleep(60)
+
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
+    """Учёт и логирование ошибок обработчиков"""
+    ERRORS.inc('handler')
+    logger.error(f"❌ Ошибка при обработке обновления: {context.error}", exc_info=context.error)
 
 
 # ================== ВСПОМОГАТЕЛЬНЫЕ КОМАНДЫ ==================
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Отмена диалога"""
-    await update.message.reply_text(
-        "❌ Диалог отменен. Если захотите начать заново - напишите /start",
-        reply_markup=ReplyKeyboardRemove()
-    )
+    await reply(update, 'cancelled', ReplyKeyboardRemove())
     # Возвращаемся в RESULT, а не завершаем диалог
-    if context.user_data.get('survey_completed'):
-        await update.message.reply_text(
-            "Чем еще могу помочь?",
-            reply_markup=get_final_keyboard()
-        )
-    else:
-        await update.message.reply_text(
-            "Готовы записаться на замер?",
-            reply_markup=get_final_choice_keyboard()
-        )
+    await show_menu(update, context)
     return RESULT
 
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Справка"""
-    await update.message.reply_text(
-        "🤖 **Команды бота:**\n\n"
-        "/start - начать опрос\n"
-        "/cancel - отменить текущий диалог\n"
-        "/help - показать эту справку"
-    )
+    await reply(update, 'help')
+
+
+async def funnel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Воронка анкеты по шагам (только для менеджеров)"""
+    if update.effective_user.id not in MANAGER_IDS:
+        return
+    steps, updated_at, pending = await db.get_funnel_stats()
+    await update.message.reply_text(format_funnel(steps, updated_at, pending), parse_mode='Markdown')
+
+
+# Разделы /stats: разрез сводки, заголовок, сколько строк показывать
+LEAD_STATS_SECTIONS = {
+    'day': ("📅 По дням", 14),
+    'source': ("🔗 По источникам", 10),
+    'geography': ("🏙 По городам", 10),
+    'budget': ("💰 По бюджету", 10),
+}
+
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Сводка заявок (только для менеджеров): /stats или /stats day|source|geography|budget"""
+    if update.effective_user.id not in MANAGER_IDS:
+        return
+    sections = LEAD_STATS_SECTIONS
+    if context.args:
+        if context.args[0] not in LEAD_STATS_SECTIONS:
+            await update.message.reply_text(f"❌ Разделы: {', '.join(LEAD_STATS_SECTIONS)}")
+            return
+        # Один раздел - подробнее
+        title, _ = LEAD_STATS_SECTIONS[context.args[0]]
+        sections = {context.args[0]: (title, 50)}
+
+    total = await db.get_lead_stats('total', 1)
+    lines = [f"📈 Заполненных заявок: {total[0][1] if total else 0}"]
+    for dimension, (title, limit) in sections.items():
+        rows = await db.get_lead_stats(dimension, limit)
+        if rows:
+            lines += ["", f"{title}:"] + [f"• {key or 'не указано'}: {leads}" for key, leads in rows]
+    # Без Markdown: в источниках и городах бывают "_" и "*"
+    await update.message.reply_text("\n".join(lines))
+
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Выгрузка заявок в CSV (gzip) для CRM (только для менеджеров)"""
+    if update.effective_user.id not in MANAGER_IDS:
+        return
+    try:
+        export_filters = parse_filters(shlex.split(update.message.text)[1:])
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ {e}\n\n"
+            "Формат: /export [from=ГГГГ-ММ-ДД] [to=ГГГГ-ММ-ДД] [source=...] [geography=...] [completed=0|1]"
+        )
+        return
+
+    # Файл пишется на диск страницами и удаляется после отправки
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"leads_{datetime.now():%Y%m%d_%H%M%S}.csv.gz"
+        count = await export_leads_async(db, path, **export_filters)
+        if path.stat().st_size > MAX_DOCUMENT_SIZE:
+            await update.message.reply_text(
+                f"❌ Выгрузка ({count} заявок) больше 50 МБ. Сузьте фильтры или используйте python export.py"
+            )
+            return
+        with open(path, 'rb') as file:
+            await update.message.reply_document(file, filename=path.name, caption=f"📤 Заявок: {count}")
+    logger.info(f"📤 Выгрузка заявок для {update.effective_user.id}: {count} строк")
 
 
 # ================== ОБРАБОТЧИК INLINE КНОПОК ==================
@@ -1530,24 +710,33 @@ async def inline_callback_handler(update: Update, context: ContextTypes.DEFAULT_
 
     if query.data == "back_to_menu":
         await query.message.delete()
-
-        if context.user_data.get('survey_completed'):
-            await query.message.reply_text(
-                "Чем еще могу помочь?",
-                reply_markup=get_final_keyboard()
-            )
-        else:
-            await query.message.reply_text(
-                "Готовы записаться на замер?",
-                reply_markup=get_final_choice_keyboard()
-            )
+        await show_menu(update, context)
 
 
 # ================== ЗАПУСК ==================
 
-def main():
-    """Главная функция"""
-    application = Application.builder().token(config.BOT_TOKEN).build()
+def build_application():
+    """Сборка приложения со всеми обработчиками (без запуска)"""
+    # Состояние анкеты и user_data переживают перезапуск; chat_data и bot_data не используются
+    persistence = SQLitePersistence(
+        db,
+        store_data=PersistenceInput(chat_data=False, bot_data=False, callback_data=False),
+        update_interval=config.PERSISTENCE_UPDATE_INTERVAL,
+        owns=owns_user
+    )
+    builder = Application.builder().token(config.BOT_TOKEN)
+    if config.BOT_API_BASE_URL:
+        builder = builder.base_url(config.BOT_API_BASE_URL)
+    application = (
+        builder
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .persistence(persistence)
+        .concurrent_updates(PerUserUpdateProcessor(config.UPDATE_CONCURRENCY))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Создаем обработчик диалога
     conv_handler = ConversationHandler(
@@ -1557,16 +746,7 @@ def main():
             MessageHandler(filters.Regex('^(📞 Сразу записаться на бесплатный замер)$'), handle_start_choice)
         ],
         states={
-            GEOGRAPHY: [MessageHandler(filters.TEXT & ~filters.COMMAND, geography_handler)],
-            OBJECT_TYPE: [MessageHandler(filters.TEXT & ~filters.COMMAND, object_type_handler)],
-            SECONDARY_OPTIONS: [MessageHandler(filters.TEXT & ~filters.COMMAND, secondary_options_handler)],
-            CONDITION: [MessageHandler(filters.TEXT & ~filters.COMMAND, condition_handler)],
-            METRAGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, metrage_handler)],
-            REPAIR_FORMAT: [MessageHandler(filters.TEXT & ~filters.COMMAND, repair_format_handler)],
-            KEYS_READY: [MessageHandler(filters.TEXT & ~filters.COMMAND, keys_ready_handler)],
-            DEADLINE: [MessageHandler(filters.TEXT & ~filters.COMMAND, deadline_handler)],
-            MAIN_FEAR: [MessageHandler(filters.TEXT & ~filters.COMMAND, main_fear_handler)],
-            BUDGET: [MessageHandler(filters.TEXT & ~filters.COMMAND, budget_handler)],
+            **survey.states(),
             RESULT: [MessageHandler(filters.TEXT & ~filters.COMMAND, final_choice_handler)],
             999: [MessageHandler(filters.TEXT & ~filters.COMMAND, waiting_question_handler)],
             CONTACT: [MessageHandler(filters.CONTACT, contact_handler)],
@@ -1575,26 +755,79 @@ def main():
         per_message=False,
         per_chat=True,
         per_user=True,
+        name="survey",
+        persistent=True,
     )
 
+    # Из CONTACT в RESULT переходят только после сохранения заявки - это шаг LEAD
+    track_transitions(conv_handler, funnel_recorder, relabel={(CONTACT, RESULT): LEAD})
+
     application.add_handler(conv_handler)
     application.add_handler(CommandHandler('help', help_command))
+    application.add_handler(CommandHandler('funnel', funnel_command))
+    application.add_handler(CommandHandler('stats', stats_command))
+    application.add_handler(CommandHandler('export', export_command))
     application.add_handler(CallbackQueryHandler(inline_callback_handler))
+    application.add_error_handler(error_handler)
+    instrument_handlers(application)
+
+    return application
+
+
+def main():
+    """Главная функция"""
+    if config.BOT_MODE == "sharded" and config.SHARD_INDEX is None:
+        # Этот процесс - маршрутизатор: сам бот работает в процессах-шардах
+        asyncio.run(run_router(
+            command=[sys.executable, os.path.abspath(__file__)],
+            shards=config.SHARD_COUNT,
+            base_port=config.SHARD_BASE_PORT,
+            url=config.WEBHOOK_URL,
+            path=config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET,
+            host=config.WEBHOOK_LISTEN,
+            port=config.WEBHOOK_PORT,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            token=config.BOT_TOKEN,
+            base_url=config.BOT_API_BASE_URL
+        ))
+        return
 
-    # Планировщик рассылок
-    thread = threading.Thread(target=broadcast_scheduler, args=(application,), daemon=True)
-    thread.start()
+    application = build_application()
 
     print("=" * 70)
     print("🚀 БОТ ДЛЯ ЗАПИСИ НА ЗАМЕР ЗАПУЩЕН!")
     print("=" * 70)
     print(f"📱 Менеджеры ID: {MANAGER_IDS}")
-    print(f"📸 Первая рассылка через: {config.AUTO_MESSAGE_DELAYS['first']} мин")
-    print(f"📎 Вторая рассылка через: {config.AUTO_MESSAGE_DELAYS['second']} мин")
+    print(f"📸 Первая рассылка через: {config.AUTO_MESSAGE_DELAYS['first']} мин после /start")
+    print(f"📎 Вторая рассылка через: {config.AUTO_MESSAGE_DELAYS['second']} мин после /start")
+    print(f"📡 Режим получения обновлений: {config.BOT_MODE}")
     print("🛑 Нажмите Ctrl+C для остановки")
     print("=" * 70)
 
-    application.run_polling()
+    if config.BOT_MODE == "webhook":
+        asyncio.run(run_webhook(
+            application,
+            url=config.WEBHOOK_URL,
+            path=config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET,
+            host=config.WEBHOOK_LISTEN,
+            port=config.WEBHOOK_PORT,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS
+        ))
+    elif config.BOT_MODE == "sharded":
+        # Шард: принимает обновления от маршрутизатора, webhook регистрирует он
+        asyncio.run(run_webhook(
+            application,
+            url=None,
+            path=config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET,
+            host="127.0.0.1",
+            port=config.SHARD_BASE_PORT + config.SHARD_INDEX,
+            register=False
+        ))
+    else:
+        application.run_polling()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from metrics import BROADCAST_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+# Итоги доставки одному получателю
+SENT = 'sent'
+BLOCKED = 'blocked'      # пользователь заблокировал бота
+DELETED = 'deleted'      # аккаунт удалён или чат не найден
+FAILED = 'failed'        # прочие ошибки / исчерпаны попытки
+SENDING = 'sending'      # получатель зарезервирован, итог ещё не записан
+
+
+async def _aiter(iterable):
+    """Единый асинхронный обход для обычных и асинхронных итераторов"""
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+class TokenBucket:
+    """Глобальный ограничитель частоты (token bucket) с паузой по RetryAfter"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """Остановка всех отправок на seconds секунд (ответ 429 от Telegram)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ChatRateLimiter:
+    """Ограничение частоты сообщений в один чат"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._next_allowed = {}
+
+    async def acquire(self, chat_id):
+        now = time.monotonic()
+        next_allowed = self._next_allowed.get(chat_id, now)
+        self._next_allowed[chat_id] = max(next_allowed, now) + self.interval
+
+        # Периодически выбрасываем давно неактивные чаты
+        if len(self._next_allowed) > 10000:
+            self._next_allowed = {cid: t for cid, t in self._next_allowed.items() if t > now}
+
+        if next_allowed > now:
+            await asyncio.sleep(next_allowed - now)
+
+
+class DeliveryLog:
+    """Журнал доставки кампании в таблице broadcast_deliveries.
+
+    Получатели резервируются в базе до отправки, поэтому после перезапуска
+    рассылка продолжается с места остановки и никому не уходит повторно
+    (получатели, зарезервированные в момент падения, остаются в статусе
+    'sending' и не повторяются). Итоги копятся в памяти и пишутся пачками.
+    """
+
+    def __init__(self, db, campaign, batch_size=100):
+        self.db = db
+        self.campaign = campaign
+        self.batch_size = batch_size
+        self._pending = []
+
+    async def claim(self, user_ids):
+        return await self.db.claim_deliveries(self.campaign, list(user_ids))
+
+    async def record(self, user_id, status, attempts):
+        self._pending.append((user_id, status, attempts))
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        await self.db.record_deliveries(self.campaign, pending)
+
+
+class BroadcastEngine:
+    """Рассылка с учётом лимитов Telegram.
+
+    Отправки идут параллельно (не более concurrency одновременно) через общий
+    token bucket и лимит частоты на один чат. На RetryAfter все отправки
+    приостанавливаются на указанное Telegram время, и тот же получатель
+    повторяется без расхода попытки. Сетевые ошибки повторяются с
+    экспоненциальной паузой, не больше max_attempts раз.
+    """
+
+    def __init__(self, rate=25, chat_interval=1.0, concurrency=20, max_attempts=3, batch_size=100):
+        self.bucket = TokenBucket(rate)
+        self.chat_limiter = ChatRateLimiter(chat_interval)
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+
+    async def send(self, chat_id, send_func):
+        """Отправка одному получателю. Возвращает (итог, число попыток)"""
+        attempt = 0
+        network_errors = 0
+        while True:
+            attempt += 1
+            await self.chat_limiter.acquire(chat_id)
+            await self.bucket.acquire()
+            try:
+                await send_func(chat_id)
+                return SENT, attempt
+            except RetryAfter as e:
+                # 429 - ограничение бота, а не получателя: ждём и повторяем его же
+                logger.warning(f"⏳ Лимит Telegram, пауза {e.retry_after} с")
+                self.bucket.pause(e.retry_after)
+            except Forbidden as e:
+                if 'deactivated' in str(e).lower():
+                    return DELETED, attempt
+                return BLOCKED, attempt
+            except BadRequest as e:
+                if 'chat not found' in str(e).lower():
+                    return DELETED, attempt
+                logger.error(f"Ошибка рассылки пользователю {chat_id}: {e}")
+                return FAILED, attempt
+            except NetworkError as e:
+                logger.warning(f"Сетевая ошибка при отправке {chat_id}: {e}")
+                network_errors += 1
+                if network_errors >= self.max_attempts:
+                    return FAILED, attempt
+                await asyncio.sleep(2 ** network_errors)
+            except Exception as e:
+                logger.error(f"Ошибка рассылки пользователю {chat_id}: {e}")
+                return FAILED, attempt
+
+    async def deliver(self, chat_id, send_func, log):
+        """Разовая отправка с отметкой в журнале. None - если уже отправлялось"""
+        if not await log.claim([chat_id]):
+            return None
+        status, attempts = await self.send(chat_id, send_func)
+        BROADCAST_MESSAGES.inc(status)
+        await log.record(chat_id, status, attempts)
+        return status
+
+    async def run(self, recipients, send_func, log=None, on_result=None):
+        """Рассылка получателям (обычный или асинхронный итератор). Возвращает счётчик итогов
+
+        С журналом log получатели резервируются пачками по batch_size,
+        итоги записываются в него же.
+        """
+        stats = Counter()
+        queue = asyncio.Queue(maxsize=self.batch_size)
+
+        async def enqueue(chunk):
+            if log:
+                chunk = await log.claim(chunk)
+            for chat_id in chunk:
+                await queue.put(chat_id)
+
+        async def producer():
+            # Получатели идут конвейером: первая пачка уходит в работу,
+            # не дожидаясь чтения остальных
+            chunk = []
+            async for chat_id in _aiter(recipients):
+                chunk.append(chat_id)
+                if len(chunk) >= self.batch_size:
+                    await enqueue(chunk)
+                    chunk = []
+            if chunk:
+                await enqueue(chunk)
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def worker():
+            while (chat_id := await queue.get()) is not None:
+                status, attempts = await self.send(chat_id, send_func)
+                BROADCAST_MESSAGES.inc(status)
+                stats[status] += 1
+                if attempts > 1:
+                    stats['retried'] += 1
+                if log:
+                    await log.record(chat_id, status, attempts)
+                if on_result:
+                    await on_result(chat_id, status, attempts)
+
+        tasks = [asyncio.ensure_future(producer())]
+        tasks += [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Ошибка одной задачи (claim, итератор получателей, запись итога)
+            # останавливает остальные - иначе воркеры вечно ждали бы очередь
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if log:
+                await log.flush()
+        return stats
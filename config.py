@@ -15,6 +15,30 @@ if ADMIN_ID_1:
 if ADMIN_ID_2:
     ADMIN_IDS.append(int(ADMIN_ID_2))
 
+# Режим получения обновлений: "polling" или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Webhook: публичный https-адрес бота (без пути), путь, адрес и порт локального сервера
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Секрет из заголовка X-Telegram-Bot-Api-Secret-Token (A-Z, a-z, 0-9, _ и -)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Сколько одновременных соединений Telegram открывает к webhook (1-100)
+WEBHOOK_MAX_CONNECTIONS = 40
+
+# BOT_MODE="sharded": маршрутизатор на WEBHOOK_PORT раздаёт обновления SHARD_COUNT
+# процессам по user_id, шард N слушает 127.0.0.1:SHARD_BASE_PORT+N
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "2"))
+SHARD_BASE_PORT = int(os.getenv("SHARD_BASE_PORT", str(WEBHOOK_PORT + 1)))
+# Номер шарда выставляет маршрутизатор при запуске процесса (None - не шард)
+SHARD_INDEX = int(os.getenv("SHARD_INDEX")) if os.getenv("SHARD_INDEX") else None
+# Аренда ведущего процесса (рассылки, уведомления менеджерам), сек
+LEADER_LEASE_TTL = 30
+
+# Адрес Bot API (по умолчанию api.telegram.org): локальный Bot API сервер или заглушка
+BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL")
+
 # Настройки
 MIN_METRAGE = 30
 ALLOWED_CITIES = ["Ростов‑на‑Дону", "Аксай", "Батайск"]
@@ -25,6 +49,46 @@ AUTO_MESSAGE_DELAYS = {
     'second': 1440,    # 1440 минут = 24 часа
 }
 
+# Лимиты рассылок: Telegram допускает ~30 сообщений в секунду на бота
+# и ~1 сообщение в секунду в один чат
+BROADCAST_RATE = 25               # сообщений в секунду (глобально)
+BROADCAST_CHAT_INTERVAL = 1.0     # секунд между сообщениями в один чат
+BROADCAST_CONCURRENCY = 20        # одновременных запросов к Bot API
+BROADCAST_BATCH_SIZE = 100        # получателей в одной транзакции журнала доставки
+
+# Сколько обновлений обрабатывается одновременно (обновления одного пользователя - всегда по очереди)
+UPDATE_CONCURRENCY = 64
+
+# Уведомления менеджерам: не чаще одного сообщения за интервал (сек),
+# накопившиеся за это время заявки и вопросы приходят одной сводкой
+MANAGER_DIGEST_INTERVAL = 30
+# Как часто ведущий процесс проверяет очередь уведомлений (её пополняют и другие шарды), сек
+MANAGER_OUTBOX_POLL_INTERVAL = 5
+
+# Локальный endpoint метрик (GET /metrics); шард N слушает METRICS_PORT+N, 0 - выключен
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Воронка анкеты: переходы пишутся в survey_events пачками по FUNNEL_BATCH_SIZE
+# (остаток - раз в FUNNEL_UPDATE_INTERVAL сек), тогда же ведущий процесс пересчитывает агрегаты
+FUNNEL_BATCH_SIZE = 500
+FUNNEL_UPDATE_INTERVAL = 30
+
+# synchronous для leads.db: FULL - записанное ботом переживает и сбой питания
+DB_SYNCHRONOUS = "FULL"
+# Групповая запись: вызовы этих методов Database копятся до GROUP_COMMIT_WINDOW сек
+# (или GROUP_COMMIT_MAX_BATCH штук) и записываются одной транзакцией с одним fsync
+GROUP_COMMIT_METHODS = ('update_start_time', 'save_lead')
+GROUP_COMMIT_WINDOW = 0.005
+GROUP_COMMIT_MAX_BATCH = 256
+
+# Кэш состояния заявок (время старта, заполнена ли анкета): пользователей в памяти и срок жизни записи, сек
+LEAD_CACHE_SIZE = 10000
+LEAD_CACHE_TTL = 3600
+
+# Как часто (в секундах) состояние анкет и user_data сбрасывается в leads.db
+PERSISTENCE_UPDATE_INTERVAL = 10
+
 # Подписи для рассылок (теперь в config.py)
 BROADCAST_FIRST_CAPTION = (
     "🎁 **Дарим бесплатный дизайн проект от нашего дизайнера** "
@@ -1,164 +1,883 @@
+import asyncio
+import functools
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import os
 
+from metrics import DB_SECONDS
+
+
+def _create_base_schema(cursor):
+    """Миграция 1: исходные таблицы (для старых баз - только недостающее)"""
+    # Таблица лидов
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE,
+            name TEXT,
+            phone TEXT,
+            geography TEXT,
+            object_type TEXT,
+            condition TEXT,
+            metrage INTEGER,
+            repair_format TEXT,
+            keys_ready TEXT,
+            deadline TEXT,
+            main_fear TEXT,
+            budget TEXT,
+            source TEXT,
+            appointment_time TEXT,
+            appointment_status TEXT DEFAULT 'pending',
+            survey_completed INTEGER DEFAULT 0,
+            start_time TIMESTAMP,
+            created_at TIMESTAMP
+        )
+    """)
+
+    # Таблица для хранения фото рассылок
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_media (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            broadcast_type TEXT UNIQUE,
+            photo_file_id TEXT,
+            caption TEXT,
+            updated_at TIMESTAMP
+        )
+    """)
+
+    # Журнал доставки рассылок: одна строка на получателя кампании
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            campaign TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER DEFAULT 0,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (campaign, user_id)
+        ) WITHOUT ROWID
+    """)
+
+    # Хэш файла, для которого получен file_id (старые базы - без колонки)
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(broadcast_media)")]
+    if 'file_hash' not in columns:
+        cursor.execute("ALTER TABLE broadcast_media ADD COLUMN file_hash TEXT")
+
+
+def _not_null_survey_completed(cursor):
+    """Миграция 2: survey_completed всегда 0/1 (NOT NULL), пересборка таблицы leads"""
+    cursor.execute("UPDATE leads SET survey_completed = 0 WHERE survey_completed IS NULL")
+    cursor.execute("""
+        CREATE TABLE leads_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE,
+            name TEXT,
+            phone TEXT,
+            geography TEXT,
+            object_type TEXT,
+            condition TEXT,
+            metrage INTEGER,
+            repair_format TEXT,
+            keys_ready TEXT,
+            deadline TEXT,
+            main_fear TEXT,
+            budget TEXT,
+            source TEXT,
+            appointment_time TEXT,
+            appointment_status TEXT DEFAULT 'pending',
+            survey_completed INTEGER NOT NULL DEFAULT 0,
+            start_time TIMESTAMP,
+            created_at TIMESTAMP
+        )
+    """)
+    cursor.execute("INSERT INTO leads_new SELECT * FROM leads")
+    cursor.execute("DROP TABLE leads")
+    cursor.execute("ALTER TABLE leads_new RENAME TO leads")
+
+
+def _add_lead_indexes(cursor):
+    """Миграция 3: частичные индексы для выборок по незаполненным анкетам"""
+    # get_all_users_without_survey: только user_id незаполнивших
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leads_pending_user
+        ON leads (user_id) WHERE survey_completed = 0
+    """)
+    # get_all_users_with_start_time и догоняющие рассылки по start_time:
+    # покрывающий индекс, таблицу читать не нужно
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leads_pending_start
+        ON leads (start_time, user_id, name, phone) WHERE survey_completed = 0
+    """)
+    cursor.execute("ANALYZE leads")
+
+
+def _create_persistence_tables(cursor):
+    """Миграция 4: user_data и состояния диалогов для SQLitePersistence"""
+    # kind: 'user', 'chat', 'bot', 'callback'; data - pickle
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS persistence_data (
+            kind TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (kind, id)
+        ) WITHOUT ROWID
+    """)
+    # key и state - JSON
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS persistence_conversations (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            PRIMARY KEY (name, key)
+        ) WITHOUT ROWID
+    """)
+
+
+def _create_manager_outbox(cursor):
+    """Миграция 5: очередь уведомлений менеджерам"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS manager_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            text TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_manager_outbox_due ON manager_outbox (next_attempt_at)")
+
+
+def _create_leases(cursor):
+    """Миграция 6: аренды для выбора ведущего процесса"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+
+
+def _create_funnel_tables(cursor):
+    """Миграция 7: события переходов анкеты и инкрементальные агрегаты воронки"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS survey_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            state INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+    # Текущий шаг каждого пользователя и время входа в него
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS funnel_progress (
+            user_id INTEGER PRIMARY KEY,
+            state INTEGER NOT NULL,
+            entered_at REAL NOT NULL
+        )
+    """)
+    # Какие шаги пользователь уже проходил (для подсчёта уникальных)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS funnel_reached (
+            user_id INTEGER NOT NULL,
+            state INTEGER NOT NULL,
+            PRIMARY KEY (user_id, state)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS funnel_steps (
+            state INTEGER PRIMARY KEY,
+            reached INTEGER NOT NULL DEFAULT 0,
+            entered INTEGER NOT NULL DEFAULT 0,
+            current INTEGER NOT NULL DEFAULT 0,
+            exits INTEGER NOT NULL DEFAULT 0,
+            seconds REAL NOT NULL DEFAULT 0
+        )
+    """)
+    # До какого события агрегаты посчитаны
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS funnel_cursor (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_event_id INTEGER NOT NULL,
+            updated_at REAL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO funnel_cursor (id, last_event_id) VALUES (1, 0)")
+
+
+# Поля заявки, которые save_lead берёт из переданных данных
+LEAD_FIELDS = (
+    'name', 'phone', 'geography', 'object_type', 'condition', 'metrage', 'repair_format',
+    'keys_ready', 'deadline', 'main_fear', 'budget', 'source', 'appointment_time',
+    'appointment_status', 'survey_completed', 'start_time',
+)
+
+# Разрезы сводки заявок: имя -> выражение над строкой leads
+LEAD_STATS_DIMENSIONS = {
+    'total': "''",
+    'day': "date(created_at)",
+    'source': "COALESCE(source, '')",
+    'geography': "COALESCE(geography, '')",
+    'budget': "COALESCE(budget, '')",
+}
+
+
+def _create_lead_stats(cursor):
+    """Миграция 8: сводка заполненных заявок по дням, источникам, городам и бюджетам"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS lead_stats (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            leads INTEGER NOT NULL,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID
+    """)
+    for dimension, expression in LEAD_STATS_DIMENSIONS.items():
+        cursor.execute(f"""
+            INSERT OR REPLACE INTO lead_stats (dimension, key, leads)
+            SELECT ?, {expression}, COUNT(*) FROM leads WHERE survey_completed = 1 GROUP BY 2
+        """, (dimension,))
+
+
+# Миграции схемы по порядку: версия базы (PRAGMA user_version) = число применённых.
+# Новые миграции только добавляются в конец списка
+MIGRATIONS = [
+    _create_base_schema,
+    _not_null_survey_completed,
+    _add_lead_indexes,
+    _create_persistence_tables,
+    _create_manager_outbox,
+    _create_leases,
+    _create_funnel_tables,
+    _create_lead_stats,
+]
+
 
 class Database:
-    def __init__(self, db_path):
+    def __init__(self, db_path, synchronous="NORMAL"):
         self.db_path = db_path
+        # FULL - fsync при каждом COMMIT (запись переживает и сбой питания)
+        self.synchronous = synchronous
+        # Одно долгоживущее соединение на процесс: доступ к нему
+        # сериализуется блокировкой, вложенные транзакции - через SAVEPOINT
+        self._lock = threading.RLock()
+        self._depth = 0
+        self.conn = self._connect()
         self.init_db()
 
+    def _connect(self):
+        """Открытие соединения и настройка PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=30,
+            isolation_level=None,      # транзакциями управляем сами
+            check_same_thread=False,   # соединение используется из пула потоков
+            cached_statements=256      # кэш подготовленных запросов
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("PRAGMA cache_size=-16000")   # ~16 МБ страничного кэша
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Транзакция на общем соединении (вложенные вызовы - через SAVEPOINT)"""
+        with self._lock:
+            savepoint = f"sp{self._depth}"
+            if self._depth == 0:
+                self.conn.execute("BEGIN IMMEDIATE")
+            else:
+                self.conn.execute(f"SAVEPOINT {savepoint}")
+            self._depth += 1
+            try:
+                yield self.conn.cursor()
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("ROLLBACK")
+                else:
+                    self.conn.execute(f"ROLLBACK TO {savepoint}")
+                    self.conn.execute(f"RELEASE {savepoint}")
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.conn.execute("COMMIT")
+                    except BaseException:
+                        # Неудачный COMMIT (SQLITE_BUSY, диск заполнен) оставляет транзакцию
+                        # открытой - иначе следующие записи молча попали бы в неё
+                        if self.conn.in_transaction:
+                            self.conn.execute("ROLLBACK")
+                        raise
+                else:
+                    self.conn.execute(f"RELEASE {savepoint}")
+
+    def _fetchone(self, query, params=()):
+        with self._lock:
+            return self.conn.execute(query, params).fetchone()
+
+    def _fetchall(self, query, params=()):
+        with self._lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def close(self):
+        """Закрытие соединения"""
+        with self._lock:
+            self.conn.close()
+
     def init_db(self):
-        """Инициализация базы данных"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        """Инициализация базы данных: применение недостающих миграций"""
+        with self.transaction() as cursor:
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {number}")
 
-            # Таблица лидов
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS leads (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER UNIQUE,
-                    name TEXT,
-                    phone TEXT,
-                    geography TEXT,
-                    object_type TEXT,
-                    condition TEXT,
-                    metrage INTEGER,
-                    repair_format TEXT,
-                    keys_ready TEXT,
-                    deadline TEXT,
-                    main_fear TEXT,
-                    budget TEXT,
-                    source TEXT,
-                    appointment_time TEXT,
-                    appointment_status TEXT DEFAULT 'pending',
-                    survey_completed INTEGER DEFAULT 0,
-                    start_time TIMESTAMP,
-                    created_at TIMESTAMP
-                )
-            """)
-
-            # Таблица для хранения фото рассылок
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS broadcast_media (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    broadcast_type TEXT UNIQUE,
-                    photo_file_id TEXT,
-                    caption TEXT,
-                    updated_at TIMESTAMP
-                )
-            """)
+    def _count_lead(self, cursor, user_id, delta):
+        """Учёт заполненной заявки user_id в сводке lead_stats (delta: +1 или -1)"""
+        row = cursor.execute(
+            f"SELECT {', '.join(LEAD_STATS_DIMENSIONS.values())} FROM leads "
+            f"WHERE user_id = ? AND survey_completed = 1", (user_id,)
+        ).fetchone()
+        if row is None:
+            return
+        cursor.executemany("""
+            INSERT INTO lead_stats (dimension, key, leads) VALUES (?, ?, ?)
+            ON CONFLICT(dimension, key) DO UPDATE SET leads = leads + excluded.leads
+        """, [(dimension, key, delta) for dimension, key in zip(LEAD_STATS_DIMENSIONS, row)])
+
+    def _upsert_lead(self, cursor, user_id, fields, new_row=None):
+        """Запись fields в строку заявки user_id; new_row - поля, которые задаются только новой строке.
 
-            conn.commit()
+        Существующая строка меняется через UPDATE: UPSERT с конфликтом всё равно
+        расходует значение AUTOINCREMENT. INSERT ... ON CONFLICT остаётся для новых
+        пользователей (и на случай, если строку успел вставить другой процесс).
+        """
+        cursor.execute(
+            f"UPDATE leads SET {', '.join(f'{column} = ?' for column in fields)} WHERE user_id = ?",
+            (*fields.values(), user_id)
+        )
+        if cursor.rowcount:
+            return
+        row = {'user_id': user_id, **fields, **(new_row or {})}
+        cursor.execute(f"""
+            INSERT INTO leads ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})
+            ON CONFLICT(user_id) DO UPDATE SET
+            {', '.join(f'{column} = excluded.{column}' for column in fields)}
+        """, tuple(row.values()))
 
     def save_lead(self, data):
-        """Сохранение лида"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        """Сохранение лида: записываются только поля, переданные в data.
 
-            cursor.execute("""
-                INSERT OR REPLACE INTO leads 
-                (user_id, name, phone, geography, object_type, condition, metrage, 
-                 repair_format, keys_ready, deadline, main_fear, budget, source, 
-                 appointment_time, appointment_status, survey_completed, start_time, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                data['user_id'],
-                data.get('name', ''),
-                data.get('phone', ''),
-                data.get('geography', ''),
-                data.get('object_type', ''),
-                data.get('condition', ''),
-                data.get('metrage', 0),
-                data.get('repair_format', ''),
-                data.get('keys_ready', ''),
-                data.get('deadline', ''),
-                data.get('main_fear', ''),
-                data.get('budget', ''),
-                data.get('source', 'direct'),
-                data.get('appointment_time', ''),
-                data.get('appointment_status', 'pending'),
-                data.get('survey_completed', 0),
-                data.get('start_time'),
-                datetime.now()
-            ))
-            conn.commit()
+        Строка обновляется на месте (id и незатронутые поля сохраняются),
+        сводка lead_stats - в той же транзакции.
+        """
+        fields = {field: data[field] for field in LEAD_FIELDS if field in data}
+        fields['created_at'] = datetime.now()
+        with self.transaction() as cursor:
+            self._count_lead(cursor, data['user_id'], -1)
+            self._upsert_lead(cursor, data['user_id'], fields)
+            self._count_lead(cursor, data['user_id'], 1)
 
     def update_start_time(self, user_id):
-        """Обновление времени старта"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        """Обновление времени старта (ответы и контакт вернувшегося пользователя не трогаются)"""
+        with self.transaction() as cursor:
             now = datetime.now()
 
-            cursor.execute("""
-                INSERT OR REPLACE INTO leads (user_id, start_time, created_at, survey_completed)
-                VALUES (?, ?, ?, ?)
-            """, (user_id, now, now, 0))
+            self._upsert_lead(cursor, user_id, {'start_time': now}, {'created_at': now, 'survey_completed': 0})
 
-            conn.commit()
             return now
 
     def get_user_start_time(self, user_id):
         """Получение времени старта"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT start_time FROM leads WHERE user_id = ?", (user_id,))
-            result = cursor.fetchone()
-            return result[0] if result else None
+        result = self._fetchone("SELECT start_time FROM leads WHERE user_id = ?", (user_id,))
+        return result[0] if result else None
 
     def is_survey_completed(self, user_id):
         """Проверка, заполнена ли анкета"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT survey_completed FROM leads WHERE user_id = ?", (user_id,))
-            result = cursor.fetchone()
-            return result[0] == 1 if result else False
+        result = self._fetchone("SELECT survey_completed FROM leads WHERE user_id = ?", (user_id,))
+        return result[0] == 1 if result else False
+
+    def get_lead_state(self, user_id):
+        """Время старта и признак заполненной анкеты одним запросом (None - пользователя нет)"""
+        result = self._fetchone("SELECT start_time, survey_completed FROM leads WHERE user_id = ?", (user_id,))
+        return (result[0], result[1] == 1) if result else None
 
-    def save_broadcast_media(self, broadcast_type, photo_file_id, caption):
+    def save_broadcast_media(self, broadcast_type, photo_file_id, caption, file_hash=None):
         """Сохранение медиа для рассылки"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self.transaction() as cursor:
             cursor.execute("""
-                INSERT OR REPLACE INTO broadcast_media 
-                (broadcast_type, photo_file_id, caption, updated_at)
-                VALUES (?, ?, ?, ?)
-            """, (broadcast_type, photo_file_id, caption, datetime.now()))
-            conn.commit()
+                INSERT INTO broadcast_media (broadcast_type, photo_file_id, caption, file_hash, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(broadcast_type) DO UPDATE SET
+                    photo_file_id = excluded.photo_file_id, caption = excluded.caption,
+                    file_hash = excluded.file_hash, updated_at = excluded.updated_at
+            """, (broadcast_type, photo_file_id, caption, file_hash, datetime.now()))
             return True
 
     def get_broadcast_media(self, broadcast_type):
-        """Получение медиа для рассылки"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT photo_file_id, caption FROM broadcast_media 
-                WHERE broadcast_type = ?
-            """, (broadcast_type,))
-            result = cursor.fetchone()
-            return result if result else None
-
-    def get_all_users_with_start_time(self):
-        """Получение всех пользователей, не заполнивших анкету"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT user_id, start_time, name, phone
-                FROM leads 
-                WHERE start_time IS NOT NULL AND survey_completed = 0
-                ORDER BY start_time DESC
-            """)
-            return cursor.fetchall()
+        """Получение медиа для рассылки: (file_id, подпись, хэш файла)"""
+        result = self._fetchone("""
+            SELECT photo_file_id, caption, file_hash FROM broadcast_media
+            WHERE broadcast_type = ?
+        """, (broadcast_type,))
+        return result if result else None
+
+    def get_all_users_with_start_time(self, started_after=None):
+        """Получение всех пользователей, не заполнивших анкету
+
+        started_after - только стартовавшие позже этого времени.
+        """
+        query = """
+            SELECT user_id, start_time, name, phone
+            FROM leads
+            WHERE start_time IS NOT NULL AND survey_completed = 0
+        """
+        params = []
+        if started_after is not None:
+            query += " AND start_time > ?"
+            params.append(started_after)
+        return self._fetchall(query + " ORDER BY start_time DESC", params)
 
     def get_all_user_ids(self):
         """Получение ID всех пользователей"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT user_id FROM leads")
-            return [row[0] for row in cursor.fetchall()]
-
-    def get_all_users_without_survey(self):
-        """Получение ID пользователей, не заполнивших анкету"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT user_id FROM leads WHERE survey_completed = 0 OR survey_completed IS NULL")
-            return [row[0] for row in cursor.fetchall()]
\ No newline at end of file
+        return [row[0] for row in self._fetchall("SELECT user_id FROM leads")]
+
+    def _users_without_survey_query(self, started_before=None, exclude_campaign=None):
+        query = "SELECT user_id FROM leads WHERE survey_completed = 0"
+        params = []
+        if started_before is not None:
+            query += " AND start_time <= ?"
+            params.append(started_before)
+        if exclude_campaign is not None:
+            query += """ AND NOT EXISTS (
+                SELECT 1 FROM broadcast_deliveries d
+                WHERE d.campaign = ? AND d.user_id = leads.user_id
+            )"""
+            params.append(exclude_campaign)
+        return query, params
+
+    def get_all_users_without_survey(self, started_before=None, exclude_campaign=None):
+        """Получение ID пользователей, не заполнивших анкету
+
+        started_before - только стартовавшие раньше этого времени,
+        exclude_campaign - без тех, кому кампания уже отправлялась.
+        """
+        query, params = self._users_without_survey_query(started_before, exclude_campaign)
+        return [row[0] for row in self._fetchall(query, params)]
+
+    def _iter_pages(self, query, params, page_size):
+        """Постраничный обход выборки user_id (keyset по user_id, без OFFSET)"""
+        last_user_id = -2 ** 63
+        while True:
+            rows = self._fetchall(
+                f"{query} AND user_id > ? ORDER BY user_id LIMIT ?",
+                (*params, last_user_id, page_size)
+            )
+            if not rows:
+                return
+            page = [row[0] for row in rows]
+            last_user_id = page[-1]
+            yield page
+
+    def iter_user_ids(self, page_size=1000):
+        """ID всех пользователей страницами по page_size"""
+        return self._iter_pages("SELECT user_id FROM leads WHERE 1", [], page_size)
+
+    def iter_users_without_survey(self, started_before=None, exclude_campaign=None, page_size=1000):
+        """ID пользователей, не заполнивших анкету, страницами по page_size"""
+        query, params = self._users_without_survey_query(started_before, exclude_campaign)
+        return self._iter_pages(query, params, page_size)
+
+    def iter_leads(self, columns, created_from=None, created_to=None, source=None, geography=None,
+                   survey_completed=None, page_size=1000):
+        """Строки leads (только columns) с фильтрами, страницами по page_size.
+
+        created_from/created_to - полуинтервал [from, to) по created_at;
+        обход по id без OFFSET, в памяти одна страница.
+        """
+        conditions, params = [], []
+        for condition, value in (("created_at >= ?", created_from), ("created_at < ?", created_to),
+                                 ("source = ?", source), ("geography = ?", geography),
+                                 ("survey_completed = ?", survey_completed)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        query = f"SELECT id, {', '.join(columns)} FROM leads WHERE {' AND '.join(conditions + ['id > ?'])}"
+
+        last_id = 0
+        while True:
+            rows = self._fetchall(f"{query} ORDER BY id LIMIT ?", (*params, last_id, page_size))
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [row[1:] for row in rows]
+
+    def claim_deliveries(self, campaign, user_ids):
+        """Резервирование получателей кампании одной транзакцией.
+
+        Возвращает только тех, кому кампания ещё не отправлялась: после
+        резервирования повторная отправка тому же пользователю невозможна.
+        """
+        now = datetime.now()
+        claimed = []
+        with self.transaction() as cursor:
+            for user_id in user_ids:
+                cursor.execute("""
+                    INSERT OR IGNORE INTO broadcast_deliveries (campaign, user_id, status, attempts, updated_at)
+                    VALUES (?, ?, 'sending', 0, ?)
+                """, (campaign, user_id, now))
+                if cursor.rowcount:
+                    claimed.append(user_id)
+        return claimed
+
+    def record_deliveries(self, campaign, results):
+        """Сохранение итогов доставки пачкой: results - список (user_id, статус, попытки)"""
+        now = datetime.now()
+        with self.transaction() as cursor:
+            cursor.executemany("""
+                UPDATE broadcast_deliveries SET status = ?, attempts = ?, updated_at = ?
+                WHERE campaign = ? AND user_id = ?
+            """, [(status, attempts, now, campaign, user_id) for user_id, status, attempts in results])
+
+    def get_lead_stats(self, dimension, limit=10):
+        """Сводка заявок по разрезу: список (значение, заявок).
+
+        Для дней - последние limit дней, для остальных - limit самых частых.
+        """
+        order = "key DESC" if dimension == 'day' else "leads DESC, key"
+        return self._fetchall(f"""
+            SELECT key, leads FROM lead_stats
+            WHERE dimension = ? AND leads > 0 ORDER BY {order} LIMIT ?
+        """, (dimension, limit))
+
+    def get_delivery_stats(self, campaign):
+        """Количество получателей кампании по статусам"""
+        rows = self._fetchall("""
+            SELECT status, COUNT(*) FROM broadcast_deliveries
+            WHERE campaign = ? GROUP BY status
+        """, (campaign,))
+        return dict(rows)
+
+    def get_persistent_data(self, kind):
+        """Сохранённые данные PTB вида kind: список (id, data)"""
+        return self._fetchall("SELECT id, data FROM persistence_data WHERE kind = ?", (kind,))
+
+    def get_persistent_conversations(self, name):
+        """Сохранённые состояния диалога name: список (key, state)"""
+        return self._fetchall("SELECT key, state FROM persistence_conversations WHERE name = ?", (name,))
+
+    def save_persistent_state(self, data, conversations):
+        """Запись накопленных изменений persistence одной транзакцией.
+
+        data - список (kind, id, data), conversations - список (name, key, state);
+        None вместо data/state удаляет запись.
+        """
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "DELETE FROM persistence_data WHERE kind = ? AND id = ?",
+                [(kind, id_) for kind, id_, value in data if value is None]
+            )
+            cursor.executemany("""
+                INSERT INTO persistence_data (kind, id, data) VALUES (?, ?, ?)
+                ON CONFLICT(kind, id) DO UPDATE SET data = excluded.data
+            """, [row for row in data if row[2] is not None])
+            cursor.executemany(
+                "DELETE FROM persistence_conversations WHERE name = ? AND key = ?",
+                [(name, key) for name, key, state in conversations if state is None]
+            )
+            cursor.executemany("""
+                INSERT INTO persistence_conversations (name, key, state) VALUES (?, ?, ?)
+                ON CONFLICT(name, key) DO UPDATE SET state = excluded.state
+            """, [row for row in conversations if row[2] is not None])
+
+    def enqueue_notifications(self, kind, text, chat_ids):
+        """Постановка уведомления в очередь для каждого из chat_ids одной транзакцией"""
+        now = datetime.now()
+        with self.transaction() as cursor:
+            cursor.executemany("""
+                INSERT INTO manager_outbox (chat_id, kind, text, attempts, next_attempt_at, created_at)
+                VALUES (?, ?, ?, 0, ?, ?)
+            """, [(chat_id, kind, text, now, now) for chat_id in chat_ids])
+
+    def get_due_notifications(self, now):
+        """Уведомления, которые пора отправить: список (id, chat_id, kind, text, attempts)"""
+        return self._fetchall("""
+            SELECT id, chat_id, kind, text, attempts FROM manager_outbox
+            WHERE next_attempt_at <= ? ORDER BY id
+        """, (now,))
+
+    def get_next_notification_time(self, now):
+        """Ближайшее время повторной отправки после now (None - таких нет)"""
+        row = self._fetchone("SELECT MIN(next_attempt_at) FROM manager_outbox WHERE next_attempt_at > ?", (now,))
+        return datetime.fromisoformat(row[0]) if row[0] else None
+
+    def delete_notifications(self, ids):
+        """Удаление отправленных уведомлений"""
+        with self.transaction() as cursor:
+            cursor.executemany("DELETE FROM manager_outbox WHERE id = ?", [(id_,) for id_ in ids])
+
+    def postpone_notifications(self, ids, next_attempt_at):
+        """Перенос неудавшихся уведомлений на next_attempt_at с учётом попытки"""
+        with self.transaction() as cursor:
+            cursor.executemany("""
+                UPDATE manager_outbox SET attempts = attempts + 1, next_attempt_at = ?
+                WHERE id = ?
+            """, [(next_attempt_at, id_) for id_ in ids])
+
+    def acquire_lease(self, name, holder, ttl):
+        """Захват или продление аренды name на ttl секунд.
+
+        Удаётся, если аренда свободна, истекла или уже принадлежит holder.
+        Возвращает True, если аренда за holder.
+        """
+        now = time.time()
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+            """, (name, holder, now + ttl, now))
+            row = cursor.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+        return row[0] == holder
+
+    def release_lease(self, name, holder):
+        """Освобождение аренды, если она принадлежит holder"""
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def add_survey_events(self, events):
+        """Запись пачки переходов анкеты: events - список (user_id, состояние, время)"""
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "INSERT INTO survey_events (user_id, state, created_at) VALUES (?, ?, ?)", events
+            )
+
+    def aggregate_funnel(self, end_state, batch_size=10000):
+        """Дообработка новых событий survey_events в агрегаты funnel_steps.
+
+        За вызов обрабатывается не больше batch_size событий одной транзакцией;
+        переход в end_state завершает прохождение пользователя. Возвращает
+        число обработанных событий.
+        """
+        with self.transaction() as cursor:
+            last_id = cursor.execute("SELECT last_event_id FROM funnel_cursor WHERE id = 1").fetchone()[0]
+            events = cursor.execute("""
+                SELECT id, user_id, state, created_at FROM survey_events
+                WHERE id > ? ORDER BY id LIMIT ?
+            """, (last_id, batch_size)).fetchall()
+            if not events:
+                return 0
+
+            user_ids = list({event[1] for event in events})
+            progress = {}
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                progress.update((user_id, (state, entered_at)) for user_id, state, entered_at in cursor.execute(
+                    f"SELECT user_id, state, entered_at FROM funnel_progress "
+                    f"WHERE user_id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+            touched = set()
+
+            # state -> [reached, entered, current, exits, seconds]
+            steps = {}
+            for _, user_id, state, created_at in events:
+                previous = progress.get(user_id)
+                if previous is not None:
+                    if previous[0] == state:
+                        continue
+                    step = steps.setdefault(previous[0], [0, 0, 0, 0, 0.0])
+                    step[2] -= 1
+                    step[3] += 1
+                    step[4] += max(created_at - previous[1], 0)
+                touched.add(user_id)
+                if state == end_state:
+                    progress[user_id] = None
+                    continue
+                step = steps.setdefault(state, [0, 0, 0, 0, 0.0])
+                step[1] += 1
+                step[2] += 1
+                cursor.execute("INSERT OR IGNORE INTO funnel_reached (user_id, state) VALUES (?, ?)", (user_id, state))
+                step[0] += cursor.rowcount
+                progress[user_id] = (state, created_at)
+
+            cursor.executemany(
+                "DELETE FROM funnel_progress WHERE user_id = ?",
+                [(user_id,) for user_id in touched if progress[user_id] is None]
+            )
+            cursor.executemany("""
+                INSERT INTO funnel_progress (user_id, state, entered_at) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, entered_at = excluded.entered_at
+            """, [(user_id, *progress[user_id]) for user_id in touched if progress[user_id] is not None])
+            cursor.executemany("""
+                INSERT INTO funnel_steps (state, reached, entered, current, exits, seconds)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(state) DO UPDATE SET
+                    reached = reached + excluded.reached,
+                    entered = entered + excluded.entered,
+                    current = current + excluded.current,
+                    exits = exits + excluded.exits,
+                    seconds = seconds + excluded.seconds
+            """, [(state, *values) for state, values in steps.items()])
+            cursor.execute(
+                "UPDATE funnel_cursor SET last_event_id = ?, updated_at = ? WHERE id = 1",
+                (events[-1][0], time.time())
+            )
+        return len(events)
+
+    def get_funnel_stats(self):
+        """Агрегаты воронки: (шаги, время пересчёта, число ещё не учтённых событий).
+
+        Шаги - словарь state -> (reached, entered, current, exits, seconds).
+        """
+        steps = {row[0]: row[1:] for row in self._fetchall(
+            "SELECT state, reached, entered, current, exits, seconds FROM funnel_steps"
+        )}
+        last_id, updated_at = self._fetchone("SELECT last_event_id, updated_at FROM funnel_cursor WHERE id = 1")
+        max_id = self._fetchone("SELECT MAX(id) FROM survey_events")[0] or 0
+        return steps, updated_at, max_id - last_id
+
+class AsyncDatabase:
+    """Асинхронная обёртка над Database.
+
+    Каждый метод Database доступен как корутина и выполняется в отдельном
+    потоке БД, поэтому обработчики не блокируют цикл событий при работе с диском.
+    """
+
+    def __init__(self, db, group_commit=(), commit_window=0.005, max_batch=256):
+        self.db = db
+        # Один поток: соединение всё равно одно, а порядок записей сохраняется
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+        # Методы, вызовы которых копятся до commit_window сек (или max_batch штук)
+        # и записываются одной транзакцией - один COMMIT и один fsync на пачку
+        self.group_commit = frozenset(group_commit)
+        self.commit_window = commit_window
+        self.max_batch = max_batch
+        self._pending = []
+        self._flush_handle = None
+        self._flushes = set()
+
+    async def run(self, func, *args, **kwargs):
+        """Выполнение произвольной функции в потоке БД"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def stream(self, name, *args, **kwargs):
+        """Асинхронный поток записей из постраничного генератора Database (iter_*).
+
+        Каждая страница читается в потоке БД; следующая запрашивается заранее,
+        пока обрабатывается текущая.
+        """
+        pages = getattr(self.db, name)(*args, **kwargs)
+        next_page = asyncio.ensure_future(self.run(next, pages, None))
+        try:
+            while (page := await next_page) is not None:
+                next_page = asyncio.ensure_future(self.run(next, pages, None))
+                for item in page:
+                    yield item
+        finally:
+            await asyncio.wait([next_page])
+            await self.run(pages.close)
+
+    async def grouped(self, name, *args, **kwargs):
+        """Вызов метода Database в общей транзакции с вызовами, пришедшими за commit_window.
+
+        Результат возвращается только после COMMIT всей пачки. Ошибка вызова
+        откатывает лишь его SAVEPOINT, остальные вызовы пачки записываются.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((name, args, kwargs, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.commit_window, self._start_flush)
+        return await future
+
+    def _start_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch):
+        try:
+            results = await self.run(self._commit_batch, batch)
+        except Exception as e:
+            # Не удался сам COMMIT - не записан ни один вызов пачки
+            results = [(e, None)] * len(batch)
+        for (*_, future), (error, result) in zip(batch, results):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _commit_batch(self, batch):
+        """Пачка вызовов одной транзакцией (в потоке БД); вызовы - во вложенных SAVEPOINT"""
+        results = []
+        started = time.perf_counter()
+        try:
+            with self.db.transaction():
+                for name, args, kwargs, _ in batch:
+                    # Каждый вызов учитывается под своим именем, как и вне пачки
+                    call_started = time.perf_counter()
+                    try:
+                        results.append((None, getattr(self.db, name)(*args, **kwargs)))
+                    except Exception as e:
+                        results.append((e, None))
+                    finally:
+                        DB_SECONDS.observe(name, time.perf_counter() - call_started)
+        finally:
+            DB_SECONDS.observe("group_commit", time.perf_counter() - started)
+        return results
+
+    async def flush(self):
+        """Запись накопленных вызовов без ожидания окна и ожидание начатых пачек"""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.wait(set(self._flushes))
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+        if not callable(method):
+            return method
+
+        if name in self.group_commit:
+            wrapper = functools.wraps(method)(functools.partial(self.grouped, name))
+            setattr(self, name, wrapper)
+            return wrapper
+
+        def timed(*args, **kwargs):
+            # Замеряется выполнение в потоке БД, без ожидания в очереди потока
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                DB_SECONDS.observe(name, time.perf_counter() - started)
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            return await self.run(timed, *args, **kwargs)
+
+        # Кэшируем обёртку, чтобы не создавать её на каждый вызов
+        setattr(self, name, wrapper)
+        return wrapper
+
+    def close(self):
+        """Остановка потока БД и закрытие соединения"""
+        self._executor.shutdown(wait=True)
+        self.db.close()
@@ -0,0 +1,126 @@
+"""Выгрузка заявок из leads в сжатый CSV для CRM.
+
+Строки читаются из базы страницами и сразу дописываются в gzip-файл на
+диске, поэтому память не зависит от размера таблицы. Используется командой
+/export в боте и из командной строки:
+
+    python export.py -o leads.csv.gz [--db leads.db] [--from 2024-01-01] [--to 2024-01-31]
+                     [--source direct] [--geography Аксай] [--completed 1]
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+from datetime import datetime, timedelta
+
+from database import Database
+
+LEAD_COLUMNS = (
+    "user_id", "name", "phone", "geography", "object_type", "condition", "metrage",
+    "repair_format", "keys_ready", "deadline", "main_fear", "budget", "source",
+    "appointment_time", "appointment_status", "survey_completed", "start_time", "created_at",
+)
+
+# Параметры команды /export: имя -> аргумент фильтра
+FILTER_NAMES = {
+    "from": "created_from",
+    "to": "created_to",
+    "source": "source",
+    "geography": "geography",
+    "completed": "survey_completed",
+}
+
+# Предел размера файла, который бот может отправить через Bot API
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024
+
+
+def make_filters(created_from=None, created_to=None, source=None, geography=None, survey_completed=None):
+    """Фильтры для Database.iter_leads из строк: даты ГГГГ-ММ-ДД (to - включительно), completed 0/1"""
+    filters = {"source": source, "geography": geography}
+    try:
+        if created_from:
+            filters["created_from"] = datetime.strptime(created_from, "%Y-%m-%d")
+        if created_to:
+            filters["created_to"] = datetime.strptime(created_to, "%Y-%m-%d") + timedelta(days=1)
+    except ValueError:
+        raise ValueError("Дата должна быть в формате ГГГГ-ММ-ДД")
+    if survey_completed is not None:
+        if str(survey_completed) not in ("0", "1"):
+            raise ValueError("completed может быть только 0 или 1")
+        filters["survey_completed"] = int(survey_completed)
+    return {key: value for key, value in filters.items() if value is not None}
+
+
+def parse_filters(args):
+    """Фильтры из аргументов команды вида from=2024-01-01 source=direct"""
+    filters = {}
+    for arg in args:
+        key, separator, value = arg.partition("=")
+        if not separator or key not in FILTER_NAMES:
+            raise ValueError(f"Неизвестный параметр: {arg}")
+        filters[FILTER_NAMES[key]] = value
+    return make_filters(**filters)
+
+
+def _open(path):
+    return gzip.open(path, "wt", encoding="utf-8", newline="")
+
+
+def export_leads(database, path, page_size=1000, **filters):
+    """Выгрузка через Database (синхронно, для командной строки). Возвращает число строк"""
+    count = 0
+    with _open(path) as file:
+        writer = csv.writer(file)
+        writer.writerow(LEAD_COLUMNS)
+        for page in database.iter_leads(LEAD_COLUMNS, page_size=page_size, **filters):
+            writer.writerows(page)
+            count += len(page)
+    return count
+
+
+async def export_leads_async(db, path, page_size=1000, **filters):
+    """Выгрузка через AsyncDatabase: чтение - в потоке БД, сжатие - в отдельном потоке"""
+    count = 0
+    with _open(path) as file:
+        writer = csv.writer(file)
+        writer.writerow(LEAD_COLUMNS)
+        chunk = []
+        async for row in db.stream("iter_leads", LEAD_COLUMNS, page_size=page_size, **filters):
+            chunk.append(row)
+            if len(chunk) >= page_size:
+                await asyncio.to_thread(writer.writerows, chunk)
+                count += len(chunk)
+                chunk = []
+        await asyncio.to_thread(writer.writerows, chunk)
+        count += len(chunk)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", required=True, help="файл .csv.gz")
+    parser.add_argument("--db", default="leads.db")
+    parser.add_argument("--from", dest="created_from", help="с даты создания, ГГГГ-ММ-ДД")
+    parser.add_argument("--to", dest="created_to", help="по дату создания включительно, ГГГГ-ММ-ДД")
+    parser.add_argument("--source")
+    parser.add_argument("--geography")
+    parser.add_argument("--completed", dest="survey_completed", choices=["0", "1"])
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    try:
+        filters = make_filters(args.created_from, args.created_to, args.source, args.geography,
+                               args.survey_completed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    database = Database(args.db)
+    try:
+        count = export_leads(database, args.output, page_size=args.page_size, **filters)
+    finally:
+        database.close()
+    print(f"Выгружено заявок: {count} -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+from collections import namedtuple
+
+# Категория FAQ: ключ, кнопка, заголовок, вопросы [(кнопка вопроса, ответ)]
+FaqCategory = namedtuple('FaqCategory', ['key', 'button', 'title', 'questions'])
+
+# Готовый ответ на кнопку: текст и клавиатура (ключ категории, None - список категорий)
+FaqEntry = namedtuple('FaqEntry', ['text', 'keyboard'])
+
+FAQ_MENU_TEXT = (
+    "❓ Часто задаваемые вопросы \n\n"
+    "Выберите категорию вопросов:"
+)
+
+FAQ_CATEGORIES = [
+    FaqCategory('budget', "💰 Бюджет и смета", "Вопросы по бюджету и смете", [
+        ("💸 Смета может вырасти в процессе?",
+         "Может измениться только если меняется объём работ или Ваши решения.\n\n"
+         "Мы делаем так: любые изменения согласуем заранее, до выполнения, чтобы не было сюрпризов “в конце”."),
+        ("💸 Почему нельзя назвать цену без замера?",
+         "Потому что “на глаз” в ремонте чаще всего = ошибка и потом переделки/доплаты.\n\n"
+         "Замер нужен, чтобы зафиксировать объём работ, пожелания и нюансы квартиры."),
+        ("💸 У вас есть цена за м²?",
+         "У нас расчёт индивидуальный, потому что на стоимость влияет состояние квартиры, инженерия и Ваши пожелания."),
+    ]),
+    FaqCategory('timing', "⏳ Сроки ремонта", "Вопросы по срокам ремонта", [
+        ("⏳ Сколько длится ремонт под ключ?",
+         "В среднем 3–4 месяца, но точный срок зависит от метража, состояния квартиры и сложности проекта."),
+        ("⏳ Как вы контролируете сроки?",
+         "Мы ведём ремонт по этапам и ежедневно фиксируем прогресс.\n\n"
+         "Плюс даём понятную последовательность работ, чтобы не было хаоса."),
+    ]),
+    FaqCategory('scope', "🧱 Объем работ", "Вопросы по объему работ", [
+        ("🧱 Что входит в ремонт под ключ?",
+         "Это полный цикл работ: черновые + чистовые работы, инженерка (электрика/сантехника), отделка."),
+        ("🧱 Вы делаете частичный ремонт?",
+         "Нет. Мы берём только полный ремонт квартиры под ключ.\n\n"
+         "Так мы отвечаем за результат и сроки, без зависимости от чужих работ."),
+    ]),
+    FaqCategory('design', "🎨 Дизайн-проект", "Вопросы по дизайн-проекту", [
+        ("🎨 Дизайн-проект входит?",
+         "Да, дизайн-проект входит (обсуждаем на старте).\n\n"
+         "Это снижает переделки и помогает заранее продумать свет, розетки, функциональность."),
+        ("🎨 Если у нас есть дизайн-проект?",
+         "Да, конечно. Мы посмотрим проект, уточним нюансы на замере и дальше работаем по нему."),
+    ]),
+    FaqCategory('materials', "🧰 Материалы", "Вопросы по материалам", [
+        ("🧰 Кто закупает материалы?",
+         "Обычно материалы закупаем мы — так проще по логистике и срокам.\n\n"
+         "Но если Вам спокойнее — Вы можете закупать сами или частично."),
+        ("🧰 Можно выбрать материалы с вами?",
+         "Да. Мы помогаем подобрать материалы под Ваш бюджет и задачи, чтобы не переплачивать и не ошибаться."),
+    ]),
+    FaqCategory('control', "📸 Контроль и отчетность", "Вопросы по контролю и отчетности", [
+        ("📸 Как увидеть что работы идут?",
+         "Вы будете видеть прогресс: фото/видео с объектов + отчётность по этапам.\n\n"
+         "Никакой “мы работали, но показать нечего”."),
+        ("📸 Можно посмотреть ваши объекты?",
+         "Да, по согласованию можем показать реальные объекты (в процессе или готовые)."),
+    ]),
+    FaqCategory('contract', "📄 Договор и гарантии", "Вопросы по договору и гарантиям", [
+        ("📄 Вы работаете по договору?",
+         "Да, работаем по договору на юрлицо.\n\n"
+         "Это фиксирует обязательства, условия и порядок работ."),
+        ("📄 Какая гарантия?",
+         "Гарантия прописывается в договоре.\n\n"
+         "На замере/созвоне менеджер пояснит сроки и что именно покрывает гарантия."),
+        ("👷 Кто делает ремонт?",
+         "Работает наша бригада под руководством прораба.\n\n"
+         "Ответственность не “размывается” между разными исполнителями."),
+    ]),
+    FaqCategory('start', "🚪 Начало ремонта", "Вопросы по началу ремонта", [
+        ("🚪 Замер платный?",
+         "Нет, замер бесплатный."),
+        ("🚪 Что подготовить к замеру?",
+         "• планировку/план БТИ (фото или файл)\n"
+         "• 2–3 примера “как нравится” (скриншоты)\n"
+         "• ориентир по сроку заезда и бюджету"),
+        ("🚪 Как быстро начать ремонт?",
+         "Зависит от загрузки и готовности проекта/ТЗ.\n\n"
+         "На созвоне/замере скажем ближайшие окна старта."),
+    ]),
+]
+
+FAQ_CATEGORIES_BY_KEY = {category.key: category for category in FAQ_CATEGORIES}
+
+# Отдельный вопрос в списке категорий
+FAQ_NOT_FIT_BUTTON = "🚫 Кому вы не подойдёте?"
+FAQ_NOT_FIT_TEXT = (
+    "🚫 **Кому мы не подойдём**\n\n"
+    "Мы не подойдём, если:\n\n"
+    "• метраж меньше 40 м²\n"
+    "• нужен частичный ремонт\n"
+    "• объект не в Ростове/Аксае/Батайске"
+)
+
+
+def _build_index():
+    """Индекс текст кнопки -> готовый ответ (строится один раз при импорте)"""
+    index = {
+        "❓У вас есть вопрос": FaqEntry(FAQ_MENU_TEXT, None),
+        "🔙 Назад в категории": FaqEntry(FAQ_MENU_TEXT, None),
+        FAQ_NOT_FIT_BUTTON: FaqEntry(FAQ_NOT_FIT_TEXT, None),
+    }
+    for category in FAQ_CATEGORIES:
+        emoji = category.button.split(' ', 1)[0]
+        index[category.button] = FaqEntry(
+            f"{emoji} **{category.title}**\n\nВыберите интересующий вопрос:",
+            category.key
+        )
+        for question, answer in category.questions:
+            emoji, title = question.split(' ', 1)
+            index[question] = FaqEntry(f"{emoji} **{title}**\n\n{answer}", category.key)
+    return index
+
+
+FAQ_INDEX = _build_index()
@@ -0,0 +1,121 @@
+import asyncio
+import functools
+import logging
+import time
+from datetime import datetime
+
+from telegram.ext import ConversationHandler
+
+from states import *
+
+logger = logging.getLogger(__name__)
+
+# Псевдосостояние воронки: заявка сохранена (переход CONTACT -> RESULT)
+LEAD = 100
+WAITING_QUESTION = 999
+
+# Шаги воронки в порядке прохождения анкеты
+FUNNEL_STEPS = [
+    (GEOGRAPHY, "🗺 География"),
+    (OBJECT_TYPE, "🏠 Тип объекта"),
+    (SECONDARY_OPTIONS, "🏚 Вторичка"),
+    (CONDITION, "🧱 Состояние"),
+    (METRAGE, "📐 Метраж"),
+    (REPAIR_FORMAT, "🛠 Формат ремонта"),
+    (KEYS_READY, "🔑 Ключи"),
+    (DEADLINE, "⏳ Сроки"),
+    (MAIN_FEAR, "😟 Главная тревога"),
+    (BUDGET, "💰 Бюджет"),
+    (RESULT, "📋 Предложение замера"),
+    (CONTACT, "📞 Контакт"),
+    (LEAD, "✅ Заявка"),
+    (WAITING_QUESTION, "❓ Вопрос менеджеру"),
+]
+
+
+class FunnelRecorder:
+    """Буфер переходов анкеты с записью в survey_events пачками.
+
+    record только добавляет событие в память - обработчик не ждёт базу.
+    Полная пачка пишется фоновой задачей, остаток - периодическим flush.
+    """
+
+    def __init__(self, db, batch_size=500):
+        self.db = db
+        self.batch_size = batch_size
+        self._pending = []
+        self._task = None
+
+    def record(self, user_id, state):
+        self._pending.append((user_id, state, time.time()))
+        if len(self._pending) >= self.batch_size and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            await self.db.add_survey_events(pending)
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи событий воронки: {e}")
+            # Вернём в начало буфера - запишутся со следующей пачкой
+            self._pending[:0] = pending
+
+
+def _tracked(callback, state, recorder, relabel):
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        new_state = await callback(update, context)
+        if new_state is not None and new_state != state and update.effective_user:
+            recorder.record(update.effective_user.id, relabel.get((state, new_state), new_state))
+        return new_state
+    return wrapper
+
+
+def track_transitions(conversation_handler, recorder, relabel=None):
+    """Запись в recorder каждой смены состояния conversation_handler.
+
+    relabel - шаг воронки для отдельных переходов: (из состояния, в состояние) -> шаг.
+    """
+    relabel = relabel or {}
+    for handler in conversation_handler.entry_points + conversation_handler.fallbacks:
+        handler.callback = _tracked(handler.callback, None, recorder, relabel)
+    for state, handlers in conversation_handler.states.items():
+        for handler in handlers:
+            handler.callback = _tracked(handler.callback, state, recorder, relabel)
+
+
+async def aggregate_funnel(db, batch_size=10000):
+    """Дообработка всех новых событий пачками. Возвращает число обработанных"""
+    total = 0
+    while True:
+        processed = await db.aggregate_funnel(ConversationHandler.END, batch_size)
+        total += processed
+        if processed < batch_size:
+            return total
+
+
+def format_funnel(steps, updated_at, pending):
+    """Текст отчёта по воронке из Database.get_funnel_stats"""
+    if not steps:
+        return "📊 **Воронка анкеты**\n\nДанных пока нет."
+
+    first = steps.get(GEOGRAPHY, (0,))[0] or max(step[0] for step in steps.values())
+    lines = ["📊 **Воронка анкеты**", "", "шаг: дошли (от начала, от прошлого шага) · сейчас на шаге · ⏱ в шаге"]
+    previous = None
+    for state, title in FUNNEL_STEPS:
+        if state not in steps:
+            continue
+        reached, entered, current, exits, seconds = steps[state]
+        conversion = f"{reached / first:.0%}" if first else "-"
+        if previous:
+            conversion += f", {reached / previous:.0%}"
+        average = f"{seconds / exits:.0f} с" if exits else "-"
+        lines.append(f"{title}: {reached} ({conversion}) · {current} · ⏱ {average}")
+        if state != WAITING_QUESTION:
+            previous = reached
+
+    updated = datetime.fromtimestamp(updated_at).strftime('%d.%m %H:%M:%S') if updated_at else "-"
+    lines += ["", f"🕒 Пересчитано: {updated}, ещё не учтено событий: {pending}"]
+    return "\n".join(lines)
@@ -1,229 +1,178 @@
-from telegram import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton, InlineKeyboardMarkup
+import json
+
+from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton, InlineKeyboardButton, InlineKeyboardMarkup
+
+from faq import FAQ_CATEGORIES, FAQ_NOT_FIT_BUTTON
+from states import *
+from survey import SURVEY_STEPS, keyboard_rows
+
+
+class _SerializedOnce:
+    """Примесь: to_dict/to_json считаются один раз при создании клавиатуры.
+
+    Объекты PTB заморожены после __init__, поэтому готовый payload не
+    устаревает. Возвращаемый словарь общий - изменять его нельзя.
+    """
+    __slots__ = ()
+
+    def _cache_payload(self):
+        with self._unfrozen():
+            self._payload = super().to_dict()
+            self._payload_json = json.dumps(self._payload)
+
+    def to_dict(self, recursive=True):
+        return self._payload
+
+    def to_json(self, *args, **kwargs):
+        return self._payload_json
+
+
+class CachedReplyKeyboardMarkup(_SerializedOnce, ReplyKeyboardMarkup):
+    """ReplyKeyboardMarkup с закэшированным reply_markup"""
+    __slots__ = ('_payload', '_payload_json')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_payload()
+
+
+class CachedInlineKeyboardMarkup(_SerializedOnce, InlineKeyboardMarkup):
+    """InlineKeyboardMarkup с закэшированным reply_markup"""
+    __slots__ = ('_payload', '_payload_json')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_payload()
+
+
+def _reply_keyboard(keyboard):
+    return CachedReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+
+# Все клавиатуры строятся один раз при импорте, get_*_keyboard отдают готовые объекты
+
+START_KEYBOARD = _reply_keyboard([
+    ["✅ Начать тест"]
+])
+
+REMOVE_KEYBOARD = ReplyKeyboardRemove()
+
+# Клавиатуры шагов анкеты из SURVEY_STEPS (шаг без кнопок - клавиатура убирается)
+SURVEY_KEYBOARDS = {
+    step.state: _reply_keyboard(keyboard_rows(step)) if step.rows else REMOVE_KEYBOARD
+    for step in SURVEY_STEPS
+}
+
+GEOGRAPHY_KEYBOARD = SURVEY_KEYBOARDS[GEOGRAPHY]
+OBJECT_TYPE_KEYBOARD = SURVEY_KEYBOARDS[OBJECT_TYPE]
+SECONDARY_OPTIONS_KEYBOARD = SURVEY_KEYBOARDS[SECONDARY_OPTIONS]
+CONDITION_KEYBOARD = SURVEY_KEYBOARDS[CONDITION]
+REPAIR_FORMAT_KEYBOARD = SURVEY_KEYBOARDS[REPAIR_FORMAT]
+KEYS_READY_KEYBOARD = SURVEY_KEYBOARDS[KEYS_READY]
+DEADLINE_KEYBOARD = SURVEY_KEYBOARDS[DEADLINE]
+MAIN_FEAR_KEYBOARD = SURVEY_KEYBOARDS[MAIN_FEAR]
+BUDGET_KEYBOARD = SURVEY_KEYBOARDS[BUDGET]
+
+FINAL_CHOICE_KEYBOARD = _reply_keyboard([
+    ["✅ Записаться на бесплатный замер"],
+    ["❓У вас есть вопрос"],
+    ["👀 Посмотреть примеры работ"],
+    ["🔄 Начать заново"]
+])
+
+CONTACT_KEYBOARD = _reply_keyboard([
+    [KeyboardButton("📱 Отправить номер телефона", request_contact=True)],
+    ["🔄 Начать заново"]
+])
+
+FINAL_KEYBOARD = _reply_keyboard([
+    ["❓У вас есть вопрос"],
+    ["🔄 Начать заново"]
+])
+
+FAQ_CATEGORIES_KEYBOARD = _reply_keyboard(
+    [[category.button] for category in FAQ_CATEGORIES] + [
+        [FAQ_NOT_FIT_BUTTON],
+        ["❓ Задать свой вопрос"],
+        ["🔙 Назад в меню"]
+    ]
+)
+
+# Ключ категории -> клавиатура её вопросов, None - список категорий
+FAQ_KEYBOARDS = {
+    category.key: _reply_keyboard(
+        [[question] for question, _ in category.questions] + [["🔙 Назад в категории"]]
+    )
+    for category in FAQ_CATEGORIES
+}
+FAQ_KEYBOARDS[None] = FAQ_CATEGORIES_KEYBOARD
+
+EXAMPLES_INLINE_KEYBOARD = CachedInlineKeyboardMarkup([
+    [InlineKeyboardButton("📱 Перейти в Telegram-канал", url="https://t.me/remontkvartirRND61")],
+    [InlineKeyboardButton("🔙 Вернуться в меню", callback_data="back_to_menu")]
+])
+
 
 def get_start_keyboard():
     """Клавиатура для стартового сообщения"""
-    keyboard = [
-        ["✅ Начать тест"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return START_KEYBOARD
 
 def get_geography_keyboard():
     """Клавиатура для выбора города"""
-    keyboard = [
-        ["🏙 Ростов‑на‑Дону", "🏙 Аксай"],
-        ["🏙 Батайск", "Другой город"],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return GEOGRAPHY_KEYBOARD
 
 def get_object_type_keyboard():
     """Клавиатура для типа объекта"""
-    keyboard = [
-        ["🌃 Новостройка", "🏚 Вторичка"],
-        ["🏠 Дом/коттедж"],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return OBJECT_TYPE_KEYBOARD
 
 def get_secondary_options_keyboard():
     """Клавиатура для дополнительных опций при выборе вторички"""
-    keyboard = [
-        ["🔨 Требуется демонтаж"],
-        ["📐 Планируется перепланировка"],
-        ["✅ Демонтаж проведен"],
-        ["🔄 И демонтаж, и перепланировка"],
-        ["🔙 Назад к типам объектов"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return SECONDARY_OPTIONS_KEYBOARD
 
 def get_condition_keyboard():
     """Клавиатура для состояния квартиры"""
-    keyboard = [
-        ["🧱 Бетон", "🧱 Предчистовая"],
-        ["🏗 С отделкой от застройщика", "😕 Другое/не знаю"],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return CONDITION_KEYBOARD
 
 def get_repair_format_keyboard():
     """Клавиатура для формата ремонта"""
-    keyboard = [
-        ["💪 Ремонт под ключ (вся квартира)"],
-        ["❗️ Частичный (комната/санузел/кухня)"],
-        ["🫣 Переделка после \"мастеров\""],
-        ["✔️ Пока выбираю/сравниваю"],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return REPAIR_FORMAT_KEYBOARD
 
 def get_keys_ready_keyboard():
     """Клавиатура для наличия ключей"""
-    keyboard = [
-        ["✔️ Да, ключи есть"],
-        ["🌟 Будут в ближайший месяц"],
-        ["😉 Будут через 2–3 месяца+"],
-        ["💸 Пока просто прицениваюсь"],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return KEYS_READY_KEYBOARD
 
 def get_deadline_keyboard():
     """Клавиатура для дедлайна"""
-    keyboard = [
-        ["В ближайшие 2–3 месяца"],
-        ["3–4 месяца"],
-        ["5–6 месяцев"],
-        ["Пока не знаю"],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return DEADLINE_KEYBOARD
 
 def get_main_fear_keyboard():
     """Клавиатура для главной тревоги"""
-    keyboard = [
-        ["💸 Боюсь, что смета вырастет"],
-        ["⏳ Боюсь, что сроки затянутся"],
-        ["🧱 Боюсь, что сделают плохо/скрытые косяки"],
-        ["😱 Всё сразу"],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return MAIN_FEAR_KEYBOARD
 
 def get_budget_keyboard():
     """Клавиатура для бюджета"""
-    keyboard = [
-        ["до 400 тыс"],
-        ["400–600 тыс"],
-        ["600–900 тыс"],
-        ["900 тыс +"],
-        ["Не знаю / как раз хочу разобраться"],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return BUDGET_KEYBOARD
 
 def get_final_choice_keyboard():
     """Клавиатура для финального выбора"""
-    keyboard = [
-        ["✅ Записаться на бесплатный замер"],
-        ["❓У вас есть вопрос"],
-        ["👀 Посмотреть примеры работ"],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return FINAL_CHOICE_KEYBOARD
 
 def get_contact_keyboard():
     """Клавиатура для отправки контакта"""
-    contact_button = KeyboardButton("📱 Отправить номер телефона", request_contact=True)
-    keyboard = [
-        [contact_button],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return CONTACT_KEYBOARD
 
 def get_final_keyboard():
     """Финальная клавиатура после отправки заявки"""
-    keyboard = [
-        ["❓У вас есть вопрос"],
-        ["🔄 Начать заново"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return FINAL_KEYBOARD
 
 def get_faq_categories_keyboard():
     """Клавиатура с категориями FAQ"""
-    keyboard = [
-        ["💰 Бюджет и смета"],
-        ["⏳ Сроки ремонта"],
-        ["🧱 Объем работ"],
-        ["🎨 Дизайн-проект"],
-        ["🧰 Материалы"],
-        ["📸 Контроль и отчетность"],
-        ["📄 Договор и гарантии"],
-        ["🚪 Начало ремонта"],
-        ["🚫 Кому вы не подойдёте?"],
-        ["❓ Задать свой вопрос"],
-        ["🔙 Назад в меню"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-def get_budget_faq_keyboard():
-    """Клавиатура для вопросов по бюджету"""
-    keyboard = [
-        ["💸 Смета может вырасти в процессе?"],
-        ["💸 Почему нельзя назвать цену без замера?"],
-        ["💸 У вас есть цена за м²?"],
-        ["🔙 Назад в категории"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-def get_timing_faq_keyboard():
-    """Клавиатура для вопросов по срокам"""
-    keyboard = [
-        ["⏳ Сколько длится ремонт под ключ?"],
-        ["⏳ Как вы контролируете сроки?"],
-        ["🔙 Назад в категории"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-def get_scope_faq_keyboard():
-    """Клавиатура для вопросов по объему работ"""
-    keyboard = [
-        ["🧱 Что входит в ремонт под ключ?"],
-        ["🧱 Вы делаете частичный ремонт?"],
-        ["🔙 Назад в категории"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-def get_design_faq_keyboard():
-    """Клавиатура для вопросов по дизайну"""
-    keyboard = [
-        ["🎨 Дизайн-проект входит?"],
-        ["🎨 Если у нас есть дизайн-проект?"],
-        ["🔙 Назад в категории"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-def get_materials_faq_keyboard():
-    """Клавиатура для вопросов по материалам"""
-    keyboard = [
-        ["🧰 Кто закупает материалы?"],
-        ["🧰 Можно выбрать материалы с вами?"],
-        ["🔙 Назад в категории"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-def get_control_faq_keyboard():
-    """Клавиатура для вопросов по контролю"""
-    keyboard = [
-        ["📸 Как увидеть что работы идут?"],
-        ["📸 Можно посмотреть ваши объекты?"],
-        ["🔙 Назад в категории"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-def get_contract_faq_keyboard():
-    """Клавиатура для вопросов по договору"""
-    keyboard = [
-        ["📄 Вы работаете по договору?"],
-        ["📄 Какая гарантия?"],
-        ["👷 Кто делает ремонт?"],
-        ["🔙 Назад в категории"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-def get_start_faq_keyboard():
-    """Клавиатура для вопросов по началу ремонта"""
-    keyboard = [
-        ["🚪 Замер платный?"],
-        ["🚪 Что подготовить к замеру?"],
-        ["🚪 Как быстро начать ремонт?"],
-        ["🔙 Назад в категории"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return FAQ_CATEGORIES_KEYBOARD
+
+def get_faq_keyboard(category_key):
+    """Клавиатура вопросов категории FAQ (None - список категорий)"""
+    return FAQ_KEYBOARDS[category_key]
 
 def get_examples_inline_keyboard():
     """Inline клавиатура с кнопкой-ссылкой на канал"""
-    keyboard = [
-        [InlineKeyboardButton("📱 Перейти в Telegram-канал", url="https://t.me/remontkvartirRND61")],
-        [InlineKeyboardButton("🔙 Вернуться в меню", callback_data="back_to_menu")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
\ No newline at end of file
+    return EXAMPLES_INLINE_KEYBOARD
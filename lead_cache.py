@@ -0,0 +1,116 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from metrics import LEAD_CACHE_LOOKUPS
+
+# Значение поля, которое кэшу ещё не известно (None - законное значение start_time)
+UNKNOWN = object()
+
+
+class LeadCache:
+    """Кэш состояния заявки по user_id: время старта и признак заполненной анкеты.
+
+    Стоит перед AsyncDatabase: запись идёт сквозь кэш (сначала в базу, затем
+    в кэш), поэтому точечные проверки во время анкеты не обращаются к SQLite.
+    Хранится не больше max_size пользователей (вытесняются давно не
+    использованные), запись живёт ttl секунд. Пользователя обслуживает один
+    процесс (см. sharding), так что чужих записей кэш не пропускает; ttl
+    ограничивает устаревание, если строку поменяли в обход бота.
+    """
+
+    def __init__(self, db, max_size=10000, ttl=3600):
+        self.db = db
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()   # user_id -> [срок, start_time, survey_completed]
+        # Пользователи, чьё состояние сейчас читается из базы: user_id -> [читателей, номер записи].
+        # Запись этого пользователя меняет номер, и прочитанное до неё значение не кэшируется
+        self._reading = {}
+
+    def _get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return entry
+
+    def _put(self, user_id, start_time=UNKNOWN, survey_completed=UNKNOWN):
+        entry = self._get(user_id) or [0, UNKNOWN, UNKNOWN]
+        entry[0] = time.monotonic() + self.ttl
+        if start_time is not UNKNOWN:
+            entry[1] = start_time
+        if survey_completed is not UNKNOWN:
+            entry[2] = survey_completed
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _lookup(self, user_id, field):
+        entry = self._get(user_id)
+        if entry is not None and entry[field] is not UNKNOWN:
+            LEAD_CACHE_LOOKUPS.inc('hit')
+            return entry[field]
+
+        LEAD_CACHE_LOOKUPS.inc('miss')
+        reading = self._reading.setdefault(user_id, [0, 0])
+        reading[0] += 1
+        version = reading[1]
+        try:
+            state = await self.db.get_lead_state(user_id) or (None, False)
+        finally:
+            reading[0] -= 1
+            if not reading[0]:
+                del self._reading[user_id]
+        if version == reading[1]:
+            self._put(user_id, *state)
+        return state[field - 1]
+
+    def _written(self, user_id):
+        # До и после записи: чтение, пересёкшееся с ней, не попадёт в кэш
+        reading = self._reading.get(user_id)
+        if reading is not None:
+            reading[1] += 1
+
+    async def get_user_start_time(self, user_id):
+        """Время старта (как его вернула бы база)"""
+        return await self._lookup(user_id, 1)
+
+    async def is_survey_completed(self, user_id):
+        """Заполнена ли анкета"""
+        return await self._lookup(user_id, 2)
+
+    async def update_start_time(self, user_id):
+        """Обновление времени старта в базе и в кэше"""
+        self._written(user_id)
+        now = await self.db.update_start_time(user_id)
+        self._written(user_id)
+        # В том же виде, в каком sqlite3 хранит datetime и возвращает его при чтении
+        self._put(user_id, start_time=now.isoformat(" "))
+        return now
+
+    async def save_lead(self, data):
+        """Сохранение лида в базе и в кэше"""
+        self._written(data['user_id'])
+        await self.db.save_lead(data)
+        self._written(data['user_id'])
+        start_time = data.get('start_time', UNKNOWN)
+        if isinstance(start_time, datetime):
+            start_time = start_time.isoformat(" ")
+        self._put(
+            data['user_id'],
+            start_time=start_time,
+            survey_completed=data['survey_completed'] == 1 if 'survey_completed' in data else UNKNOWN
+        )
+
+    def stats(self):
+        """Попадания, промахи и число пользователей в кэше"""
+        return {
+            'hits': LEAD_CACHE_LOOKUPS.get('hit'),
+            'misses': LEAD_CACHE_LOOKUPS.get('miss'),
+            'size': len(self._entries),
+        }
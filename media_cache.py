@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import logging
+
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    """Кэш file_id для медиафайлов бота.
+
+    Каждый файл загружается в Telegram один раз, полученный file_id хранится
+    в таблице broadcast_media вместе с хэшем файла и используется повторно.
+    Если файл на диске изменился (другой хэш) или Telegram не принял file_id,
+    файл загружается заново.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._file_ids = {}   # ключ -> (хэш, file_id)
+        self._hashes = {}     # путь -> (mtime, размер, хэш)
+        self._locks = {}
+
+    def _file_hash(self, path):
+        """Хэш файла (пересчитывается только при изменении mtime/размера)"""
+        stat = path.stat()
+        cached = self._hashes.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        self._hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    async def _get_file_id(self, key, file_hash):
+        cached = self._file_ids.get(key)
+        if cached and cached[0] == file_hash:
+            return cached[1]
+
+        row = await self.db.get_broadcast_media(key)
+        if row and row[0] and row[2] == file_hash:
+            self._file_ids[key] = (file_hash, row[0])
+            return row[0]
+        return None
+
+    async def send_photo(self, bot, key, path, **kwargs):
+        """Отправка фото по file_id (с загрузкой при первом использовании)"""
+        return await self._send(key, path, bot.send_photo, 'photo', **kwargs)
+
+    async def send_document(self, bot, key, path, **kwargs):
+        """Отправка документа по file_id (с загрузкой при первом использовании)"""
+        return await self._send(key, path, bot.send_document, 'document', **kwargs)
+
+    async def _send(self, key, path, method, field, **kwargs):
+        file_hash = await asyncio.to_thread(self._file_hash, path)
+
+        file_id = await self._get_file_id(key, file_hash)
+        if file_id:
+            try:
+                return await method(**{field: file_id}, **kwargs)
+            except BadRequest as e:
+                if 'file' not in str(e).lower():
+                    raise
+                logger.warning(f"⚠️ file_id для '{key}' не принят Telegram, загружаем заново: {e}")
+                self._file_ids.pop(key, None)
+
+        # Загружает файл только один отправитель, остальные ждут его file_id
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = self._file_ids.get(key)
+            if not (cached and cached[0] == file_hash):
+                with open(path, 'rb') as file:
+                    message = await method(**{field: file}, **kwargs)
+
+                if field == 'photo':
+                    file_id = message.photo[-1].file_id
+                else:
+                    file_id = message.document.file_id
+
+                self._file_ids[key] = (file_hash, file_id)
+                # Подпись не сохраняем: она своя у каждого получателя (приветствие по имени)
+                await self.db.save_broadcast_media(key, file_id, None, file_hash)
+                logger.info(f"📦 '{key}' загружен в Telegram, file_id сохранён")
+                return message
+
+        # Файл загрузил другой отправитель, пока мы ждали: шлём уже без блокировки
+        return await method(**{field: cached[1]}, **kwargs)
@@ -0,0 +1,183 @@
+from string import Formatter
+
+DEFAULT_LOCALE = 'ru'
+
+# Экранирование подставляемых значений для Markdown (как telegram.helpers.escape_markdown, версия 1)
+_MARKDOWN_SPECIAL = '_*`['
+_MARKDOWN_ESCAPES = str.maketrans({char: '\\' + char for char in _MARKDOWN_SPECIAL})
+
+
+def escape_markdown(value):
+    # Обычно спецсимволов нет (имя - одни буквы): проверка дешевле translate по всей строке
+    if value.isalnum():
+        return value
+    for char in _MARKDOWN_SPECIAL:
+        if char in value:
+            return value.translate(_MARKDOWN_ESCAPES)
+    return value
+
+
+class Markdown(str):
+    """Текст каталога с разметкой Markdown (подставляемые значения экранируются)"""
+    __slots__ = ()
+
+
+def _compile(source, markdown):
+    """Функция render шаблона: литералы и поля склеиваются одним выражением, как в f-строке"""
+    fields, pieces = [], []
+    for literal, field, _, _ in Formatter().parse(source):
+        if literal:
+            pieces.append(repr(literal))
+        if field is not None:
+            if not field.isidentifier():
+                raise ValueError(f"Поле шаблона должно быть именем: {{{field}}}")
+            if field not in fields:
+                fields.append(field)
+            if markdown:
+                # Обычно экранировать нечего (имя - одни буквы): проверка прямо в выражении,
+                # без вызова escape_markdown
+                value = f"_v{len(pieces)}"
+                pieces.append(f"({value} if ({value} := f'{{{field}}}').isalnum() else _escape({value}))")
+            else:
+                pieces.append(f"f'{{{field}}}'")
+    params = f"*, {', '.join(fields)}" if fields else ""
+    namespace = {'_escape': escape_markdown}
+    exec(f"def render({params}):\n    return {' + '.join(pieces) or repr('')}\n", namespace)
+    return namespace['render']
+
+
+class Template:
+    """Сообщение каталога, скомпилированное один раз при загрузке.
+
+    render - функция с полями шаблона в именованных аргументах, собранная из
+    литералов и подстановок, так что при отправке ничего не разбирается.
+    """
+    __slots__ = ('key', 'parse_mode', 'render')
+
+    def __init__(self, key, source):
+        self.key = key
+        self.parse_mode = 'Markdown' if isinstance(source, Markdown) else None
+        self.render = _compile(source, self.parse_mode is not None)
+
+
+class MessageCatalog:
+    """Каталог сообщений по локалям; недостающие в локали ключи берутся из default_locale"""
+
+    def __init__(self, sources, default_locale=DEFAULT_LOCALE):
+        self.default_locale = default_locale
+        default = {key: Template(key, source) for key, source in sources[default_locale].items()}
+        self._locales = {
+            locale: {**default, **{key: Template(key, source) for key, source in texts.items()}}
+            for locale, texts in sources.items()
+        }
+        self._default = self._locales[default_locale]
+
+    def get(self, key, locale=None):
+        return self._locales.get(locale, self._default)[key]
+
+    def render(self, key, locale=None, **values):
+        return self.get(key, locale).render(**values)
+
+
+RU = {
+    'greeting': Markdown(
+        "👋 Здравствуйте, {first_name}!\n\n"
+        "Вас приветствует команда **Дом Ремонта**\n\n"
+        "Поможем за 2 минуты:\n"
+        "1️⃣ рассчитать стоимость работ\n"
+        "2️⃣ понять, *уложитесь* ли вы в бюджет\n\n"
+        "Начнём❓"
+    ),
+    'direct_appointment': Markdown(
+        "📱 **Отлично! Давайте сразу запишем вас на замер**\n\n"
+        "Нажмите кнопку ниже, чтобы поделиться контактом:"
+    ),
+
+    # Ответ на главную тревогу после бюджета (ключи - в FEAR_REPLIES бота)
+    'fear_estimate': Markdown(
+        "Понял. Ваш главный риск — *сюрпризы по ходу*.\n\n"
+        "Обычно смета улетает не из‑за *плохих людей*, а из‑за двух вещей:\n"
+        "— начали без чёткого состава работ\n"
+        "— изменения по ходу (а давайте по‑другому…) не фиксировали заранее\n\n"
+        "Если хотите, мы сделаем так, чтобы у Вас было понятно по шагам: что делаем, "
+        "что может поменять сумму и как это согласуется заранее.\n\n"
+        "Готовы записаться на бесплатный замер?"
+    ),
+    'fear_timing': Markdown(
+        "Понял. Ваш главный риск — *ремонт растянется*.\n\n"
+        "Чаще всего сроки *плывут*, когда нет нормальной этапности и контроля: "
+        "сегодня одно, завтра другое, послезавтра *мы не успели*.\n\n"
+        "На замере мы фиксируем объём, и даём реальный план по этапам, "
+        "чтобы Вы понимали, когда сможете заехать.\n\n"
+        "Записать Вас на бесплатный замер?"
+    ),
+    'fear_quality': Markdown(
+        "Понимаю Вас. Самое обидное в ремонте — когда *с виду красиво*, "
+        "а потом вылезает то, что было скрыто.\n\n"
+        "Поэтому мы делаем акцент на этапах, которые обычно не видно, "
+        "но они решают всё: сантехника, электрика, подготовка, узлы.\n\n"
+        "На замере расскажем, где у Вашего объекта *зона риска*, "
+        "и что нужно проконтролировать, чтобы не платить дважды.\n\n"
+        "Записать Вас на бесплатный замер?"
+    ),
+    'fear_all': Markdown(
+        "Честно — это нормальное состояние после *ключей*.\n"
+        "Голова шумит, все советуют разное, и Вы просто не хотите встрять.\n\n"
+        "Хорошая новость: это решается системой — понятный объём, "
+        "план этапов и прозрачные согласования.\n\n"
+        "Давайте сделаем первый спокойный шаг: бесплатный замер."
+    ),
+    'fear_other': Markdown(
+        "Спасибо за ответы! Теперь давайте определимся со следующим шагом.\n\n"
+        "Готовы записаться на бесплатный замер?"
+    ),
+
+    'ask_contact': Markdown(
+        "📱 **Отлично! Оставьте ваш номер телефона**\n\n"
+        "Нажмите кнопку ниже, чтобы поделиться контактом:"
+    ),
+    'contact_required': "❌ Пожалуйста, нажмите кнопку **'Отправить номер телефона'**",
+    'lead_accepted': Markdown(
+        "✅ **Принято!**\n\n"
+        "Мы получили заявку на бесплатный замер:\n\n"
+        "📞 Менеджер свяжется с Вами и подтвердит точное время.\n\n"
+        "Спасибо за обращение!\n\n"
+        "📌 Если у вас есть вопросы - загляните в **FAQ**"
+    ),
+    'examples': (
+        "👀 Примеры наших работ: \n\n"
+        "Наш Telegram-канал: https://t.me/remontkvartirRND61\n\n"
+        "Там вы найдете:\n"
+        "• Фото готовых объектов\n"
+        "• Видео процессов\n"
+        "• Отзывы клиентов\n"
+        "• Идеи для ремонта"
+    ),
+    'ask_question': (
+        "❓ **Задайте свой вопрос** \n\n"
+        "Напишите ваш вопрос в ответном сообщении, и мы обязательно ответим вам 👇"
+    ),
+    'question_received': Markdown(
+        "✅ **Ваш вопрос получен и передан менеджеру!**\n\n"
+        "Ответ придет в ближайшее время."
+    ),
+
+    # Меню после анкеты: заявка уже оставлена / ещё нет
+    'menu_completed': "Чем еще могу помочь?",
+    'menu_offer': "Готовы записаться на замер?",
+
+    'cancelled': "❌ Диалог отменен. Если захотите начать заново - напишите /start",
+    'help': (
+        "🤖 **Команды бота:**\n\n"
+        "/start - начать опрос\n"
+        "/cancel - отменить текущий диалог\n"
+        "/help - показать эту справку"
+    ),
+}
+
+# Локализованные варианты: локаль (language_code Telegram) -> тексты, отличные от DEFAULT_LOCALE
+MESSAGE_SOURCES = {
+    DEFAULT_LOCALE: RU,
+}
+
+MESSAGES = MessageCatalog(MESSAGE_SOURCES)
@@ -0,0 +1,196 @@
+import bisect
+import functools
+import logging
+import time
+
+from aiohttp import web
+from telegram.ext import ConversationHandler
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы корзин гистограмм, секунды
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    """Набор метрик, отдаваемых в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _labels(name, value, extra=""):
+    labels = f'{name}="{value}"' if name else ""
+    if extra:
+        labels = f"{labels},{extra}" if labels else extra
+    return f"{{{labels}}}" if labels else ""
+
+
+class Counter:
+    """Счётчик с одной (необязательной) меткой"""
+
+    def __init__(self, name, description, label=None, registry=REGISTRY):
+        self.name = name
+        self.description = description
+        self.label = label
+        self._values = {}
+        registry.register(self)
+
+    def inc(self, value=None, amount=1):
+        self._values[value] = self._values.get(value, 0) + amount
+
+    def get(self, value=None):
+        return self._values.get(value, 0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} counter"
+        for value, count in list(self._values.items()):
+            yield f"{self.name}{_labels(self.label, value)} {count}"
+
+
+class Histogram:
+    """Гистограмма длительностей с одной меткой.
+
+    observe только увеличивает счётчик корзины и сумму, накопленные значения
+    по корзинам считаются при выдаче метрик. Вызывается и из потока БД: под
+    GIL отдельные операции со списком атомарны, а редкая потеря отсчёта при
+    одновременной записи из двух потоков для метрик несущественна.
+    """
+
+    def __init__(self, name, description, label, buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}   # значение метки -> [счётчики корзин..., +Inf, сумма]
+        registry.register(self)
+
+    def observe(self, value, seconds):
+        series = self._series.get(value)
+        if series is None:
+            series = self._series[value] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def count(self, value):
+        series = self._series.get(value)
+        return sum(series[:-1]) if series else 0
+
+    def render(self):
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} histogram"
+        for value, series in list(self._series.items()):
+            series = list(series)
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                total += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.label, value, le)} {total}"
+            yield f"{self.name}_sum{_labels(self.label, value)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.label, value)} {total}"
+
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Время обработчиков обновлений", "handler")
+DB_SECONDS = Histogram("bot_db_seconds", "Время методов Database в потоке БД", "method")
+BOT_API_SECONDS = Histogram("bot_api_request_seconds", "Время запросов к Bot API", "method")
+LEADS_SAVED = Counter("bot_leads_saved_total", "Сохранено заявок")
+BROADCAST_MESSAGES = Counter("bot_broadcast_messages_total", "Итоги отправок рассылок", "status")
+ERRORS = Counter("bot_errors_total", "Ошибки", "source")
+LEAD_CACHE_LOOKUPS = Counter("bot_lead_cache_lookups_total", "Обращения к кэшу заявок", "result")
+
+
+def timed(histogram, value):
+    """Декоратор корутины: длительность каждого вызова попадает в histogram"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(value, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def _handlers(handlers):
+    for handler in handlers:
+        if isinstance(handler, ConversationHandler):
+            yield from _handlers(handler.entry_points)
+            for state_handlers in handler.states.values():
+                yield from _handlers(state_handlers)
+            yield from _handlers(handler.fallbacks)
+        else:
+            yield handler
+
+
+def instrument_handlers(application):
+    """Замер времени всех обработчиков приложения, включая состояния ConversationHandler"""
+    for group in application.handlers.values():
+        for handler in _handlers(group):
+            name = getattr(handler.callback, '__name__', type(handler).__name__)
+            handler.callback = timed(HANDLER_SECONDS, name)(handler.callback)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest с замером времени каждого запроса к Bot API по методу"""
+
+    async def do_request(self, url, *args, **kwargs):
+        method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, *args, **kwargs)
+        except Exception:
+            ERRORS.inc('bot_api')
+            raise
+        finally:
+            BOT_API_SECONDS.observe(method, time.perf_counter() - started)
+        if code >= 400:
+            ERRORS.inc('bot_api')
+        return code, payload
+
+
+class MetricsServer:
+    """Локальный HTTP-сервер с GET /metrics в текстовом формате Prometheus"""
+
+    def __init__(self, host="127.0.0.1", port=9100, registry=REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._runner = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self._metrics)
+
+    async def _metrics(self, request):
+        return web.Response(body=self.registry.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"📊 Метрики: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+
+class ManagerOutbox:
+    """Очередь уведомлений менеджерам в таблице manager_outbox.
+
+    enqueue только записывает уведомление в базу (по строке на менеджера) и
+    будит фоновый обработчик, поэтому пользователь не ждёт ответов Telegram,
+    а после перезапуска неотправленное уходит заново. Обработчик рассылает
+    менеджерам параллельно, при ошибках повторяет с нарастающей паузой, а
+    одному менеджеру шлёт не чаще раза в digest_interval секунд: всё, что
+    накопилось за это время (всплеск заявок во время рассылки), уходит одной
+    сводкой.
+    """
+
+    def __init__(self, db, digest_interval=30, max_backoff=300, poll_interval=60):
+        self.db = db
+        self.digest_interval = digest_interval
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self._last_sent = {}   # chat_id -> time.monotonic() последней отправки
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+
+    async def enqueue(self, kind, text, chat_ids):
+        """Постановка уведомления в очередь для всех chat_ids"""
+        if not chat_ids:
+            return
+        await self.db.enqueue_notifications(kind, text, chat_ids)
+        self._wakeup.set()
+
+    def start(self, bot):
+        """Запуск фонового обработчика очереди"""
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(bot))
+
+    async def stop(self):
+        """Остановка обработчика: текущая отправка дожидается завершения"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def _run(self, bot):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                delay = await self._process(bot)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки очереди уведомлений: {e}")
+                delay = self.poll_interval
+            if self._stopping:
+                break
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, bot):
+        """Один проход по очереди. Возвращает, сколько ждать до следующего"""
+        now = datetime.now()
+        by_chat = defaultdict(list)
+        for row in await self.db.get_due_notifications(now):
+            by_chat[row[1]].append(row)
+
+        delay = self.poll_interval
+        ready = []
+        for chat_id, rows in by_chat.items():
+            wait = self.digest_interval - (time.monotonic() - self._last_sent.get(chat_id, float('-inf')))
+            if wait > 0:
+                # Менеджеру недавно писали - копим до сводки
+                delay = min(delay, wait)
+            else:
+                ready.append(self._deliver(bot, chat_id, rows))
+        for result in await asyncio.gather(*ready, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Ошибка отправки уведомлений: {result}")
+
+        next_time = await self.db.get_next_notification_time(now)
+        if next_time:
+            delay = min(delay, max((next_time - datetime.now()).total_seconds(), 0))
+        return delay
+
+    @staticmethod
+    def _compose(rows):
+        """Сообщения для отправки: [(строки, текст)]; несколько уведомлений - сводкой"""
+        if len(rows) == 1:
+            return [(rows, rows[0][3])]
+
+        chunks = []
+        current = []
+        length = 0
+        for row in rows:
+            added = len(row[3]) + len(DIGEST_SEPARATOR)
+            if current and length + added > MAX_MESSAGE_LENGTH - 100:
+                chunks.append(current)
+                current, length = [], 0
+            current.append(row)
+            length += added
+        chunks.append(current)
+
+        messages = []
+        for chunk in chunks:
+            header = f"📦 **Сводка: {len(chunk)} уведомл.**"
+            messages.append((chunk, DIGEST_SEPARATOR.join([header] + [row[3] for row in chunk])))
+        return messages
+
+    async def _send(self, bot, chat_id, text):
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown')
+        except BadRequest as e:
+            if "parse" not in str(e).lower():
+                raise
+            # Markdown сломан данными пользователя (например, "_" в имени) - шлём как есть
+            await bot.send_message(chat_id=chat_id, text=text)
+
+    async def _deliver(self, bot, chat_id, rows):
+        """Отправка накопленных уведомлений одному менеджеру"""
+        self._last_sent[chat_id] = time.monotonic()
+        messages = self._compose(rows)
+        for number, (chunk, text) in enumerate(messages):
+            ids = [row[0] for row in chunk]
+            try:
+                await self._send(bot, chat_id, text)
+            except BadRequest as e:
+                # Повтор не поможет - не держим очередь
+                logger.error(f"❌ Уведомление менеджеру {chat_id} отброшено: {e}")
+                await self.db.delete_notifications(ids)
+                continue
+            except TelegramError as e:
+                if isinstance(e, RetryAfter):
+                    backoff = e.retry_after
+                else:
+                    attempts = max(row[4] for row in chunk)
+                    backoff = min(2 ** attempts, self.max_backoff)
+                logger.warning(f"⚠️ Не удалось отправить менеджеру {chat_id}: {e}, повтор через {backoff} с")
+                # Оставшиеся сообщения тоже откладываем: менеджер сейчас недоступен
+                rest = [row[0] for chunk, _ in messages[number:] for row in chunk]
+                await self.db.postpone_notifications(rest, datetime.now() + timedelta(seconds=backoff))
+                return
+
+            await self.db.delete_notifications(ids)
+            logger.info(f"✅ Менеджеру {chat_id} отправлено уведомлений: {len(chunk)}")
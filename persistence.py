@@ -0,0 +1,134 @@
+import asyncio
+import json
+import logging
+import pickle
+
+from telegram.ext import BasePersistence
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """Хранение user_data и состояний ConversationHandler в leads.db.
+
+    Application раз в update_interval передаёт сюда изменившиеся данные.
+    update_* ничего не пишут сами: изменения копятся в памяти (по ключу
+    остаётся последнее значение) и записываются одной транзакцией в потоке
+    БД, так что весь проход update_persistence - одна запись на диск.
+    """
+
+    def __init__(self, db, store_data=None, update_interval=60, owns=None):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.db = db
+        # Режим шардов: owns(user_id) - обслуживает ли пользователя этот процесс
+        self.owns = owns
+        self._pending_data = {}            # (kind, id) -> данные, None - удалить
+        self._pending_conversations = {}   # (name, key) -> состояние, None - удалить
+        self._write_task = None
+
+    # ================== ЗАГРУЗКА ==================
+
+    async def _load(self, kind):
+        rows = await self.db.get_persistent_data(kind)
+        return {id_: pickle.loads(data) for id_, data in rows}
+
+    async def get_user_data(self):
+        data = await self._load('user')
+        if self.owns:
+            data = {user_id: value for user_id, value in data.items() if self.owns(user_id)}
+        return data
+
+    async def get_chat_data(self):
+        return await self._load('chat')
+
+    async def get_bot_data(self):
+        return (await self._load('bot')).get(0, {})
+
+    async def get_callback_data(self):
+        return (await self._load('callback')).get(0)
+
+    async def get_conversations(self, name):
+        rows = await self.db.get_persistent_conversations(name)
+        conversations = {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+        if self.owns:
+            # Ключ диалога (chat_id, user_id): пользователь - последний элемент
+            conversations = {key: state for key, state in conversations.items() if self.owns(key[-1])}
+        return conversations
+
+    # ================== ЗАПИСЬ ==================
+
+    def _set(self, kind, id_, data):
+        self._pending_data[(kind, id_)] = data
+        self._schedule_write()
+
+    async def update_user_data(self, user_id, data):
+        self._set('user', user_id, data)
+
+    async def update_chat_data(self, chat_id, data):
+        self._set('chat', chat_id, data)
+
+    async def update_bot_data(self, data):
+        self._set('bot', 0, data)
+
+    async def update_callback_data(self, data):
+        self._set('callback', 0, data)
+
+    async def drop_user_data(self, user_id):
+        self._set('user', user_id, None)
+
+    async def drop_chat_data(self, chat_id):
+        self._set('chat', chat_id, None)
+
+    async def update_conversation(self, name, key, new_state):
+        self._pending_conversations[(name, json.dumps(key))] = new_state
+        self._schedule_write()
+
+    # Данные в памяти Application всегда актуальны, подтягивать нечего
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    def _schedule_write(self):
+        """Запуск фоновой записи, если она ещё не идёт.
+
+        Задача стартует после остальных update_* текущего прохода, поэтому
+        они попадают в одну транзакцию.
+        """
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write())
+
+    @staticmethod
+    def _serialize(data, conversations):
+        """Строки для Database.save_persistent_state"""
+        data_rows = [(kind, id_, None if value is None else pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+                     for (kind, id_), value in data.items()]
+        conversation_rows = [(name, key, None if state is None else json.dumps(state))
+                             for (name, key), state in conversations.items()]
+        return data_rows, conversation_rows
+
+    async def _write(self):
+        """Запись накопленных изменений, пока они есть"""
+        while self._pending_data or self._pending_conversations:
+            data, self._pending_data = self._pending_data, {}
+            conversations, self._pending_conversations = self._pending_conversations, {}
+            try:
+                await self.db.save_persistent_state(*self._serialize(data, conversations))
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи состояния диалогов: {e}")
+                # Возвращаем неудавшееся, не затирая более свежие изменения
+                for key, value in data.items():
+                    self._pending_data.setdefault(key, value)
+                for key, value in conversations.items():
+                    self._pending_conversations.setdefault(key, value)
+                return
+
+    async def flush(self):
+        """Дописывание всех изменений (вызывается при остановке Application)"""
+        if self._write_task is not None:
+            await self._write_task
+        await self._write()
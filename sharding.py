@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+import aiohttp
+from aiohttp import web
+from telegram import Bot, Update
+
+from webhook import SECRET_HEADER
+
+logger = logging.getLogger(__name__)
+
+
+def shard_for(user_id, shards):
+    """Номер процесса, который обслуживает пользователя"""
+    return user_id % shards
+
+
+def user_id_from_update(data):
+    """ID пользователя из JSON обновления (None - если его нет)"""
+    for key, value in data.items():
+        if key == 'update_id' or not isinstance(value, dict):
+            continue
+        if 'from' in value:
+            return value['from']['id']
+        if 'user' in value:
+            return value['user']['id']
+        if 'chat' in value:
+            return value['chat']['id']
+    return None
+
+
+class ShardRouter:
+    """Приёмник webhook, раздающий обновления процессам-шардам по user_id.
+
+    Все обновления одного пользователя всегда попадают в один процесс,
+    поэтому его user_data и состояние анкеты живут только там. Ответ
+    шарда возвращается Telegram как есть: если шард недоступен, Telegram
+    повторит доставку позже.
+    """
+
+    def __init__(self, shard_urls, path="/telegram", secret_token=None, host="0.0.0.0", port=8080):
+        self.shard_urls = shard_urls
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self._runner = None
+        self._session = None
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self._route)
+        self.app.router.add_get("/health", self._health)
+
+    async def _route(self, request):
+        headers = {"Content-Type": "application/json"}
+        if self.secret_token is not None:
+            # Проверку секрета выполняет шард, заголовок передаём дальше
+            headers[SECRET_HEADER] = request.headers.get(SECRET_HEADER, "")
+
+        body = await request.read()
+        try:
+            user_id = user_id_from_update(await request.json())
+        except Exception:
+            return web.Response(status=400)
+        shard = shard_for(user_id, len(self.shard_urls)) if user_id is not None else 0
+
+        try:
+            async with self._session.post(self.shard_urls[shard], data=body, headers=headers) as response:
+                return web.Response(status=response.status)
+        except aiohttp.ClientError as e:
+            logger.warning(f"⚠️ Шард {shard} недоступен: {e}")
+            return web.Response(status=502)
+
+    async def _health(self, request):
+        return web.json_response({"status": "ok", "shards": len(self.shard_urls)})
+
+    async def start(self):
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"🌐 Маршрутизатор слушает {self.host}:{self.port}{self.path}, шардов: {len(self.shard_urls)}")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+
+async def run_router(command, shards, base_port, url, path="/telegram", secret_token=None,
+                     host="0.0.0.0", port=8080, max_connections=40, token=None, base_url=None):
+    """Режим BOT_MODE=sharded: запуск shards процессов-шардов и маршрутизатора перед ними.
+
+    Каждый шард - тот же бот (command) с SHARD_INDEX в окружении, слушающий
+    127.0.0.1:base_port+номер. Упавший шард перезапускается. Webhook в
+    Telegram регистрирует маршрутизатор.
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    def spawn(index):
+        env = dict(os.environ, SHARD_INDEX=str(index))
+        return subprocess.Popen(command, env=env)
+
+    workers = [spawn(index) for index in range(shards)]
+    router = ShardRouter(
+        [f"http://127.0.0.1:{base_port + index}{path}" for index in range(shards)],
+        path, secret_token, host, port
+    )
+    await router.start()
+    try:
+        if url:
+            bot = Bot(token, **({"base_url": base_url} if base_url else {}))
+            async with bot:
+                await bot.set_webhook(
+                    url=url.rstrip("/") + path,
+                    secret_token=secret_token,
+                    max_connections=max_connections,
+                    allowed_updates=Update.ALL_TYPES,
+                )
+        logger.info(f"🚀 Запущено шардов: {shards}")
+
+        while not stop_event.is_set():
+            for index, worker in enumerate(workers):
+                if worker.poll() is not None:
+                    logger.error(f"❌ Шард {index} завершился с кодом {worker.returncode}, перезапуск")
+                    workers[index] = spawn(index)
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await router.stop()
+        for worker in workers:
+            worker.send_signal(signal.SIGTERM)
+        for worker in workers:
+            try:
+                await asyncio.to_thread(worker.wait, 30)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+
+class LeaderElection:
+    """Выбор одного ведущего процесса через аренду в общей базе.
+
+    Ведущий продлевает аренду каждые renew_interval секунд; если он упал,
+    через ttl секунд её забирает другой процесс. При смене роли вызывается
+    on_change(is_leader). Рассылки и фоновые задачи, которые должны идти
+    в одном экземпляре, запускаются только у ведущего.
+    """
+
+    def __init__(self, db, name="leader", ttl=30, renew_interval=10, on_change=None):
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.on_change = on_change
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self._task = None
+        self._stopped = asyncio.Event()
+
+    async def _set_leader(self, is_leader):
+        if is_leader == self.is_leader:
+            return
+        self.is_leader = is_leader
+        logger.info(f"👑 {self.holder}: {'ведущий' if is_leader else 'ведомый'} процесс")
+        if self.on_change:
+            await self.on_change(is_leader)
+
+    async def _run(self):
+        while not self._stopped.is_set():
+            try:
+                acquired = await self.db.acquire_lease(self.name, self.holder, self.ttl)
+            except Exception as e:
+                logger.error(f"❌ Ошибка продления аренды {self.name}: {e}")
+                acquired = False
+            try:
+                await self._set_leader(acquired)
+            except Exception as e:
+                logger.error(f"❌ Ошибка смены роли процесса: {e}")
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.renew_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка и освобождение аренды, чтобы другой процесс сразу её забрал"""
+        if self._task is None:
+            return
+        self._stopped.set()
+        await self._task
+        self._task = None
+        if self.is_leader:
+            await self._set_leader(False)
+            await self.db.release_lease(self.name, self.holder)
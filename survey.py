@@ -0,0 +1,219 @@
+from collections import namedtuple
+
+from telegram.ext import MessageHandler, filters
+
+import config
+from states import *
+
+
+class Plain(str):
+    """Текст, отправляемый без разметки (остальные тексты анкеты - Markdown)"""
+
+
+def parse_mode(text):
+    return None if isinstance(text, Plain) else 'Markdown'
+
+
+# Кнопка ответа: куда ведёт (None - следующий шаг), что ответить до следующего
+# вопроса (если next - тот же шаг, ответ заменяет вопрос), записывать ли ответ
+Option = namedtuple('Option', ['button', 'next', 'reply', 'store'], defaults=(None, None, True))
+
+# Шаг анкеты: состояние, поле user_data, вопрос, ряды кнопок (строка -
+# обычная кнопка, Option - с поведением), следующий шаг. Необязательно: parse -
+# значение из текста (ValueError - ответ invalid, шаг повторяется), notice(value) -
+# текст перед следующим вопросом, extra - поля, записываемые вместе с ответом,
+# restart - ряд "🔄 Начать заново" в клавиатуре.
+# Текст не из кнопок без parse записывается как есть.
+# Тексты отправляются с Markdown, кроме обёрнутых в Plain.
+Step = namedtuple(
+    'Step',
+    ['state', 'field', 'question', 'rows', 'next', 'parse', 'invalid', 'notice', 'extra', 'restart'],
+    defaults=(None, None, None, None, True)
+)
+
+RESTART_BUTTON = "🔄 Начать заново"
+
+PARTIAL_REPAIR_TEXT = (
+    "🤝 Понял Вас. Мы делаем только полный ремонт под ключ, "
+    "чтобы не зависеть от чужих работ и отвечать за итог.\n\n"
+    "Но вы можете оставить заявку - обсудим варианты."
+)
+
+
+def parse_city(text):
+    """Город из кнопки или текста; только города из config.ALLOWED_CITIES"""
+    city = text.replace("🏙", "").strip()
+    if city not in config.ALLOWED_CITIES:
+        raise ValueError(city)
+    return city
+
+
+def metrage_notice(metrage):
+    if metrage < config.MIN_METRAGE:
+        return (
+            f"🙏 Спасибо! Мы берём объекты от {config.MIN_METRAGE} м², "
+            "чтобы отвечать за сроки и результат *под ключ*.\n\n"
+            "Но вы можете оставить заявку - обсудим индивидуально."
+        )
+    return None
+
+
+SURVEY_STEPS = [
+    Step(GEOGRAPHY, 'geography', "🗺 **Где находится объект?**", [
+        ["🏙 Ростов‑на‑Дону", "🏙 Аксай"],
+        ["🏙 Батайск", Option("Другой город", next=GEOGRAPHY, store=False, reply=Plain(
+            "😔 Понял, извините, мы работаем по Ростову‑на‑Дону, Аксаю и Батайску.\n\n"
+            "Выберите город из списка:"
+        ))],
+    ], OBJECT_TYPE, parse=parse_city, invalid=Plain(
+        f"❌ Мы работаем только в городах:\n"
+        f"{' • '.join(config.ALLOWED_CITIES)}\n\n"
+        "Выберите из списка:"
+    )),
+    Step(OBJECT_TYPE, 'object_type', "**Объект в каком варианте?**", [
+        ["🌃 Новостройка", Option("🏚 Вторичка", next=SECONDARY_OPTIONS)],
+        ["🏠 Дом/коттедж"],
+    ], CONDITION),
+    # Вторичка: вопрос о состоянии пропускается
+    Step(SECONDARY_OPTIONS, 'secondary_options', "🔨 **Уточните по вторичке:**\n\nЧто требуется сделать?", [
+        ["🔨 Требуется демонтаж"],
+        ["📐 Планируется перепланировка"],
+        ["✅ Демонтаж проведен"],
+        ["🔄 И демонтаж, и перепланировка"],
+        [Option("🔙 Назад к типам объектов", next=OBJECT_TYPE, store=False)],
+    ], METRAGE, extra={'condition': "Вторичка (специфика)"}, restart=False),
+    Step(CONDITION, 'condition', "🛁 **В каком состоянии квартира сейчас?**", [
+        ["🧱 Бетон", "🧱 Предчистовая"],
+        ["🏗 С отделкой от застройщика", "😕 Другое/не знаю"],
+    ], METRAGE),
+    Step(METRAGE, 'metrage', "✏️ **Напишите метраж квартиры** (например: 72)", None, REPAIR_FORMAT,
+         parse=int, invalid=Plain("❌ Пожалуйста, введите число (например: 72)"), notice=metrage_notice),
+    Step(REPAIR_FORMAT, 'repair_format', "**Какой ремонт Вам нужен?**", [
+        ["💪 Ремонт под ключ (вся квартира)"],
+        [Option("❗️ Частичный (комната/санузел/кухня)", reply=PARTIAL_REPAIR_TEXT)],
+        ["🫣 Переделка после \"мастеров\""],
+        ["✔️ Пока выбираю/сравниваю"],
+    ], KEYS_READY),
+    Step(KEYS_READY, 'keys_ready', "🔑 **Ключи уже на руках?**", [
+        ["✔️ Да, ключи есть"],
+        ["🌟 Будут в ближайший месяц"],
+        ["😉 Будут через 2–3 месяца+"],
+        ["💸 Пока просто прицениваюсь"],
+    ], DEADLINE),
+    Step(DEADLINE, 'deadline', "📌 **Когда планируете завершить ремонт?**", [
+        ["В ближайшие 2–3 месяца"],
+        ["3–4 месяца"],
+        ["5–6 месяцев"],
+        ["Пока не знаю"],
+    ], MAIN_FEAR),
+    Step(MAIN_FEAR, 'main_fear', "😟 **Честно: что тревожит больше всего?**", [
+        ["💸 Боюсь, что смета вырастет"],
+        ["⏳ Боюсь, что сроки затянутся"],
+        ["🧱 Боюсь, что сделают плохо/скрытые косяки"],
+        ["😱 Всё сразу"],
+    ], BUDGET),
+    Step(BUDGET, 'budget',
+         "💸 **Чтобы не гадать *на кофейной гуще*: какой ориентир по бюджету на работы Вы рассматриваете?**", [
+             ["до 400 тыс"],
+             ["400–600 тыс"],
+             ["600–900 тыс"],
+             ["900 тыс +"],
+             ["Не знаю / как раз хочу разобраться"],
+         ], RESULT),
+]
+
+
+def keyboard_rows(step):
+    """Текст кнопок клавиатуры шага (None - шаг без клавиатуры)"""
+    if step.rows is None:
+        return None
+    rows = [[button.button if isinstance(button, Option) else button for button in row] for row in step.rows]
+    return rows + [[RESTART_BUTTON]] if step.restart else rows
+
+
+class SurveyEngine:
+    """Анкета, собранная из SURVEY_STEPS: обработчики состояний ConversationHandler.
+
+    Кнопки каждого шага сведены в словарь кнопка -> Option, так что ответ
+    разбирается одним поиском по словарю. Переход в состояние, которого нет
+    в шагах (RESULT), выполняет соответствующая корутина из exits.
+    """
+
+    def __init__(self, steps, keyboards, on_restart, exits):
+        self.steps = {step.state: step for step in steps}
+        self.keyboards = keyboards        # состояние -> клавиатура вопроса
+        self.on_restart = on_restart      # корутина (update, context) -> состояние
+        self.exits = exits                # состояние вне анкеты -> корутина (update, context)
+        self._options = {
+            step.state: {
+                button.button: button
+                for row in step.rows or () for button in row if isinstance(button, Option)
+            }
+            for step in steps
+        }
+
+    async def ask(self, update, context, state):
+        """Вопрос шага state (или вход в состояние вне анкеты); возвращает state"""
+        step = self.steps.get(state)
+        if step is None:
+            await self.exits[state](update, context)
+        else:
+            await update.message.reply_text(
+                step.question,
+                reply_markup=self.keyboards[state],
+                parse_mode=parse_mode(step.question)
+            )
+        return state
+
+    async def _reply(self, update, step, text):
+        # Повтор вопроса шага: с его клавиатурой (у шагов без кнопок - без клавиатуры)
+        await update.message.reply_text(
+            text,
+            reply_markup=self.keyboards[step.state] if step.rows else None,
+            parse_mode=parse_mode(text)
+        )
+
+    async def dispatch(self, state, update, context):
+        """Ответ пользователя на шаге state; возвращает новое состояние"""
+        text = update.message.text
+        if text == RESTART_BUTTON:
+            return await self.on_restart(update, context)
+
+        step = self.steps[state]
+        option = self._options[state].get(text)
+        next_state = option.next if option and option.next is not None else step.next
+
+        if option is None or option.store:
+            try:
+                value = step.parse(text) if step.parse else text
+            except ValueError:
+                await self._reply(update, step, step.invalid)
+                return state
+            context.user_data[step.field] = value
+            if step.extra:
+                context.user_data.update(step.extra)
+            notice = step.notice(value) if step.notice else None
+            if notice:
+                await update.message.reply_text(notice, parse_mode=parse_mode(notice))
+
+        if option and option.reply:
+            if next_state == state:
+                await self._reply(update, step, option.reply)
+                return state
+            await update.message.reply_text(option.reply, parse_mode=parse_mode(option.reply))
+
+        return await self.ask(update, context, next_state)
+
+    def _handler(self, step):
+        async def callback(update, context):
+            return await self.dispatch(step.state, update, context)
+        # Имя - метка гистограммы обработчиков в metrics
+        callback.__name__ = callback.__qualname__ = f"{step.field}_handler"
+        return callback
+
+    def states(self):
+        """Состояния шагов для ConversationHandler: состояние -> [MessageHandler]"""
+        return {
+            state: [MessageHandler(filters.TEXT & ~filters.COMMAND, self._handler(step))]
+            for state, step in self.steps.items()
+        }
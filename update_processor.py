@@ -0,0 +1,73 @@
+import logging
+from collections import deque
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений с сохранением порядка для каждого пользователя.
+
+    Обновления разных пользователей обрабатываются одновременно (не больше
+    max_concurrent_updates), обновления одного пользователя - строго по
+    очереди, поэтому переходы ConversationHandler не перемешиваются.
+
+    Пока пользователь занят, его новые обновления ждут в личной очереди и не
+    занимают слот: задача, обрабатывающая пользователя, разбирает очередь
+    сама. Так один пользователь, отправивший много сообщений подряд, не
+    блокирует остальных.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._queues = {}   # пользователь (или чат) -> очередь ожидающих корутин
+
+    @staticmethod
+    def _key(update):
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return ('chat', update.effective_chat.id)
+        return None
+
+    @staticmethod
+    async def _run(coroutine):
+        try:
+            await coroutine
+        except Exception as e:
+            # Application.process_update сам передаёт ошибки обработчиков в error handler,
+            # сюда попадает только непредвиденное - очередь пользователя не должна встать
+            ERRORS.inc('update')
+            logger.exception(f"❌ Ошибка обработки обновления: {e}")
+
+    async def do_process_update(self, update, coroutine):
+        key = self._key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        queue = self._queues.get(key)
+        if queue is not None:
+            # Пользователь уже обрабатывается - встаём в его очередь
+            queue.append(coroutine)
+            return
+
+        self._queues[key] = queue = deque()
+        try:
+            await self._run(coroutine)
+            while queue:
+                await self._run(queue.popleft())
+        finally:
+            del self._queues[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,122 @@
+import asyncio
+import hmac
+import logging
+import signal
+
+from aiohttp import web
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Приём обновлений Telegram через webhook на aiohttp.
+
+    POST на path кладёт обновление в application.update_queue и сразу
+    отвечает 200, не дожидаясь обработчиков: запросы Telegram принимаются
+    параллельно. GET /health - проверка живости для балансировщика.
+    """
+
+    def __init__(self, application, path="/telegram", secret_token=None, host="0.0.0.0", port=8080):
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self._runner = None
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self._handle_update)
+        self.app.router.add_get("/health", self._health)
+
+    async def _handle_update(self, request):
+        if self.secret_token is not None:
+            token = request.headers.get(SECRET_HEADER, "")
+            # Байты, а не str: compare_digest не принимает строки с не-ASCII символами
+            if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+                logger.warning(f"⚠️ Webhook: запрос с неверным секретом от {request.remote}")
+                return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            logger.warning(f"⚠️ Webhook: не удалось разобрать обновление: {e}")
+            return web.Response(status=400)
+
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def _health(self, request):
+        return web.json_response({
+            "status": "ok" if self.application.running else "starting",
+            "update_queue": self.application.update_queue.qsize(),
+        })
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Если порт был 0 - узнаём выданный системой
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"🌐 Webhook слушает {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def run_webhook(application, url, path="/telegram", secret_token=None,
+                      host="0.0.0.0", port=8080, max_connections=40, register=True):
+    """Аналог application.run_polling() для режима webhook.
+
+    Повторяет жизненный цикл run_polling (post_init, post_stop, post_shutdown)
+    и работает до SIGINT/SIGTERM. Webhook при остановке не удаляется: пока бот
+    перезапускается, Telegram копит обновления и доставит их потом.
+    register=False - webhook регистрирует кто-то другой (шард за маршрутизатором).
+    """
+    if register and not url:
+        raise ValueError("Для режима webhook нужен WEBHOOK_URL")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows: остановка по KeyboardInterrupt
+            pass
+
+    server = WebhookServer(application, path, secret_token, host, port)
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await server.start()
+        if register:
+            await application.bot.set_webhook(
+                url=url.rstrip("/") + path,
+                secret_token=secret_token,
+                max_connections=max_connections,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        await application.start()
+        logger.info(f"🚀 Бот запущен в режиме webhook на {host}:{server.port}{path}")
+
+        try:
+            await stop_event.wait()
+        finally:
+            # Сначала перестаём принимать запросы, затем дообрабатываем очередь
+            await server.stop()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+    finally:
+        await server.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)